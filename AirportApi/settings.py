@@ -13,9 +13,6 @@ import os
 from datetime import timedelta
 from pathlib import Path
 
-from drf_spectacular.contrib import django_filters
-from django.core.wsgi import get_wsgi_application
-
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -52,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "airport_service.middleware.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -86,16 +84,94 @@ WSGI_APPLICATION = "AirportApi.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Persistent connections: a worker thread keeps its connection for
+# DB_CONN_MAX_AGE seconds (0 closes it after every request) and checks it
+# with a cheap query before reusing it in a new request.
+DB_CONN_MAX_AGE = int(os.environ.get("DB_CONN_MAX_AGE", 60))
+DB_CONN_HEALTH_CHECKS = (
+    os.environ.get("DB_CONN_HEALTH_CHECKS", "true").lower() == "true"
+)
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "airport_service.db_backend",
         "HOST": os.environ["POSTGRES_HOST"],
         "NAME": os.environ["POSTGRES_DB"],
         "USER": os.environ["POSTGRES_USER"],
         "PASSWORD": os.environ["POSTGRES_PASSWORD"],
+        "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": DB_CONN_HEALTH_CHECKS,
+    },
+    "replica": {
+        "ENGINE": "airport_service.db_backend",
+        "HOST": os.environ.get(
+            "POSTGRES_REPLICA_HOST", os.environ["POSTGRES_HOST"]
+        ),
+        "NAME": os.environ.get(
+            "POSTGRES_REPLICA_DB", os.environ["POSTGRES_DB"]
+        ),
+        "USER": os.environ.get(
+            "POSTGRES_REPLICA_USER", os.environ["POSTGRES_USER"]
+        ),
+        "PASSWORD": os.environ.get(
+            "POSTGRES_REPLICA_PASSWORD", os.environ["POSTGRES_PASSWORD"]
+        ),
+        "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": DB_CONN_HEALTH_CHECKS,
+        "TEST": {"MIRROR": "default"},
+    },
+}
+
+DATABASE_ROUTERS = ["airport_service.db_router.ReplicaRouter"]
+
+REPLICA_DATABASE_ALIAS = "replica"
+
+# Reads of a user who has just written go to the primary for this long
+READ_YOUR_WRITES_WINDOW = int(os.environ.get("READ_YOUR_WRITES_WINDOW", 10))
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND",
+            "django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
     }
 }
 
+RESPONSE_CACHE_ALIAS = "default"
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get("RESPONSE_CACHE_TIMEOUT", 60 * 60))
+
+# Throttle counters must live in a cache shared by all workers
+# (e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache)
+# for the rates to hold across processes.
+THROTTLE_CACHE_ALIAS = "default"
+
+# Airport autocomplete prefix index, also rebuilt on airport edits
+AIRPORT_INDEX_TTL = int(os.environ.get("AIRPORT_INDEX_TTL", 10 * 60))
+
+# Connection search timetable index
+ITINERARY_INDEX_TTL = int(os.environ.get("ITINERARY_INDEX_TTL", 5 * 60))
+ITINERARY_HORIZON_DAYS = int(os.environ.get("ITINERARY_HORIZON_DAYS", 30))
+
+# Days ahead for which roll_schedules materializes recurring flights
+SCHEDULE_HORIZON_DAYS = int(os.environ.get("SCHEDULE_HORIZON_DAYS", 60))
+
+# Per-request timings (Server-Timing header, api/airport/metrics/)
+REQUEST_METRICS_ENABLED = (
+    os.environ.get("REQUEST_METRICS_ENABLED", "true").lower() == "true"
+)
+
+# Seconds an Idempotency-Key of an order is replayed; purge_idempotency_keys
+# deletes older keys
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+
+# Rows fetched per server-side cursor round trip by streaming exports
+EXPORT_CHUNK_SIZE = int(os.environ.get("EXPORT_CHUNK_SIZE", 2000))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -138,6 +214,10 @@ STATIC_URL = "static/"
 MEDIA_ROOT = BASE_DIR / "media"
 MEDIA_URL = "/media/"
 
+# Processes generating thumbnails and WebP copies of uploaded images;
+# 0 processes them in the request thread right after commit
+IMAGE_PROCESSING_WORKERS = int(os.environ.get("IMAGE_PROCESSING_WORKERS", 2))
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
@@ -150,19 +230,28 @@ INTERNAL_IPS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "airports_user.authentication.CachedJWTAuthentication",
+    ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "airport_service.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "airport_service.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ),
     "DEFAULT_FILTER_BACKENDS": (
         "django_filters.rest_framework.DjangoFilterBackend",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "airport_service.throttling.AnonSlidingWindowThrottle",
+        "airport_service.throttling.UserSlidingWindowThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
-        "anon": "100/day",
-        "user": "1000/day",
+        "anon": os.environ.get("ANON_THROTTLE_RATE", "100/day"),
+        "user": os.environ.get("USER_THROTTLE_RATE", "1000/day"),
     },
 }
 
@@ -179,6 +268,9 @@ SPECTACULAR_SETTINGS = {
     },
 }
 
+# Users resolved from access tokens are cached for this many seconds
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get("AUTH_USER_CACHE_TIMEOUT", 60))
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=30),
@@ -8,7 +8,8 @@ from airport_service.models import (
     Airport,
     Route,
     Airplane,
-    Flight
+    Flight,
+    FlightSchedule,
 )
 
 
@@ -22,6 +23,19 @@ class OrderAdmin(admin.ModelAdmin):
     inlines = (TicketInLine,)
 
 
+@admin.register(FlightSchedule)
+class FlightScheduleAdmin(admin.ModelAdmin):
+    list_display = (
+        "route",
+        "departure_time",
+        "days_of_week",
+        "start_date",
+        "end_date",
+        "generated_until",
+    )
+    readonly_fields = ("generated_until",)
+
+
 admin.site.register(AirplaneType)
 admin.site.register(Crew)
 admin.site.register(Airport)
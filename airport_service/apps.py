@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AirportServiceConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "airport_service"
+
+    def ready(self):
+        import airport_service.signals  # noqa: F401
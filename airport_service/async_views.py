@@ -0,0 +1,192 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from airports_user.authentication import CachedJWTAuthentication
+from airport_service.filters import AirportFilter, FlightFilter
+from airport_service.instrumentation import serializer_timer
+from airport_service.models import Airport, Route, Flight, Ticket
+from airport_service.permissions import IsAdminOrIfAuthenticatedReadOnly
+from airport_service.renderers import ORJSONRenderer
+from airport_service.serializers import (
+    AirportSerializer,
+    RouteSerializer,
+    RouteListSerializer,
+    FlightListSerializer,
+    FlightDetailSerializer,
+)
+from airport_service.views import FlightPagination
+
+
+class AsyncReadOnlyView(View):
+    """
+    Read-only list/retrieve endpoint running natively under ASGI.
+    Authentication, permissions, throttles, filters, pagination and
+    serializers are the ones of the sync viewsets; rows are fetched with
+    the async ORM, so one worker can wait on many queries at once.
+    """
+    http_method_names = ["get"]
+    authentication_classes = (CachedJWTAuthentication,)
+    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    queryset = None
+    filterset_class = None
+    pagination_class = None
+    list_serializer_class = None
+    detail_serializer_class = None
+
+    def get_queryset(self, request, pk=None):
+        return self.queryset.all()
+
+    def check_permissions(self, request):
+        for permission_class in self.permission_classes:
+            if not permission_class().has_permission(request, self):
+                if request.successful_authenticator is None:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied()
+
+    def check_throttles(self, request):
+        durations = []
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            if not throttle.allow_request(request, self):
+                durations.append(throttle.wait())
+
+        if durations:
+            durations = [wait for wait in durations if wait is not None]
+            raise exceptions.Throttled(max(durations, default=None))
+
+    def initial(self, request):
+        self.check_permissions(request)
+        self.check_throttles(request)
+
+    def filter_queryset(self, request, queryset):
+        if self.filterset_class is None:
+            return queryset
+
+        filterset = self.filterset_class(
+            request.query_params, queryset=queryset, request=request
+        )
+        if not filterset.is_valid():
+            raise exceptions.ValidationError(filterset.errors)
+
+        return filterset.qs
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(
+            ORJSONRenderer().render(data),
+            status=status_code,
+            content_type="application/json",
+        )
+
+    async def get(self, request, pk=None):
+        request = Request(
+            request,
+            authenticators=[auth() for auth in self.authentication_classes],
+        )
+
+        try:
+            await sync_to_async(self.initial)(request)
+            if pk is None:
+                data = await self.list(request)
+            else:
+                data = await self.retrieve(request, pk)
+        except exceptions.APIException as exc:
+            return self.handle_exception(request, exc)
+
+        return self.render(data)
+
+    def handle_exception(self, request, exc):
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {"detail": exc.detail}
+
+        response = self.render(data, exc.status_code)
+        if isinstance(
+            exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+        ) and request.authenticators:
+            response["WWW-Authenticate"] = (
+                request.authenticators[0].authenticate_header(request)
+            )
+        if getattr(exc, "wait", None):
+            response["Retry-After"] = str(int(exc.wait))
+
+        return response
+
+    async def list(self, request):
+        queryset = self.filter_queryset(request, self.get_queryset(request))
+        context = {"request": request}
+
+        if self.pagination_class is None:
+            objects = [obj async for obj in queryset]
+            with serializer_timer():
+                return self.list_serializer_class(
+                    objects, many=True, context=context
+                ).data
+
+        paginator = self.pagination_class()
+        page = await sync_to_async(paginator.paginate_queryset)(
+            queryset, request, self
+        )
+        with serializer_timer():
+            data = self.list_serializer_class(
+                page, many=True, context=context
+            ).data
+        return paginator.get_paginated_response(data).data
+
+    async def retrieve(self, request, pk):
+        try:
+            instance = await self.get_queryset(request, pk).aget(pk=pk)
+        except self.queryset.model.DoesNotExist:
+            raise exceptions.NotFound()
+
+        with serializer_timer():
+            return self.detail_serializer_class(
+                instance, context={"request": request}
+            ).data
+
+
+class AsyncAirportView(AsyncReadOnlyView):
+    queryset = Airport.objects.all()
+    filterset_class = AirportFilter
+    list_serializer_class = AirportSerializer
+    detail_serializer_class = AirportSerializer
+
+
+class AsyncRouteView(AsyncReadOnlyView):
+    queryset = Route.objects.all().select_related("source", "destination")
+    list_serializer_class = RouteListSerializer
+    detail_serializer_class = RouteSerializer
+
+
+class AsyncFlightView(AsyncReadOnlyView):
+    queryset = Flight.objects.all().select_related(
+        "route__source",
+        "route__destination",
+        "airplane__airplane",
+        "crew",
+    )
+    filterset_class = FlightFilter
+    pagination_class = FlightPagination
+    list_serializer_class = FlightListSerializer
+    detail_serializer_class = FlightDetailSerializer
+
+    def get_queryset(self, request, pk=None):
+        queryset = super().get_queryset(request, pk)
+
+        if pk is not None:
+            return queryset.prefetch_related(
+                Prefetch(
+                    "tickets",
+                    queryset=Ticket.objects.only(
+                        "id", "flight_id", "row", "seat"
+                    ),
+                )
+            )
+
+        return queryset
@@ -0,0 +1,142 @@
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from airport_service.cache import get_versions
+from airport_service.db_router import read_from
+from airport_service.models import Airport
+
+WORD_SEPARATOR = re.compile(r"[\W_]+")
+
+NAME_PREFIX, CITY_PREFIX, WORD_PREFIX = range(3)
+
+
+def normalize(text):
+    """
+    Casefold, drop diacritics and collapse punctuation to single spaces:
+    "São Paulo-Guarulhos" -> "sao paulo guarulhos"
+    """
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(WORD_SEPARATOR.split(text)).strip()
+
+
+class AirportPrefixIndex:
+    """
+    Sorted arrays of normalized names, cities and their inner words.
+    All keys starting with a prefix form one contiguous slice found by
+    bisect, so a lookup never scans airports that do not match.
+    """
+    kinds = (NAME_PREFIX, CITY_PREFIX, WORD_PREFIX)
+
+    def __init__(self, airports, version=None):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.airports = {}
+        entries = {kind: [] for kind in self.kinds}
+
+        for airport_id, name, city in airports:
+            self.airports[airport_id] = {
+                "id": airport_id,
+                "name": name,
+                "city": city,
+            }
+            order = (len(name), name, airport_id)
+            for text, kind in ((name, NAME_PREFIX), (city, CITY_PREFIX)):
+                text = normalize(text or "")
+                if not text:
+                    continue
+                entries[kind].append((text, order))
+                words = text.split(" ")
+                for position in range(1, len(words)):
+                    entries[WORD_PREFIX].append(
+                        (" ".join(words[position:]), order)
+                    )
+
+        self.keys = {}
+        self.orders = {}
+        for kind, kind_entries in entries.items():
+            kind_entries.sort()
+            self.keys[kind] = [key for key, _ in kind_entries]
+            self.orders[kind] = [order for _, order in kind_entries]
+
+    @classmethod
+    def load(cls, version=None):
+        return cls(
+            Airport.objects.values_list("id", "name", "city").iterator(),
+            version=version,
+        )
+
+    def search(self, query, limit=10):
+        """
+        Rank airports whose name, city or any word of them starts with
+        the query: name matches first, then city, then inner words;
+        within each group exact matches, then shorter names
+        """
+        query = normalize(query)
+        if not query:
+            return []
+
+        found = []
+        seen = set()
+
+        for kind in self.kinds:
+            keys = self.keys[kind]
+            start = bisect_left(keys, query)
+            exact_end = bisect_right(keys, query, start)
+            end = bisect_left(keys, query + "\uffff", exact_end)
+
+            for low, high in ((start, exact_end), (exact_end, end)):
+                group = self.orders[kind][low:high]
+                taken = 0
+                while len(found) < limit and taken < len(group):
+                    candidates = heapq.nsmallest(
+                        taken + limit - len(found), group
+                    )
+                    for *_, airport_id in candidates[taken:]:
+                        if airport_id not in seen and len(found) < limit:
+                            seen.add(airport_id)
+                            found.append(self.airports[airport_id])
+                    taken = len(candidates)
+
+                if len(found) == limit:
+                    return found
+
+        return found
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_airport_index():
+    """
+    Return the process-wide index, rebuilt when the Airport version stamp
+    in the shared cache changes, so every worker sees edits, and once it
+    is older than AIRPORT_INDEX_TTL seconds. It is built from the primary:
+    a lagging replica would leave pre-edit airports under the new stamp.
+    """
+    global _index
+
+    version, = get_versions((Airport,))
+    if is_stale(_index, version):
+        with _index_lock:
+            if is_stale(_index, version):
+                with read_from(DEFAULT_DB_ALIAS):
+                    _index = AirportPrefixIndex.load(version=version)
+
+    return _index
+
+
+def is_stale(index, version):
+    return (
+        index is None
+        or index.version != version
+        or time.monotonic() - index.built_at >= settings.AIRPORT_INDEX_TTL
+    )
@@ -0,0 +1,51 @@
+import hashlib
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def version_key(model):
+    return f"version:{model._meta.label_lower}"
+
+
+def bump_version(model):
+    """
+    Stamp the model with a new random version, so every response cached
+    for the previous one stops being addressable
+    """
+    get_cache().set(version_key(model), uuid.uuid4().hex, None)
+
+
+def bump_version_on_commit(model):
+    """
+    Bump now and again when the current transaction commits: a miss filled
+    by a concurrent request before the commit would otherwise be stored
+    under the new stamp with the old rows
+    """
+    bump_version(model)
+    transaction.on_commit(partial(bump_version, model))
+
+
+def get_versions(models):
+    cache = get_cache()
+    keys = [version_key(model) for model in models]
+    versions = cache.get_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid.uuid4().hex, None)
+            versions[key] = cache.get(key)
+
+    return [versions[key] for key in keys]
+
+
+def response_key(prefix, versions, params):
+    digest = hashlib.sha1(repr((versions, params)).encode()).hexdigest()
+    return f"response:{prefix}:{digest}"
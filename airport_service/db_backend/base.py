@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.db.backends.postgresql import base
+
+from airport_service.db_backend import metrics
+from airport_service.instrumentation import record_query
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend that records how connections are opened, reused and
+    health-checked. A checkout is the first cursor taken after a request
+    boundary; it is "reused" when the connection survived from an earlier
+    request thanks to CONN_MAX_AGE. With REQUEST_METRICS_ENABLED queries
+    are also timed for the request metrics.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checked_out = False
+        metrics.register(self)
+        if settings.REQUEST_METRICS_ENABLED:
+            self.execute_wrappers.append(record_query)
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        metrics.record_connect(self.alias, time.perf_counter() - started)
+
+    def _cursor(self, name=None):
+        if not self.checked_out:
+            self.checked_out = True
+            metrics.record(
+                self.alias,
+                checkouts=1,
+                reused=int(self.connection is not None),
+            )
+
+        return super()._cursor(name)
+
+    def close(self):
+        was_open = self.connection is not None
+        super().close()
+        if was_open and self.connection is None:
+            metrics.record(self.alias, closed=1)
+
+    def close_if_health_check_failed(self):
+        was_open = self.connection is not None
+        super().close_if_health_check_failed()
+        if was_open and self.connection is None:
+            metrics.record(self.alias, health_check_failures=1)
+
+    def close_if_unusable_or_obsolete(self):
+        self.checked_out = False
+        super().close_if_unusable_or_obsolete()
@@ -0,0 +1,71 @@
+import threading
+import weakref
+
+_lock = threading.Lock()
+_wrappers = weakref.WeakSet()
+_stats = {}
+
+
+def new_stats():
+    return {
+        "checkouts": 0,
+        "reused": 0,
+        "opened": 0,
+        "closed": 0,
+        "health_check_failures": 0,
+        "connect_seconds_total": 0.0,
+        "connect_seconds_max": 0.0,
+    }
+
+
+def register(wrapper):
+    with _lock:
+        _wrappers.add(wrapper)
+
+
+def record(alias, **counters):
+    with _lock:
+        stats = _stats.setdefault(alias, new_stats())
+        for name, value in counters.items():
+            stats[name] += value
+
+
+def record_connect(alias, seconds):
+    with _lock:
+        stats = _stats.setdefault(alias, new_stats())
+        stats["opened"] += 1
+        stats["connect_seconds_total"] += seconds
+        stats["connect_seconds_max"] = max(
+            stats["connect_seconds_max"], seconds
+        )
+
+
+def snapshot():
+    """
+    Connection counters of this process per database alias. There is no
+    pool: each thread keeps one persistent connection per alias, so
+    "open_connections" (live connections per alias) stands in for the pool
+    size, and there is no checkout wait to measure; "connect_seconds_*"
+    is the time spent opening connections.
+    """
+    with _lock:
+        wrappers = list(_wrappers)
+        result = {alias: dict(stats) for alias, stats in _stats.items()}
+
+    for wrapper in wrappers:
+        stats = result.setdefault(wrapper.alias, new_stats())
+        stats["open_connections"] = stats.get("open_connections", 0) + int(
+            wrapper.connection is not None
+        )
+        stats["max_age"] = wrapper.settings_dict["CONN_MAX_AGE"]
+        stats["health_checks"] = wrapper.settings_dict["CONN_HEALTH_CHECKS"]
+
+    for stats in result.values():
+        stats.setdefault("open_connections", 0)
+        stats["connect_seconds_mean"] = (
+            stats["connect_seconds_total"] / stats["opened"]
+            if stats["opened"]
+            else 0.0
+        )
+
+    return result
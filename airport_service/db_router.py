@@ -0,0 +1,84 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_read_alias = ContextVar("read_alias", default=None)
+
+
+class ReplicaRouter:
+    """
+    Writes always go to the primary. Reads go to the alias selected with
+    read_from(), which the API viewsets set for safe requests; everything
+    else (admin, management commands, signals) reads from the primary.
+    Reads inside a transaction on the primary stay there, so they see the
+    rows written earlier in the same transaction.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, settings.REPLICA_DATABASE_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == settings.REPLICA_DATABASE_ALIAS:
+            return False
+
+        return None
+
+
+def set_read_alias(alias):
+    return _read_alias.set(alias)
+
+
+def reset_read_alias(token):
+    _read_alias.reset(token)
+
+
+@contextmanager
+def read_from(alias):
+    token = set_read_alias(alias)
+    try:
+        yield
+    finally:
+        reset_read_alias(token)
+
+
+def pin_key(user):
+    return f"db-pin:{user.pk}"
+
+
+def pin_to_primary(user):
+    """
+    Send the user's reads to the primary for READ_YOUR_WRITES_WINDOW
+    seconds, so they see their own writes despite replication lag.
+    """
+    cache.set(pin_key(user), True, settings.READ_YOUR_WRITES_WINDOW)
+
+
+def is_pinned_to_primary(user):
+    return user.is_authenticated and cache.get(pin_key(user), False)
+
+
+def get_read_alias(user):
+    if (
+        settings.REPLICA_DATABASE_ALIAS not in connections
+        or is_pinned_to_primary(user)
+    ):
+        return DEFAULT_DB_ALIAS
+
+    return settings.REPLICA_DATABASE_ALIAS
@@ -0,0 +1,28 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class SeatsAlreadyTaken(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _("Some of the requested seats are already taken.")
+    default_code = "seats_taken"
+
+    def __init__(self, seats):
+        super().__init__()
+        self.seats = seats
+        self.detail = {
+            "detail": self.detail,
+            "conflicting_seats": [
+                {"flight": flight_id, "row": row, "seat": seat}
+                for flight_id, row, seat in seats
+            ],
+        }
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = _(
+        "This Idempotency-Key was already used with a different request."
+    )
+    default_code = "idempotency_key_reused"
@@ -0,0 +1,134 @@
+import csv
+import json
+from datetime import datetime
+from io import StringIO
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+
+from airport_service.filters import FlightFilter
+from airport_service.models import Flight, Order, Ticket
+
+EXPORT_COLUMNS = {
+    "flights": (
+        ("id", "id"),
+        ("route", "route_id"),
+        ("source", "route__source__name"),
+        ("destination", "route__destination__name"),
+        ("airplane", "airplane__name"),
+        ("crew", "crew_id"),
+        ("departure_time", "departure_time"),
+        ("arrival_time", "arrival_time"),
+        ("seats_sold", "seats_sold"),
+    ),
+    "orders": (
+        ("id", "id"),
+        ("created_at", "created_at"),
+        ("user", "user_id"),
+        ("email", "user__email"),
+    ),
+    "tickets": (
+        ("id", "id"),
+        ("order", "order_id"),
+        ("flight", "flight_id"),
+        ("row", "row"),
+        ("seat", "seat"),
+        ("created_at", "order__created_at"),
+        ("user", "order__user_id"),
+    ),
+}
+
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def get_export_queryset(dataset, params):
+    """
+    Rows of dataset as tuples ordered by id. FlightFilter params select the
+    flights to export, or the tickets and orders booked on those flights.
+    Returns (queryset, errors); errors come from the filterset.
+    """
+    flights = FlightFilter(params, queryset=Flight.objects.all())
+    if not flights.is_valid():
+        return None, flights.errors
+
+    filtered = bool(flights.qs.query.where)
+    if dataset == "flights":
+        queryset = flights.qs
+    elif dataset == "tickets":
+        queryset = Ticket.objects.all()
+        if filtered:
+            queryset = queryset.filter(flight__in=flights.qs.values("id"))
+    else:
+        queryset = Order.objects.all()
+        if filtered:
+            queryset = queryset.filter(
+                Exists(
+                    Ticket.objects.filter(
+                        order=OuterRef("pk"),
+                        flight__in=flights.qs.values("id"),
+                    )
+                )
+            )
+
+    lookups = [lookup for _, lookup in EXPORT_COLUMNS[dataset]]
+
+    return queryset.order_by("id").values_list(*lookups), None
+
+
+def iter_rows(queryset):
+    """
+    Stream rows through a server-side cursor, EXPORT_CHUNK_SIZE at a time
+    """
+    for row in queryset.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        yield [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in row
+        ]
+
+
+def render_ndjson(columns, rows):
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    lines = []
+
+    for row in rows:
+        lines.append(encode(dict(zip(columns, row))))
+        if len(lines) == settings.EXPORT_CHUNK_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def render_csv(columns, rows):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+
+    for number, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if number % settings.EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+RENDERERS = {
+    "ndjson": render_ndjson,
+    "csv": render_csv,
+}
+
+
+def export(dataset, queryset, output):
+    """
+    Encoded chunks of the export; memory use depends on
+    EXPORT_CHUNK_SIZE, not on the number of rows
+    """
+    columns = [column for column, _ in EXPORT_COLUMNS[dataset]]
+
+    return RENDERERS[output](columns, iter_rows(queryset))
@@ -1,3 +1,4 @@
+from django import forms
 from django_filters import rest_framework as filters
 
 from airport_service.models import Airport, Flight
@@ -7,6 +8,10 @@ class CharFilterInFilter(filters.BaseInFilter, filters.CharFilter):
     pass
 
 
+class IntegerFilter(filters.NumberFilter):
+    field_class = forms.IntegerField
+
+
 class AirportFilter(filters.FilterSet):
 
     city = CharFilterInFilter(field_name="city", lookup_expr="in")
@@ -18,6 +23,7 @@ class AirportFilter(filters.FilterSet):
 
 class FlightFilter(filters.FilterSet):
 
+    route = IntegerFilter(field_name="route_id")
     arrival_place = CharFilterInFilter(
         field_name="route__source__name",
         lookup_expr="in"
@@ -32,6 +38,7 @@ class FlightFilter(filters.FilterSet):
     class Meta:
         model = Flight
         fields = (
+            "route",
             "arrival_place",
             "destination_place",
             "departure_time",
@@ -0,0 +1,165 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from airport_service.cache import bump_version
+from airport_service.models import Crew, Airplane
+
+logger = logging.getLogger(__name__)
+
+IMAGE_FIELDS = {
+    Crew: ("image",),
+    Airplane: ("outside_image", "inside_image"),
+}
+
+IMAGE_VARIANTS = {
+    "thumb": {"size": (320, 320), "quality": 80},
+    "full": {"size": None, "quality": 85},
+}
+
+
+def variant_name(name, variant):
+    """
+    Variants are stored next to the original upload:
+    uploads/crew/lee-<uuid>.png -> uploads/crew/lee-<uuid>.thumb.webp
+    """
+    root, _ = os.path.splitext(name)
+    return f"{root}.{variant}.webp"
+
+
+def variant_url(name, variant, processed, storage=default_storage):
+    """
+    URL of the variant once processed, of the original until then.
+    Whether variants exist comes from the row (image_variants), so serving
+    an image never probes the storage.
+    """
+    return storage.url(variant_name(name, variant) if processed else name)
+
+
+def has_variants(image_variants, field, name):
+    return bool(name) and (image_variants or {}).get(field) == name
+
+
+def process_image(name, storage=default_storage):
+    """
+    Write every IMAGE_VARIANTS entry of the stored image as WebP.
+    Runs in the worker processes, so it only touches storage, not the DB.
+    """
+    with storage.open(name) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image.load()
+
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert(
+            "RGBA" if "transparency" in image.info else "RGB"
+        )
+
+    names = []
+    for variant, options in IMAGE_VARIANTS.items():
+        resized = image.copy()
+        if options["size"]:
+            resized.thumbnail(options["size"])
+
+        buffer = BytesIO()
+        resized.save(buffer, format="WEBP", quality=options["quality"])
+        target = variant_name(name, variant)
+        storage.delete(target)
+        names.append(storage.save(target, ContentFile(buffer.getvalue())))
+
+    return names
+
+
+def missing_variants(instance):
+    return [
+        image.name
+        for field, image in (
+            (field, getattr(instance, field))
+            for field in IMAGE_FIELDS[type(instance)]
+        )
+        if image
+        and not has_variants(instance.image_variants, field, image.name)
+    ]
+
+
+def record_variants(model, name):
+    """
+    Mark the variants of name as generated on the rows storing it. Uses
+    update(), so post_save does not schedule the image again.
+    """
+    for field in IMAGE_FIELDS[model]:
+        with transaction.atomic():
+            rows = model.objects.select_for_update().filter(**{field: name})
+            for pk, image_variants in rows.values_list(
+                "pk", "image_variants"
+            ):
+                model.objects.filter(pk=pk).update(
+                    image_variants={**image_variants, field: name}
+                )
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        )
+
+    return _executor
+
+
+def variants_done(model, name, future):
+    """
+    Pool callback: record the variants of name once the worker wrote them.
+    It runs in the pool's result thread, which serves no request, so its
+    connection is only closed or health-checked here. Failures are logged
+    (concurrent.futures would swallow them); the process_images command
+    picks up images left unrecorded.
+    """
+    if future.exception() is not None:
+        logger.error(
+            "Processing %s failed", name, exc_info=future.exception()
+        )
+        return
+
+    close_old_connections()
+    try:
+        record_variants(model, name)
+        bump_version(model)
+    except Exception:
+        logger.exception("Recording the variants of %s failed", name)
+    finally:
+        close_old_connections()
+
+
+def schedule_image_processing(model, names):
+    """
+    Hand images over to the process pool; with IMAGE_PROCESSING_WORKERS = 0
+    they are processed in the calling thread. Once its variants exist an
+    image is recorded on its rows and cached responses of the model are
+    invalidated, so they stop pointing at the original.
+    """
+    for name in names:
+        if settings.IMAGE_PROCESSING_WORKERS:
+            get_executor().submit(process_image, name).add_done_callback(
+                partial(variants_done, model, name)
+            )
+        else:
+            process_image(name)
+            record_variants(model, name)
+            bump_version(model)
@@ -0,0 +1,171 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+HISTOGRAMS = {
+    "airport_request_duration_seconds": (
+        "Time spent serving the request",
+        DURATION_BUCKETS,
+    ),
+    "airport_request_db_duration_seconds": (
+        "Time spent in database queries",
+        DURATION_BUCKETS,
+    ),
+    "airport_request_serializer_duration_seconds": (
+        "Time spent building response data in serializers",
+        DURATION_BUCKETS,
+    ),
+    "airport_request_db_queries": (
+        "Database queries per request",
+        QUERY_BUCKETS,
+    ),
+}
+
+_current = ContextVar("request_metrics", default=None)
+_lock = threading.Lock()
+_histograms = {}
+
+
+class RequestMetrics:
+    """
+    Counters of the request being served, shared with the threads that
+    sync_to_async runs its ORM calls in through the context variable
+    """
+
+    __slots__ = ("started", "queries", "db", "serializer", "depth")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.serializer = 0.0
+        self.depth = 0
+
+    def server_timing(self, total):
+        return (
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries", '
+            f"serializer;dur={self.serializer * 1000:.1f}, "
+            f"total;dur={total * 1000:.1f}"
+        )
+
+
+def start_request():
+    """
+    Returns (metrics, token); pass the token to finish_request
+    """
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(view, metrics, token):
+    """
+    Add the request to the histograms of view; returns the total duration
+    """
+    _current.reset(token)
+    total = time.perf_counter() - metrics.started
+
+    with _lock:
+        for name, value in (
+            ("airport_request_duration_seconds", total),
+            ("airport_request_db_duration_seconds", metrics.db),
+            (
+                "airport_request_serializer_duration_seconds",
+                metrics.serializer,
+            ),
+            ("airport_request_db_queries", metrics.queries),
+        ):
+            buckets = HISTOGRAMS[name][1]
+            counts, stats = _histograms.setdefault(
+                (name, view), ([0] * (len(buckets) + 1), [0, 0.0])
+            )
+            counts[bisect_left(buckets, value)] += 1
+            stats[0] += 1
+            stats[1] += value
+
+    return total
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every connection by the database backend
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db += time.perf_counter() - started
+        metrics.queries += 1
+
+
+@contextmanager
+def serializer_timer():
+    """
+    Count the block as serializer time; nested blocks are counted once
+    """
+    metrics = _current.get()
+    if metrics is None or metrics.depth:
+        yield
+        return
+
+    metrics.depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer += time.perf_counter() - started
+        metrics.depth -= 1
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """
+    Histograms of this process in the Prometheus text exposition format
+    """
+    with _lock:
+        histograms = {
+            key: (list(counts), list(stats))
+            for key, (counts, stats) in _histograms.items()
+        }
+
+    lines = []
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, view), (counts, (count, total)) in sorted(
+            histograms.items()
+        ):
+            if metric != name:
+                continue
+
+            cumulative = 0
+            for bound, bucket in zip(buckets + ("+Inf",), counts):
+                cumulative += bucket
+                lines.append(
+                    f'{name}_bucket{{view="{view}",le="{bound}"}} '
+                    f"{cumulative}"
+                )
+            lines.append(
+                f'{name}_sum{{view="{view}"}} {format_value(total)}'
+            )
+            lines.append(f'{name}_count{{view="{view}"}} {count}')
+
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
@@ -0,0 +1,272 @@
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from airport_service.models import Airport, Route, Flight
+
+
+class ItineraryIndex:
+    """
+    In-memory timetable used to search connections without per-hop queries.
+    Flights are kept in flat arrays sorted by (source airport, departure),
+    so flights leaving an airport within a time window are found by bisect.
+    Times are stored as UTC epoch seconds.
+    """
+
+    def __init__(self, airports, routes, flights):
+        self.cities = defaultdict(set)
+        for airport_id, city in airports:
+            if city:
+                self.cities[city.lower()].add(airport_id)
+
+        self.predecessors = defaultdict(set)
+        for source_id, destination_id in routes:
+            self.predecessors[destination_id].add(source_id)
+
+        flights = sorted(flights, key=lambda flight: (flight[1], flight[3]))
+        self.ids = array("q")
+        self.sources = array("q")
+        self.destinations = array("q")
+        self.departures = array("q")
+        self.arrivals = array("q")
+        self.seats = array("q")
+        self.distances = array("q")
+        self.offsets = {}
+
+        for index, (
+            flight_id,
+            source_id,
+            destination_id,
+            departure,
+            arrival,
+            seats,
+            distance,
+        ) in enumerate(flights):
+            self.ids.append(flight_id)
+            self.sources.append(source_id)
+            self.destinations.append(destination_id)
+            self.departures.append(departure)
+            self.arrivals.append(arrival)
+            self.seats.append(seats)
+            self.distances.append(distance)
+            start, _ = self.offsets.get(source_id, (index, index))
+            self.offsets[source_id] = (start, index + 1)
+
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, horizon=None):
+        now = timezone.now()
+        horizon = horizon or timedelta(days=settings.ITINERARY_HORIZON_DAYS)
+        flights = (
+            Flight.objects.filter(
+                departure_time__gte=now,
+                departure_time__lt=now + horizon,
+            )
+            .annotate(
+                seats_left=(
+                    F("airplane__rows") * F("airplane__seats_in_row")
+                    - F("seats_sold")
+                )
+            )
+            .values_list(
+                "id",
+                "route__source_id",
+                "route__destination_id",
+                "departure_time",
+                "arrival_time",
+                "seats_left",
+                "route__distance",
+            )
+            .order_by()
+        )
+
+        return cls(
+            airports=Airport.objects.values_list("id", "city").iterator(),
+            routes=Route.objects.values_list(
+                "source_id", "destination_id"
+            ).iterator(),
+            flights=(
+                (
+                    flight_id,
+                    source_id,
+                    destination_id,
+                    int(departure.timestamp()),
+                    int(arrival.timestamp()),
+                    seats,
+                    distance,
+                )
+                for (
+                    flight_id,
+                    source_id,
+                    destination_id,
+                    departure,
+                    arrival,
+                    seats,
+                    distance,
+                ) in flights.iterator(chunk_size=10000)
+            ),
+        )
+
+    def airports_in_city(self, city):
+        return self.cities.get(city.lower(), set())
+
+    def departing(self, airport_id, after, before):
+        start, end = self.offsets.get(airport_id, (0, 0))
+        low = bisect_left(self.departures, after, start, end)
+        high = bisect_left(self.departures, before, low, end)
+        return range(low, high)
+
+    def search(
+        self,
+        sources,
+        destinations,
+        departure_from,
+        departure_to,
+        max_stops=2,
+        min_connection=timedelta(minutes=45),
+        max_connection=timedelta(hours=6),
+        passengers=1,
+        limit=20,
+    ):
+        """
+        Find itineraries with up to max_stops connections, leaving any of
+        sources between departure_from and departure_to and arriving at any
+        of destinations. Legs are only expanded through airports that still
+        have a route towards the destinations.
+        Itineraries are ranked by arrival time, stops and total distance.
+        """
+        sources = set(sources)
+        destinations = set(destinations)
+        one_hop = set().union(
+            *(self.predecessors[airport] for airport in destinations)
+        )
+        two_hops = set().union(
+            *(self.predecessors[airport] for airport in one_hop)
+        )
+        min_wait = int(min_connection.total_seconds())
+        max_wait = int(max_connection.total_seconds())
+        departure_from = int(departure_from.timestamp())
+        departure_to = int(departure_to.timestamp())
+
+        destination_of = self.destinations
+        arrival_of = self.arrivals
+        seats_of = self.seats
+        found = []
+
+        def connections(leg):
+            return self.departing(
+                destination_of[leg],
+                arrival_of[leg] + min_wait,
+                arrival_of[leg] + max_wait + 1,
+            )
+
+        for source in sources:
+            for first in self.departing(source, departure_from, departure_to):
+                if seats_of[first] < passengers:
+                    continue
+                stop = destination_of[first]
+                if stop in destinations:
+                    found.append((first,))
+                    continue
+                if max_stops < 1 or stop in sources or not (
+                    stop in one_hop or (max_stops > 1 and stop in two_hops)
+                ):
+                    continue
+
+                for second in connections(first):
+                    if seats_of[second] < passengers:
+                        continue
+                    second_stop = destination_of[second]
+                    if second_stop in destinations:
+                        found.append((first, second))
+                        continue
+                    if (
+                        max_stops < 2
+                        or second_stop not in one_hop
+                        or second_stop in sources
+                    ):
+                        continue
+
+                    for third in connections(second):
+                        if (
+                            seats_of[third] >= passengers
+                            and destination_of[third] in destinations
+                        ):
+                            found.append((first, second, third))
+
+        return [
+            self.describe(legs)
+            for legs in heapq.nsmallest(
+                limit,
+                found,
+                key=lambda legs: (
+                    arrival_of[legs[-1]],
+                    len(legs),
+                    sum(self.distances[leg] for leg in legs),
+                    self.departures[legs[0]],
+                ),
+            )
+        ]
+
+    def describe(self, legs):
+        return {
+            "stops": len(legs) - 1,
+            "departure_time": to_datetime(self.departures[legs[0]]),
+            "arrival_time": to_datetime(self.arrivals[legs[-1]]),
+            "distance": sum(self.distances[leg] for leg in legs),
+            "legs": [
+                {
+                    "flight": self.ids[leg],
+                    "source": self.sources[leg],
+                    "destination": self.destinations[leg],
+                    "departure_time": to_datetime(self.departures[leg]),
+                    "arrival_time": to_datetime(self.arrivals[leg]),
+                    "seats_available": self.seats[leg],
+                }
+                for leg in legs
+            ],
+        }
+
+
+def to_datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_itinerary_index():
+    """
+    Return the process-wide index, rebuilding it once it is older than
+    ITINERARY_INDEX_TTL seconds. While one thread rebuilds, the others keep
+    serving the previous index.
+    """
+    global _index
+
+    index = _index
+    if index is not None and (
+        time.monotonic() - index.built_at < settings.ITINERARY_INDEX_TTL
+    ):
+        return index
+
+    if _index_lock.acquire(blocking=index is None):
+        try:
+            if _index is index:
+                _index = ItineraryIndex.load()
+        finally:
+            _index_lock.release()
+
+    return _index
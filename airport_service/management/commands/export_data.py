@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+
+from airport_service.exports import (
+    EXPORT_COLUMNS,
+    RENDERERS,
+    export,
+    get_export_queryset,
+)
+
+
+class Command(BaseCommand):
+    """
+    Django command to stream flights, orders or tickets to a file
+    """
+    help = "Export flights, orders or tickets as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", choices=list(EXPORT_COLUMNS))
+        parser.add_argument(
+            "--output", choices=list(RENDERERS), default="ndjson"
+        )
+        parser.add_argument(
+            "--file", help="Write to this path instead of stdout"
+        )
+        parser.add_argument(
+            "--filter",
+            action="append",
+            default=[],
+            metavar="NAME=VALUE",
+            help=(
+                "Flight filter, e.g. departure_time_after=2024-05-01 or "
+                "destination_place=Heathrow; may be repeated"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        params = QueryDict(mutable=True)
+        for item in options["filter"]:
+            name, separator, value = item.partition("=")
+            if not separator:
+                raise CommandError(f"Filter {item!r} is not NAME=VALUE")
+            params.appendlist(name, value)
+
+        queryset, errors = get_export_queryset(options["dataset"], params)
+        if errors:
+            raise CommandError(errors.as_text())
+
+        chunks = export(options["dataset"], queryset, options["output"])
+        if options["file"]:
+            with open(options["file"], "w", newline="") as file:
+                file.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
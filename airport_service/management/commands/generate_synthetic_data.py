@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from airport_service.synthetic_data import SyntheticDataGenerator
+
+
+class Command(BaseCommand):
+    """
+    Django command to fill the database with production-sized fake data
+    """
+    help = (
+        "Generate airports, routes, airplanes, crew, flights, users, orders "
+        "and tickets in bulk. Data is added to what already exists; the "
+        "same --seed produces the same data. Generated users are "
+        "load<id>@example.com with the given --password."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--airports", type=int, default=2000)
+        parser.add_argument("--routes", type=int, default=20000)
+        parser.add_argument("--airplanes", type=int, default=500)
+        parser.add_argument("--crew", type=int, default=2000)
+        parser.add_argument("--flights", type=int, default=200000)
+        parser.add_argument("--users", type=int, default=50000)
+        parser.add_argument("--orders", type=int, default=1000000)
+        parser.add_argument(
+            "--tickets-per-order",
+            type=int,
+            default=4,
+            help="Tickets per order are drawn from 1 to this value",
+        )
+        parser.add_argument(
+            "--days-before",
+            type=int,
+            default=60,
+            help="Flights depart from this many days ago ...",
+        )
+        parser.add_argument(
+            "--days-after",
+            type=int,
+            default=60,
+            help="... up to this many days from now",
+        )
+        parser.add_argument("--password", default="loadtest")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        generator = SyntheticDataGenerator(
+            seed=options["seed"],
+            batch_size=options["batch_size"],
+            progress=self.stdout.write,
+        )
+        started = time.monotonic()
+        counts = generator.run(
+            airports=options["airports"],
+            routes=options["routes"],
+            airplanes=options["airplanes"],
+            crew=options["crew"],
+            flights=options["flights"],
+            users=options["users"],
+            orders=options["orders"],
+            tickets_per_order=options["tickets_per_order"],
+            days_before=options["days_before"],
+            days_after=options["days_after"],
+            password=options["password"],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            ", ".join(f"{count} {name}" for name, count in counts.items())
+            + f" generated in {time.monotonic() - started:.0f}s"
+        ))
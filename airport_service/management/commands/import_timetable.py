@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from airport_service.timetable_import import (
+    TimetableImporter,
+    TimetableImportError,
+)
+
+
+class Command(BaseCommand):
+    """
+    Django command to bulk load a timetable from CSV/JSON files
+    """
+    help = (
+        "Import airports, airplanes, routes and flights from .csv, .json "
+        "or .ndjson files. Airports, airplanes, routes and crew are "
+        "referenced by name (crew also by id)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--airports", help="Columns: name, city"
+        )
+        parser.add_argument(
+            "--airplanes",
+            help="Columns: name, rows, seats_in_row, airplane_type",
+        )
+        parser.add_argument(
+            "--routes", help="Columns: source, destination, distance"
+        )
+        parser.add_argument(
+            "--flights",
+            help=(
+                "Columns: source, destination, airplane, crew, "
+                "departure_time, arrival_time (ISO 8601)"
+            ),
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--upsert",
+            action="store_true",
+            help="Update rows that already exist instead of adding new ones",
+        )
+
+    def handle(self, *args, **options):
+        files = {
+            name: options[name]
+            for name in ("airports", "airplanes", "routes", "flights")
+        }
+        if not any(files.values()):
+            raise CommandError("Nothing to import")
+
+        importer = TimetableImporter(
+            batch_size=options["batch_size"],
+            upsert=options["upsert"],
+            progress=self.stdout.write,
+        )
+        try:
+            counts = importer.run(**files)
+        except (TimetableImportError, OSError, ValueError) as error:
+            raise CommandError(f"Import aborted, nothing saved:\n{error}")
+
+        for name, (created, updated) in counts.items():
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: {created} created, {updated} updated"
+            ))
@@ -0,0 +1,79 @@
+from concurrent.futures import as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from airport_service.cache import bump_version
+from airport_service.images import (
+    IMAGE_FIELDS,
+    get_executor,
+    missing_variants,
+    process_image,
+    record_variants,
+)
+
+
+class Command(BaseCommand):
+    """
+    Django command to generate image variants of existing uploads
+    """
+    help = "Generate thumbnails and WebP copies of crew and airplane images"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Regenerate variants that already exist",
+        )
+
+    def handle(self, *args, **options):
+        names = {}
+        for model, fields in IMAGE_FIELDS.items():
+            for instance in model.objects.only(
+                "pk", "image_variants", *fields
+            ).iterator():
+                if options["all"]:
+                    found = [
+                        image.name
+                        for image in (getattr(instance, f) for f in fields)
+                        if image
+                    ]
+                else:
+                    found = missing_variants(instance)
+                names.update(dict.fromkeys(found, model))
+
+        failed = 0
+        if settings.IMAGE_PROCESSING_WORKERS:
+            futures = {
+                get_executor().submit(process_image, name): name
+                for name in names
+            }
+            results = (
+                (futures[future], future.exception())
+                for future in as_completed(futures)
+            )
+        else:
+            results = (self.process(name) for name in names)
+
+        for name, error in results:
+            if error is not None:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"{name}: {error}"))
+            else:
+                record_variants(names[name], name)
+
+        for model in IMAGE_FIELDS:
+            bump_version(model)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {len(names) - failed} image(s), {failed} failed"
+        ))
+
+    @staticmethod
+    def process(name):
+        try:
+            process_image(name)
+        except Exception as error:
+            return name, error
+
+        return name, None
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from airport_service.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    """
+    Django command to delete expired idempotency keys
+    """
+    help = "Delete idempotency keys older than IDEMPOTENCY_KEY_TTL seconds"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        deleted = IdempotencyKey.purge_expired(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} expired idempotency key(s)"
+        ))
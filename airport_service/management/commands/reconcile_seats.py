@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from airport_service.models import Flight, Ticket
+
+
+class Command(BaseCommand):
+    """
+    Django command to recount Flight.seats_sold from Ticket rows
+    """
+    help = "Reconcile Flight.seats_sold counters against booked tickets"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report flights with a drifted counter",
+        )
+
+    def handle(self, *args, **options):
+        tickets_count = Coalesce(
+            Subquery(
+                Ticket.objects.filter(flight=OuterRef("pk"))
+                .order_by()
+                .values("flight")
+                .annotate(count=Count("id"))
+                .values("count")
+            ),
+            0,
+        )
+        drifted = (
+            Flight.objects.alias(tickets_count=tickets_count)
+            .exclude(seats_sold=tickets_count)
+        )
+
+        for flight_id, seats_sold, actual in drifted.annotate(
+            actual=tickets_count
+        ).values_list("id", "seats_sold", "actual"):
+            self.stdout.write(f"Flight {flight_id}: {seats_sold} -> {actual}")
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Found {drifted.count()} drifted flight(s)"
+            ))
+            return
+
+        fixed = drifted.update(seats_sold=tickets_count)
+        self.stdout.write(self.style.SUCCESS(
+            f"Fixed {fixed} drifted flight(s)"
+        ))
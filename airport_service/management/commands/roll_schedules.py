@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from airport_service.schedules import roll_schedules
+
+
+class Command(BaseCommand):
+    """
+    Django command to materialize recurring schedules into flights
+    """
+    help = "Create missing flights of active schedules for the horizon"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.SCHEDULE_HORIZON_DAYS,
+            help="Horizon in days from today",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rolled, generated = roll_schedules(
+            options["days"], batch_size=options["batch_size"]
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled {rolled} schedule(s), {generated} flight(s) generated"
+        ))
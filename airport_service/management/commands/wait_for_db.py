@@ -1,30 +1,49 @@
 import time
 
 from django.db import connections
-from psycopg2 import OperationalError
+from django.db.utils import OperationalError
 
 from django.core.management.base import BaseCommand
 
 
 class Command(BaseCommand):
     """
-    Django command to wait for the database to come up
+    Django command to wait for the databases to come up.
+    Every configured alias is opened through its connection handler and
+    checked with the same query used by the persistent-connection health
+    checks.
     """
     def handle(self, *args, **options):
         self.stdout.write("Wait for database...")
         max_attempts = 10
         attempts = 0
-        db_up = False
-        while not db_up and attempts < max_attempts:
-            try:
-                connections["default"].ensure_connection()
-                db_up = True
-            except OperationalError as e:
+        pending = list(connections)
+        while pending and attempts < max_attempts:
+            for alias in list(pending):
+                connection = connections[alias]
+                try:
+                    connection.ensure_connection()
+                    if not connection.is_usable():
+                        raise OperationalError("health check failed")
+                except OperationalError as e:
+                    connection.close()
+                    self.stdout.write(
+                        f"Attempt {attempts + 1}/{max_attempts} "
+                        f"({alias}): {e}"
+                    )
+                else:
+                    pending.remove(alias)
+                    settings = connection.settings_dict
+                    self.stdout.write(
+                        f"{alias}: max age {settings['CONN_MAX_AGE']}s, "
+                        f"health checks {settings['CONN_HEALTH_CHECKS']}"
+                    )
+
+            if pending:
                 attempts += 1
-                self.stdout.write(f"Attempt {attempts}/{max_attempts}: {e}")
                 time.sleep(1)
 
-        if db_up:
+        if not pending:
             self.stdout.write(self.style.SUCCESS("Database available"))
         else:
             self.stdout.write(self.style.ERROR(
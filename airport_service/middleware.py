@@ -0,0 +1,75 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from airport_service.instrumentation import finish_request, start_request
+
+
+def view_label(request):
+    """
+    "FlightViewSet.list" for viewsets, the view class or URL name otherwise
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+
+    view_class = getattr(match.func, "cls", None) or getattr(
+        match.func, "view_class", None
+    )
+    if view_class is None:
+        return match.view_name
+
+    method = request.method.lower()
+    actions = getattr(match.func, "actions", None)
+    if actions:
+        return f"{view_class.__name__}.{actions.get(method, method)}"
+
+    return f"{view_class.__name__}.{method}"
+
+
+class RequestMetricsMiddleware:
+    """
+    Records DB query count, DB time, serializer time and total time of
+    every request per view action, and reports them in a Server-Timing
+    header. Not loaded at all with REQUEST_METRICS_ENABLED = False.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        metrics, token = start_request()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            finish_request(view_label(request), metrics, token)
+            raise
+
+        return self.finish(request, response, metrics, token)
+
+    async def __acall__(self, request):
+        metrics, token = start_request()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            finish_request(view_label(request), metrics, token)
+            raise
+
+        return self.finish(request, response, metrics, token)
+
+    def finish(self, request, response, metrics, token):
+        total = finish_request(view_label(request), metrics, token)
+        response["Server-Timing"] = metrics.server_timing(total)
+        return response
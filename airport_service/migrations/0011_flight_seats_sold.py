@@ -0,0 +1,32 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_seats_sold(apps, schema_editor):
+    Flight = apps.get_model("airport_service", "Flight")
+    Ticket = apps.get_model("airport_service", "Ticket")
+    sold = (
+        Ticket.objects.filter(flight=OuterRef("pk"))
+        .order_by()
+        .values("flight")
+        .annotate(count=Count("id"))
+        .values("count")
+    )
+    Flight.objects.update(seats_sold=Coalesce(Subquery(sold), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("airport_service", "0010_alter_ticket_flight"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="flight",
+            name="seats_sold",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_seats_sold, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("airport_service", "0011_flight_seats_sold"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="airport",
+            index=models.Index(fields=["name"], name="airport_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="airport",
+            index=models.Index(fields=["city"], name="airport_city_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="flight",
+            index=models.Index(
+                fields=["departure_time", "id"], name="flight_departure_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="flight",
+            index=models.Index(fields=["arrival_time"], name="flight_arrival_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="flight",
+            index=models.Index(
+                fields=["route", "departure_time"], name="flight_route_departure_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["user", "created_at", "id"], name="order_user_created_idx"
+            ),
+        ),
+    ]
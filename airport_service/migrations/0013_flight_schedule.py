@@ -0,0 +1,79 @@
+# Generated by Django 5.0.3 on 2026-10-18 17:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("airport_service", "0012_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FlightSchedule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("departure_time", models.TimeField()),
+                ("duration", models.DurationField()),
+                ("days_of_week", models.CharField(default="1234567", max_length=7)),
+                ("start_date", models.DateField()),
+                ("end_date", models.DateField(blank=True, null=True)),
+                (
+                    "generated_until",
+                    models.DateField(blank=True, editable=False, null=True),
+                ),
+                (
+                    "airplane",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="schedules",
+                        to="airport_service.airplane",
+                    ),
+                ),
+                (
+                    "crew",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="schedules",
+                        to="airport_service.crew",
+                    ),
+                ),
+                (
+                    "route",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="schedules",
+                        to="airport_service.route",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="flight",
+            name="schedule",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="flights",
+                to="airport_service.flightschedule",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="flight",
+            constraint=models.UniqueConstraint(
+                fields=("schedule", "departure_time"),
+                name="flight_schedule_departure_unique",
+            ),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.3 on 2026-10-18 18:27
+
+import os
+
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+IMAGE_FIELDS = {
+    "crew": ("image",),
+    "airplane": ("outside_image", "inside_image"),
+}
+
+
+def record_existing_variants(apps, schema_editor):
+    """
+    Record uploads whose variants were generated before image_variants
+    existed; this is the last time the storage is probed for them
+    """
+    for model_name, fields in IMAGE_FIELDS.items():
+        model = apps.get_model("airport_service", model_name)
+        for instance in model.objects.only("pk", *fields).iterator():
+            image_variants = {}
+            for field in fields:
+                name = getattr(instance, field).name
+                root, _ = os.path.splitext(name or "")
+                if name and default_storage.exists(f"{root}.thumb.webp"):
+                    image_variants[field] = name
+            if image_variants:
+                model.objects.filter(pk=instance.pk).update(
+                    image_variants=image_variants
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("airport_service", "0014_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="airplane",
+            name="image_variants",
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name="crew",
+            name="image_variants",
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.RunPython(
+            record_existing_variants, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.3 on 2026-10-18 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("airport_service", "0015_image_variants"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="flight",
+            constraint=models.UniqueConstraint(
+                fields=("route", "departure_time"),
+                name="flight_route_departure_unique",
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="flight",
+            name="flight_route_departure_idx",
+        ),
+    ]
@@ -0,0 +1,344 @@
+import hashlib
+
+import orjson
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils import timezone
+from django_filters.filters import BaseInFilter
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from airport_service.cache import get_cache, get_versions, response_key
+from airport_service.db_router import (
+    get_read_alias,
+    pin_to_primary,
+    read_from,
+    reset_read_alias,
+    set_read_alias,
+)
+from airport_service.exceptions import IdempotencyKeyReused
+from airport_service.instrumentation import serializer_timer
+from airport_service.models import IdempotencyKey
+
+
+class ReplicaReadMixin:
+    """
+    Runs the queries of safe requests on the read replica. A successful
+    write pins the user to the primary for READ_YOUR_WRITES_WINDOW seconds,
+    so the following reads see it.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        if request.method in SAFE_METHODS:
+            self._read_alias_token = set_read_alias(
+                get_read_alias(request.user)
+            )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, "_read_alias_token", None)
+        if token is not None:
+            reset_read_alias(token)
+            self._read_alias_token = None
+        elif (
+            request.method not in SAFE_METHODS
+            and status.is_success(response.status_code)
+            and request.user.is_authenticated
+        ):
+            pin_to_primary(request.user)
+
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class CachedResponseMixin:
+    """
+    Caches list and retrieve responses of read-mostly viewsets.
+    Keys include version stamps of cache_models, which are replaced on
+    post_save/post_delete, so edits are visible on the next request.
+    Misses are filled from the primary: a lagging replica could otherwise
+    store pre-write rows under the new version stamp.
+    """
+    cache_models = ()
+
+    def get_cache_params(self, request):
+        filterset_class = getattr(self, "filterset_class", None)
+        in_filters = {
+            name
+            for name, field in (
+                filterset_class.base_filters.items() if filterset_class else ()
+            )
+            if isinstance(field, BaseInFilter)
+        }
+        params = []
+
+        for name, values in sorted(request.query_params.lists()):
+            if name in in_filters:
+                values = sorted(
+                    {item for value in values for item in value.split(",")}
+                )
+            params.append((name, tuple(values)))
+
+        return (
+            request.scheme,
+            request.get_host(),
+            self.action,
+            tuple(sorted(self.kwargs.items())),
+            tuple(params),
+        )
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        cache = get_cache()
+        key = response_key(
+            f"{self.__class__.__name__}",
+            get_versions(self.cache_models or (self.queryset.model,)),
+            self.get_cache_params(request),
+        )
+
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        with read_from(DEFAULT_DB_ALIAS):
+            response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TIMEOUT)
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+def request_fingerprint(request):
+    """
+    Hash of the path and the parsed body, insensitive to key order and
+    formatting of the JSON the client sent
+    """
+    body = orjson.dumps(
+        request.data,
+        default=str,
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS,
+    )
+    return hashlib.sha256(request.path.encode() + b"\n" + body).hexdigest()
+
+
+class IdempotentCreateMixin:
+    """
+    Honors an Idempotency-Key header on create. The key is stored in the
+    transaction that creates the object, together with the request
+    fingerprint and the response, so a retry gets the stored response
+    without validating again, and a concurrent retry waits on the key's
+    unique index until the first request commits or rolls back. Failed
+    requests roll the key back and may be retried. Keys are replayed for
+    IDEMPOTENCY_KEY_TTL seconds.
+    """
+    idempotency_header = "Idempotency-Key"
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(self.idempotency_header)
+        if key is None:
+            return super().create(request, *args, **kwargs)
+
+        max_length = IdempotencyKey._meta.get_field("key").max_length
+        if not 0 < len(key) <= max_length:
+            raise ValidationError(
+                {
+                    self.idempotency_header: (
+                        f"Must be 1 to {max_length} characters long"
+                    )
+                }
+            )
+
+        fingerprint = request_fingerprint(request)
+        with transaction.atomic():
+            record, created = (
+                IdempotencyKey.objects.select_for_update().get_or_create(
+                    user=request.user,
+                    key=key,
+                    defaults={"fingerprint": fingerprint},
+                )
+            )
+            if not created and not record.is_expired:
+                if record.fingerprint != fingerprint:
+                    raise IdempotencyKeyReused()
+                return Response(
+                    record.response_body,
+                    status=record.response_status,
+                    headers={"Idempotent-Replayed": "true"},
+                )
+
+            response = super().create(request, *args, **kwargs)
+            record.fingerprint = fingerprint
+            record.response_status = response.status_code
+            record.response_body = response.data
+            record.created_at = timezone.now()
+            record.save()
+
+        return response
+
+
+def parse_expand(value):
+    """
+    "tickets.flight,crew" -> {"tickets": {"flight": {}}, "crew": {}}
+    """
+    tree = {}
+    for path in value.split(","):
+        node = tree
+        for name in filter(None, path.strip().split(".")):
+            node = node.setdefault(name, {})
+
+    return tree
+
+
+class SparseFieldsetMixin:
+    """
+    Passes ?fields= and ?expand= of list and retrieve requests to the
+    serializer and joins only the relations the response will render:
+    field_relations are joined when the serializer renders their field,
+    expand_relations (keyed by dotted expand path) when it is expanded;
+    override get_expand_relations() to vary them by action.
+    """
+    sparse_actions = ("list", "retrieve")
+    field_relations = {}
+    expand_relations = {}
+
+    def get_fieldset(self):
+        request = getattr(self, "request", None)
+        if request is None or self.action not in self.sparse_actions:
+            return None, None
+
+        fields = request.query_params.get("fields")
+        expand = request.query_params.get("expand")
+
+        return (
+            {name.strip() for name in fields.split(",")}
+            if fields is not None
+            else None,
+            parse_expand(expand) if expand is not None else None,
+        )
+
+    def includes(self, name):
+        fields, _ = self.get_fieldset()
+        if fields is None:
+            fields = self.get_serializer_class().Meta.fields
+
+        return name in fields
+
+    def expands(self, path):
+        names = path.split(".")
+        if not self.includes(names[0]):
+            return False
+
+        _, node = self.get_fieldset()
+        if node is None:
+            return True
+
+        for name in names:
+            if name not in node:
+                return False
+            node = node[name]
+
+        return True
+
+    def select_related(self, queryset):
+        """
+        select_related() without arguments would follow every foreign key
+        """
+        relations = self.get_select_related()
+        return queryset.select_related(*relations) if relations else queryset
+
+    def get_expand_relations(self):
+        return self.expand_relations
+
+    def get_select_related(self):
+        relations = set()
+        for name, paths in self.field_relations.items():
+            if self.includes(name):
+                relations.update(paths)
+        for path, paths in self.get_expand_relations().items():
+            if self.expands(path):
+                relations.update(paths)
+
+        return sorted(relations)
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.get_fieldset()
+        if fields is not None:
+            kwargs.setdefault("fields", fields)
+        if expand is not None:
+            kwargs.setdefault("expand", expand)
+
+        return super().get_serializer(*args, **kwargs)
+
+
+class SerializerTimingMixin:
+    """
+    Counts building list and retrieve response data as serializer time
+    of the request metrics
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            with serializer_timer():
+                data = serializer.data
+            return self.get_paginated_response(data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        with serializer_timer():
+            data = serializer.data
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        serializer = self.get_serializer(self.get_object())
+        with serializer_timer():
+            data = serializer.data
+        return Response(data)
+
+
+class RowMapperListMixin:
+    """
+    Serves list requests from .values() rows through list_mapper, a
+    RowMapper producing the same JSON as the list serializer, so no model
+    instances or serializer fields are built per row. Requests with
+    ?fields= or ?expand= take the serializer path.
+    """
+    list_mapper = None
+
+    def use_list_mapper(self):
+        if self.list_mapper is None:
+            return False
+
+        get_fieldset = getattr(self, "get_fieldset", None)
+        return get_fieldset is None or get_fieldset() == (None, None)
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_list_mapper():
+            return super().list(request, *args, **kwargs)
+
+        rows = self.list_mapper.values(
+            self.filter_queryset(self.get_queryset())
+        )
+        context = self.get_serializer_context()
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            with serializer_timer():
+                data = self.list_mapper.map(page, context)
+            return self.get_paginated_response(data)
+
+        rows = list(rows)
+        with serializer_timer():
+            data = self.list_mapper.map(rows, context)
+        return Response(data)
@@ -1,7 +1,12 @@
+from datetime import timedelta
+
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 from django.core.exceptions import ValidationError
-from AirportApi import settings
+from django.conf import settings
 from airport_service.used_functions.image_file_path import (
     crew_image_file_path,
     airplane_image_file_path,
@@ -19,6 +24,8 @@ class Crew(models.Model):
     first_name = models.CharField(max_length=64)
     last_name = models.CharField(max_length=64, null=True, blank=True)
     image = models.ImageField(null=True, upload_to=crew_image_file_path)
+    # Image field -> the stored name its WebP variants were generated from
+    image_variants = models.JSONField(default=dict, editable=False)
 
     @property
     def full_name(self):
@@ -36,6 +43,12 @@ class Airport(models.Model):
         blank=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["name"], name="airport_name_idx"),
+            models.Index(fields=["city"], name="airport_city_idx"),
+        ]
+
     def __str__(self):
         return f"{self.name}, {self.city}"
 
@@ -68,6 +81,7 @@ class Airplane(models.Model):
     )
     inside_image = models.ImageField(null=True, upload_to=airplane_image_file_path)
     outside_image = models.ImageField(null=True, upload_to=airplane_image_file_path)
+    image_variants = models.JSONField(default=dict, editable=False)
 
     @property
     def all_seats(self):
@@ -77,6 +91,49 @@ class Airplane(models.Model):
         return f"{self.name}"
 
 
+class FlightSchedule(models.Model):
+    """
+    Recurring flight: departs at departure_time (project time zone) on the
+    ISO weekdays listed in days_of_week ("1" is Monday) between start_date
+    and end_date. generated_until is the last date already materialized
+    into Flight rows.
+    """
+    route = models.ForeignKey(
+        "Route",
+        on_delete=models.CASCADE,
+        related_name="schedules",
+    )
+    airplane = models.ForeignKey(
+        "Airplane",
+        on_delete=models.CASCADE,
+        related_name="schedules",
+    )
+    crew = models.ForeignKey(
+        "Crew",
+        on_delete=models.CASCADE,
+        related_name="schedules",
+    )
+    departure_time = models.TimeField()
+    duration = models.DurationField()
+    days_of_week = models.CharField(max_length=7, default="1234567")
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    generated_until = models.DateField(null=True, blank=True, editable=False)
+
+    def clean(self):
+        if not self.days_of_week or set(self.days_of_week) - set("1234567"):
+            raise ValidationError(
+                {"days_of_week": "Use ISO weekday digits, e.g. 135 or 1234567"}
+            )
+        if self.end_date and self.end_date < self.start_date:
+            raise ValidationError(
+                {"end_date": "end_date must not be before start_date"}
+            )
+
+    def __str__(self):
+        return f"{self.route} at {self.departure_time} on {self.days_of_week}"
+
+
 class Flight(models.Model):
     route = models.ForeignKey(
         "Route",
@@ -95,6 +152,49 @@ class Flight(models.Model):
         on_delete=models.CASCADE,
         related_name="flights",
     )
+    seats_sold = models.PositiveIntegerField(default=0, editable=False)
+    schedule = models.ForeignKey(
+        "FlightSchedule",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="flights",
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["schedule", "departure_time"],
+                name="flight_schedule_departure_unique",
+            ),
+            models.UniqueConstraint(
+                fields=["route", "departure_time"],
+                name="flight_route_departure_unique",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["departure_time", "id"],
+                name="flight_departure_idx",
+            ),
+            models.Index(fields=["arrival_time"], name="flight_arrival_idx"),
+        ]
+
+    @property
+    def seats_available(self):
+        return self.airplane.all_seats - self.seats_sold
+
+    @cached_property
+    def taken_seats(self):
+        if "tickets" in getattr(self, "_prefetched_objects_cache", {}):
+            return [(ticket.row, ticket.seat) for ticket in self.tickets.all()]
+        return list(self.tickets.values_list("row", "seat"))
+
+    @classmethod
+    def change_seats_sold(cls, flight_id, delta):
+        cls.objects.filter(pk=flight_id).update(
+            seats_sold=F("seats_sold") + delta
+        )
 
     def __str__(self):
         return f"{self.route} from {self.departure_time} to {self.arrival_time}"
@@ -104,6 +204,14 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "created_at", "id"],
+                name="order_user_created_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.created_at}"
 
@@ -151,6 +259,13 @@ class Ticket(models.Model):
             ValidationError,
         )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The flight the row is counted on, for moves between flights
+        instance.saved_flight_id = instance.__dict__.get("flight_id")
+        return instance
+
     def save(
         self,
         force_insert=False,
@@ -169,3 +284,55 @@ class Ticket(models.Model):
             f"(row: {self.row}, seat: {self.seat})"
         )
 
+
+class IdempotencyKey(models.Model):
+    """
+    Idempotency-Key of a create request with the fingerprint of its body
+    and the response it got, replayed when the client retries the request
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True)
+    response_body = models.JSONField(null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="idempotency_user_key_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["created_at"], name="idempotency_created_idx"
+            ),
+        ]
+
+    @staticmethod
+    def expires_before():
+        return timezone.now() - timedelta(
+            seconds=settings.IDEMPOTENCY_KEY_TTL
+        )
+
+    @property
+    def is_expired(self):
+        return self.created_at < self.expires_before()
+
+    @classmethod
+    def purge_expired(cls, batch_size=10000):
+        """
+        Delete expired keys batch_size rows per statement, so no single
+        DELETE holds locks for long; returns the number deleted
+        """
+        expired = cls.objects.filter(created_at__lt=cls.expires_before())
+        deleted = 0
+        while True:
+            batch = list(expired.values_list("pk", flat=True)[:batch_size])
+            if not batch:
+                return deleted
+            deleted += cls.objects.filter(pk__in=batch).delete()[0]
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
+
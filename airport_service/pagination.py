@@ -0,0 +1,134 @@
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+def reverse_ordering(ordering):
+    return tuple(
+        field[1:] if field.startswith("-") else f"-{field}"
+        for field in ordering
+    )
+
+
+def keyset_filter(ordering, values):
+    """
+    Rows after values in ordering:
+    ("a", "-b"), (1, 2) -> a >= 1 AND (a > 1 OR (a = 1 AND b < 2)).
+    The leading a >= 1 lets the database range-scan an (a, b) index.
+    """
+    after = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        after |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+
+    first = ordering[0]
+    lookup = "lte" if first.startswith("-") else "gte"
+    return Q(**{f"{first.lstrip('-')}__{lookup}": values[0]}) & after
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    CursorPagination whose cursor holds the values of every ordering
+    field, not only the first one. A page is one WHERE on the full key
+    plus LIMIT, so rows sharing a departure_time or created_at never fall
+    back to an OFFSET scan. The ordering must end with a unique field.
+    Cursors are DRF's opaque tokens; offsets are not used.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        self.position = self.decode_position(self.cursor, queryset.model)
+        reverse = self.cursor is not None and self.cursor.reverse
+
+        ordering = self.ordering
+        if reverse:
+            ordering = reverse_ordering(ordering)
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(keyset_filter(ordering, self.position))
+
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+
+        return self.page
+
+    def decode_position(self, cursor, model):
+        """
+        Values of the ordering fields in cursor, parsed by their model
+        fields, so a forged cursor is a 404 rather than a database error
+        """
+        if cursor is None or cursor.position is None:
+            return None
+
+        try:
+            position = json.loads(cursor.position)
+            if not isinstance(position, list) or (
+                len(position) != len(self.ordering)
+            ):
+                raise ValueError("position does not match the ordering")
+
+            values = [
+                model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+            if None in values:
+                raise ValueError("position has a null value")
+
+            return values
+        except (ValueError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_position(self, item):
+        values = [
+            item[name] if isinstance(item, dict) else getattr(item, name)
+            for name in (field.lstrip("-") for field in self.ordering)
+        ]
+        return json.dumps(
+            [
+                value.isoformat() if hasattr(value, "isoformat") else value
+                for value in values
+            ],
+            separators=(",", ":"),
+        )
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Nothing before the cursor: the next page is the first one
+            return self.encode_cursor(Cursor(0, False, None))
+
+        return self.encode_cursor(
+            Cursor(0, False, self.encode_position(self.page[-1]))
+        )
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return self.encode_cursor(Cursor(0, True, self.cursor.position))
+
+        return self.encode_cursor(
+            Cursor(0, True, self.encode_position(self.page[0]))
+        )
@@ -0,0 +1,27 @@
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from airport_service.renderers import ORJSONRenderer
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSONParser on orjson. The body is read in one piece and parsed from
+    bytes; NaN and Infinity are rejected, as with STRICT_JSON.
+    """
+
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+
+        try:
+            content = stream.read()
+            if encoding.lower().replace("-", "") != "utf8":
+                content = content.decode(encoding)
+            return orjson.loads(content)
+        except ValueError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
@@ -0,0 +1,48 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer on orjson. Datetimes, dates, UUIDs and dict/list
+    subclasses (ReturnDict, ReturnList) are encoded natively; Decimals,
+    lazy translation strings, querysets and the rest go through DRF's
+    JSONEncoder.default, so the output matches JSONRenderer, apart from
+    datetime objects keeping their microseconds (serializer fields have
+    already turned datetimes into strings).
+    orjson only indents by two spaces and cannot escape non-ASCII
+    characters: with UNICODE_JSON = False the stdlib renderer is used.
+    """
+
+    options = orjson.OPT_UTC_Z
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b""
+
+        options = self.options
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+
+        default = self.encoder_class().default
+        try:
+            content = orjson.dumps(data, default=default, option=options)
+        except orjson.JSONEncodeError:
+            # Non-string keys are slower to check for, so only on retry
+            content = orjson.dumps(
+                data,
+                default=default,
+                option=options | orjson.OPT_NON_STR_KEYS,
+            )
+
+        # Same JavaScript-safe escaping of U+2028 and U+2029 as
+        # JSONRenderer; both start with 0xE2, which is quick to look for
+        if b"\xe2" in content:
+            content = content.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+
+        return content
@@ -0,0 +1,222 @@
+from operator import mul
+
+from django.core.files.storage import default_storage
+from rest_framework.fields import DateTimeField
+
+from airport_service.images import has_variants, variant_url
+
+
+class Column:
+    """
+    Value of one .values() lookup, optionally passed through convert
+    """
+
+    def __init__(self, lookup, convert=None):
+        self.lookups = (lookup,)
+        self.convert = convert
+
+    def compile(self):
+        lookup, convert = self.lookups[0], self.convert
+        if convert is None:
+            return lambda row, context: row[lookup]
+
+        return lambda row, context: convert(row[lookup])
+
+
+class Computed(Column):
+    """
+    function of several lookups, e.g. a property of the model
+    """
+
+    def __init__(self, function, *lookups):
+        self.lookups = lookups
+        self.function = function
+
+    def compile(self):
+        lookups, function = self.lookups, self.function
+        return lambda row, context: function(*(row[name] for name in lookups))
+
+
+class DateTime(Column):
+    """
+    Same output as serializers.DateTimeField, including the conversion to
+    the current time zone
+    """
+
+    def __init__(self, lookup):
+        super().__init__(lookup, DateTimeField().to_representation)
+
+
+class ImageVariant(Column):
+    """
+    Same output as ImageVariantField for images on the default storage;
+    image_variants is read next to the image lookup. URLs are memoized per
+    request in the mapping context.
+    """
+
+    def __init__(self, lookup, variant):
+        prefix, _, field = lookup.rpartition("__")
+        self.field = field
+        variants_lookup = (
+            f"{prefix}__image_variants" if prefix else "image_variants"
+        )
+        self.lookups = (lookup, variants_lookup)
+        self.convert = None
+        self.variant = variant
+
+    def compile(self):
+        lookup, variants_lookup = self.lookups
+        field, variant = self.field, self.variant
+
+        def image(row, context):
+            name = row[lookup]
+            if not name:
+                return None
+
+            processed = has_variants(row[variants_lookup], field, name)
+            urls = context.setdefault("image_urls", {})
+            if (name, variant, processed) not in urls:
+                url = variant_url(name, variant, processed, default_storage)
+                request = context.get("request")
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                urls[name, variant, processed] = url
+
+            return urls[name, variant, processed]
+
+        return image
+
+
+class RowMapper:
+    """
+    Representation of a list serializer assembled straight from .values()
+    rows, without model instances or serializer fields. fields maps output
+    keys, in serializer order, to lookups, Column instances or nested
+    dicts of them; getters are compiled once, when the mapper is created.
+    """
+
+    def __init__(self, fields):
+        self.lookups = tuple(sorted(set(self.collect(fields))))
+        self.getters = self.compile(fields)
+
+    def collect(self, fields):
+        for field in fields.values():
+            if isinstance(field, dict):
+                yield from self.collect(field)
+            elif isinstance(field, Column):
+                yield from field.lookups
+            else:
+                yield field
+
+    def compile(self, fields):
+        getters = []
+        for key, field in fields.items():
+            if isinstance(field, dict):
+                getters.append((key, self.compile_nested(field)))
+            elif isinstance(field, Column):
+                getters.append((key, field.compile()))
+            else:
+                getters.append((key, Column(field).compile()))
+
+        return tuple(getters)
+
+    def compile_nested(self, fields):
+        getters = self.compile(fields)
+        return lambda row, context: {
+            key: getter(row, context) for key, getter in getters
+        }
+
+    def values(self, queryset):
+        return queryset.values(*self.lookups)
+
+    def map(self, rows, context):
+        getters = self.getters
+        return [
+            {key: getter(row, context) for key, getter in getters}
+            for row in rows
+        ]
+
+
+def airport_label(name, city):
+    return f"{name}, {city}"
+
+
+def full_name(first_name, last_name):
+    return f"{first_name} {last_name}"
+
+
+def seats_available(rows, seats_in_row, seats_sold):
+    return rows * seats_in_row - seats_sold
+
+
+def airport(prefix):
+    return {
+        "id": f"{prefix}__id",
+        "name": f"{prefix}__name",
+        "city": f"{prefix}__city",
+    }
+
+
+# RouteListSerializer
+route_list_mapper = RowMapper(
+    {
+        "id": "id",
+        "source": airport("source"),
+        "destination": airport("destination"),
+        "distance": "distance",
+    }
+)
+
+# AirplaneListSerializer
+airplane_list_mapper = RowMapper(
+    {
+        "id": "id",
+        "name": "name",
+        "airplane": "airplane__name",
+        "all_seats": Computed(mul, "rows", "seats_in_row"),
+        "outside_image": ImageVariant("outside_image", "thumb"),
+        "inside_image": ImageVariant("inside_image", "thumb"),
+    }
+)
+
+# FlightListSerializer
+flight_list_mapper = RowMapper(
+    {
+        "id": "id",
+        "arrival_place": Computed(
+            airport_label, "route__source__name", "route__source__city"
+        ),
+        "destination_place": Computed(
+            airport_label,
+            "route__destination__name",
+            "route__destination__city",
+        ),
+        "airplane": {
+            "id": "airplane_id",
+            "name": "airplane__name",
+            "airplane": "airplane__airplane__name",
+            "rows": "airplane__rows",
+            "seats_in_row": "airplane__seats_in_row",
+            "all_seats": Computed(
+                mul, "airplane__rows", "airplane__seats_in_row"
+            ),
+            "outside_image": ImageVariant("airplane__outside_image", "thumb"),
+            "inside_image": ImageVariant("airplane__inside_image", "thumb"),
+        },
+        "seats_available": Computed(
+            seats_available,
+            "airplane__rows",
+            "airplane__seats_in_row",
+            "seats_sold",
+        ),
+        "departure_time": DateTime("departure_time"),
+        "arrival_time": DateTime("arrival_time"),
+        "crew": {
+            "id": "crew_id",
+            "full_name": Computed(
+                full_name, "crew__first_name", "crew__last_name"
+            ),
+            "image": ImageVariant("crew__image", "thumb"),
+        },
+    }
+)
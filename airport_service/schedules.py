@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from airport_service.models import Flight, FlightSchedule
+
+
+def schedule_dates(schedule, first, last):
+    days = {int(day) for day in schedule.days_of_week}
+    date = first
+    while date <= last:
+        if date.isoweekday() in days:
+            yield date
+        date += timedelta(days=1)
+
+
+def expand_schedule(schedule, until, today):
+    """
+    Unsaved flights of schedule for the dates after generated_until, from
+    today at the earliest, up to until (or end_date if earlier).
+    Returns (flights, last date covered).
+    """
+    first = max(schedule.start_date, today)
+    if schedule.generated_until:
+        first = max(first, schedule.generated_until + timedelta(days=1))
+    last = min(until, schedule.end_date) if schedule.end_date else until
+    current_timezone = timezone.get_current_timezone()
+
+    flights = []
+    for date in schedule_dates(schedule, first, last):
+        departure = timezone.make_aware(
+            datetime.combine(date, schedule.departure_time), current_timezone
+        )
+        flights.append(
+            Flight(
+                schedule=schedule,
+                route_id=schedule.route_id,
+                airplane_id=schedule.airplane_id,
+                crew_id=schedule.crew_id,
+                departure_time=departure,
+                arrival_time=departure + schedule.duration,
+            )
+        )
+
+    return flights, last
+
+
+def roll_schedules(horizon_days, today=None, batch_size=5000):
+    """
+    Materialize every active schedule up to today + horizon_days.
+    Only dates after each schedule's generated_until are expanded and
+    inserted with bulk_create; the unique (schedule, departure_time)
+    constraint makes reruns and overlapping runs harmless.
+    Returns (schedules rolled, flights generated); flights that already
+    existed are skipped by the database and not counted.
+    """
+    today = today or timezone.localdate()
+    until = today + timedelta(days=horizon_days)
+    schedules = (
+        FlightSchedule.objects.filter(start_date__lte=until)
+        .exclude(end_date__lt=today)
+        .exclude(generated_until__gte=until)
+        .exclude(generated_until__gte=F("end_date"))
+        .order_by("id")
+    )
+
+    with transaction.atomic():
+        locked = list(schedules.select_for_update(skip_locked=True))
+        scheduled = Flight.objects.filter(schedule__in=locked)
+        existing = scheduled.count() if locked else 0
+
+        pending = []
+        for schedule in locked:
+            flights, last = expand_schedule(schedule, until, today)
+            pending.extend(flights)
+            schedule.generated_until = last
+
+            if len(pending) >= batch_size:
+                Flight.objects.bulk_create(
+                    pending, batch_size=batch_size, ignore_conflicts=True
+                )
+                pending = []
+
+        Flight.objects.bulk_create(
+            pending, batch_size=batch_size, ignore_conflicts=True
+        )
+        FlightSchedule.objects.bulk_update(
+            locked, ["generated_until"], batch_size=batch_size
+        )
+        # bulk_create() also returns the rows the database skipped
+        generated = scheduled.count() - existing if locked else 0
+
+    return len(locked), generated
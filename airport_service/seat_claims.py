@@ -0,0 +1,83 @@
+from collections import Counter
+
+from django.db import connections, router, transaction
+from django.db.models import Case, F, When
+
+from airport_service.exceptions import SeatsAlreadyTaken
+from airport_service.models import Flight, Ticket
+
+
+def claim_seats(order, tickets_data):
+    """
+    Insert tickets of the order in one round trip with
+    INSERT ... ON CONFLICT DO NOTHING RETURNING on the
+    ("flight", "row", "seat") unique key.
+    If any seat was claimed by someone else the whole transaction is rolled
+    back and SeatsAlreadyTaken lists exactly the lost seats.
+    Rows are inserted in (flight, row, seat) order, so buyers of
+    overlapping seats lock them in the same order and cannot deadlock.
+    """
+    using = router.db_for_write(Ticket)
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    opts = Ticket._meta
+    columns = [
+        opts.get_field(name).column
+        for name in ("flight", "order", "row", "seat")
+    ]
+    conflict_columns = [
+        opts.get_field(name).column
+        for name in ("flight", "row", "seat")
+    ]
+    requested = [
+        (ticket_data["flight"].id, ticket_data["row"], ticket_data["seat"])
+        for ticket_data in tickets_data
+    ]
+
+    sql = (
+        f"INSERT INTO {quote_name(opts.db_table)} "
+        f"({', '.join(map(quote_name, columns))}) "
+        f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(requested))} "
+        f"ON CONFLICT ({', '.join(map(quote_name, conflict_columns))}) "
+        f"DO NOTHING "
+        f"RETURNING {quote_name(opts.pk.column)}, "
+        f"{', '.join(map(quote_name, conflict_columns))}"
+    )
+    params = [
+        value
+        for flight_id, row, seat in sorted(requested)
+        for value in (flight_id, order.id, row, seat)
+    ]
+
+    with transaction.atomic(using=using, savepoint=False):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            claimed = {
+                (flight_id, row, seat): ticket_id
+                for ticket_id, flight_id, row, seat in cursor.fetchall()
+            }
+
+        lost = [seat for seat in requested if seat not in claimed]
+        if lost:
+            raise SeatsAlreadyTaken(lost)
+
+        sold = Counter(flight_id for flight_id, _, _ in requested)
+        Flight.objects.filter(pk__in=sold).update(
+            seats_sold=F("seats_sold") + Case(
+                *(
+                    When(pk=flight_id, then=tickets_count)
+                    for flight_id, tickets_count in sold.items()
+                )
+            )
+        )
+
+    return [
+        Ticket(
+            id=claimed[(flight_id, row, seat)],
+            flight_id=flight_id,
+            order=order,
+            row=row,
+            seat=seat,
+        )
+        for flight_id, row, seat in requested
+    ]
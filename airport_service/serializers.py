@@ -1,8 +1,12 @@
+from collections import Counter
+
 from django.db import transaction
 from rest_framework import serializers
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import ErrorDetail, ValidationError
+from rest_framework.settings import api_settings
 from rest_framework.validators import UniqueTogetherValidator
 
+from airport_service.images import has_variants, variant_url
 from airport_service.models import (
     AirplaneType,
     Crew,
@@ -12,6 +16,77 @@ from airport_service.models import (
     Flight,
     Order, Ticket
 )
+from airport_service.seat_claims import claim_seats
+from airport_service.used_functions.seat_map import (
+    SEAT_MAP_ENCODING,
+    encode_seat_map,
+)
+
+
+class SparseFieldsMixin:
+    """
+    fields keeps only the listed top-level fields. expand is a tree of
+    nested serializers to render in full ({"tickets": {"flight": {}}});
+    nested serializers left out of it collapse to primary keys.
+    Without these arguments the representation is unchanged.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+        if expand is not None:
+            self.apply_expand(expand)
+
+    def apply_expand(self, expand):
+        for name, field in list(self.fields.items()):
+            if not isinstance(field, serializers.BaseSerializer):
+                continue
+
+            if name in expand:
+                nested = getattr(field, "child", field)
+                if isinstance(nested, SparseFieldsMixin):
+                    nested.apply_expand(expand[name])
+                continue
+
+            self.fields[name] = serializers.PrimaryKeyRelatedField(
+                many=isinstance(field, serializers.ListSerializer),
+                read_only=True,
+                source=None if field.source == name else field.source,
+            )
+
+
+class ImageVariantField(serializers.ImageField):
+    """
+    Read-only URL of a processed variant of the image, falling back to the
+    original while the variant has not been generated yet
+    """
+
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+
+        processed = has_variants(
+            getattr(value.instance, "image_variants", None),
+            self.source,
+            value.name,
+        )
+        url = variant_url(
+            value.name, self.variant, processed, value.storage
+        )
+        request = self.context.get("request", None)
+        if request is not None:
+            return request.build_absolute_uri(url)
+
+        return url
 
 
 class AirplaneTypeSerializer(serializers.ModelSerializer):
@@ -29,6 +104,7 @@ class CrewSerializer(serializers.ModelSerializer):
 
 
 class CrewListSerializer(CrewSerializer):
+    image = ImageVariantField(variant="thumb")
 
     class Meta:
         model = Crew
@@ -42,7 +118,12 @@ class AirportSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class RouteSerializer(serializers.ModelSerializer):
+class AirportAutocompleteSerializer(serializers.Serializer):
+    q = serializers.CharField()
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+
+class RouteSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Route
@@ -73,6 +154,8 @@ class AirplaneListSerializer(AirplaneSerializer):
     all_seats = serializers.IntegerField(
         read_only=True
     )
+    outside_image = ImageVariantField(variant="thumb")
+    inside_image = ImageVariantField(variant="thumb")
 
     class Meta:
         model = Airplane
@@ -86,7 +169,7 @@ class AirplaneListSerializer(AirplaneSerializer):
         )
 
 
-class AirplaneDetailSerializer(AirplaneListSerializer):
+class FlightAirplaneSerializer(AirplaneListSerializer):
 
     class Meta:
         model = Airplane
@@ -102,7 +185,12 @@ class AirplaneDetailSerializer(AirplaneListSerializer):
         )
 
 
-class FlightSerializer(serializers.ModelSerializer):
+class AirplaneDetailSerializer(FlightAirplaneSerializer):
+    outside_image = ImageVariantField(variant="full")
+    inside_image = ImageVariantField(variant="full")
+
+
+class FlightSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Flight
@@ -127,7 +215,7 @@ class FlightListSerializer(FlightSerializer):
     )
     seats_available = serializers.IntegerField(read_only=True)
 
-    airplane = AirplaneDetailSerializer(read_only=True)
+    airplane = FlightAirplaneSerializer(read_only=True)
     crew = CrewListSerializer(read_only=True)
 
     class Meta:
@@ -157,7 +245,7 @@ class FlightTicketSerializer(FlightListSerializer):
         )
 
 
-class TicketSerializer(serializers.ModelSerializer):
+class TicketSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     def validate(self, attrs):
         data = super(TicketSerializer, self).validate(attrs=attrs)
@@ -179,24 +267,94 @@ class TicketSerializer(serializers.ModelSerializer):
         ]
 
 
-class TicketListSerializer(TicketSerializer):
+class BatchFlightField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves the flight from flights preloaded by OrderTicketListSerializer
+    instead of querying the database for every ticket
+    """
 
-    flight = FlightTicketSerializer(many=False, read_only=True)
+    def to_internal_value(self, data):
+        flights = getattr(self.parent.parent, "flights", None)
+
+        if flights is None:
+            return super().to_internal_value(data)
+
+        try:
+            return flights[int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
+class OrderTicketListSerializer(serializers.ListSerializer):
+    """
+    Validates all tickets of an order in batch: flights are loaded with
+    one query and seats are checked in memory. Seats booked by other orders
+    are detected atomically on insert by claim_seats
+    """
+
+    @staticmethod
+    def get_flights(data):
+        flight_ids = set()
+
+        for ticket_data in data if isinstance(data, list) else []:
+            try:
+                flight_ids.add(int(ticket_data["flight"]))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+        return Flight.objects.select_related("airplane").in_bulk(flight_ids)
 
+    def validate_seats_are_unique(self, tickets):
+        seats = [
+            (ticket["flight"].id, ticket["row"], ticket["seat"])
+            for ticket in tickets
+        ]
+        requested = Counter(seats)
+        message = UniqueTogetherValidator.message.format(
+            field_names="seat, row, flight"
+        )
+
+        errors = [
+            {
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    ErrorDetail(message, code="unique")
+                ]
+            }
+            if requested[seat] > 1
+            else {}
+            for seat in seats
+        ]
+        if any(errors):
+            raise ValidationError(errors)
+
+    def to_internal_value(self, data):
+        self.flights = self.get_flights(data)
+        tickets = super().to_internal_value(data)
+        self.validate_seats_are_unique(tickets)
+        return tickets
+
+
+class OrderTicketSerializer(TicketSerializer):
+    flight = BatchFlightField(queryset=Flight.objects.select_related("airplane"))
 
-class TicketSeatsSerializer(TicketSerializer):
     class Meta:
         model = Ticket
-        fields = ("row", "seat")
+        fields = ("id", "row", "seat", "flight")
+        validators = []
+        list_serializer_class = OrderTicketListSerializer
+
+
+class TicketListSerializer(TicketSerializer):
+
+    flight = FlightTicketSerializer(many=False, read_only=True)
 
 
 class FlightDetailSerializer(FlightListSerializer):
 
-    taken_seats = TicketSeatsSerializer(
-        source="tickets",
-        many=True,
-        read_only=True
-    )
+    taken_seats = serializers.SerializerMethodField()
+    seat_map = serializers.SerializerMethodField()
     route = RouteListSerializer(read_only=True)
 
     class Meta:
@@ -207,20 +365,41 @@ class FlightDetailSerializer(FlightListSerializer):
             "airplane",
             "seats_available",
             "taken_seats",
+            "seat_map",
             "departure_time",
             "arrival_time",
             "crew",
         )
 
+    def get_taken_seats(self, flight):
+        return [{"row": row, "seat": seat} for row, seat in flight.taken_seats]
+
+    def get_seat_map(self, flight):
+        airplane = flight.airplane
+        return {
+            "rows": airplane.rows,
+            "seats_in_row": airplane.seats_in_row,
+            "encoding": SEAT_MAP_ENCODING,
+            "data": encode_seat_map(
+                airplane.rows,
+                airplane.seats_in_row,
+                flight.taken_seats,
+            ),
+        }
+
 
 class TicketDetailSerializer(TicketSerializer):
 
     flight = FlightDetailSerializer(many=False)
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
-    tickets = TicketSerializer(many=True, read_only=False, allow_empty=False)
+    tickets = OrderTicketSerializer(
+        many=True,
+        read_only=False,
+        allow_empty=False
+    )
 
     class Meta:
         model = Order
@@ -230,8 +409,7 @@ class OrderSerializer(serializers.ModelSerializer):
         with transaction.atomic():
             tickets_data = validated_data.pop("tickets")
             order = Order.objects.create(**validated_data)
-            for ticket_data in tickets_data:
-                Ticket.objects.create(order=order, **ticket_data)
+            claim_seats(order, tickets_data)
             return order
 
 
@@ -243,3 +421,51 @@ class OrderListSerializer(OrderSerializer):
 class OrderDetailSerializer(OrderSerializer):
 
     tickets = TicketDetailSerializer(many=True, read_only=True)
+
+
+class ItinerarySearchSerializer(serializers.Serializer):
+    source = serializers.IntegerField(required=False)
+    source_city = serializers.CharField(required=False)
+    destination = serializers.IntegerField(required=False)
+    destination_city = serializers.CharField(required=False)
+    date = serializers.DateField()
+    max_stops = serializers.IntegerField(min_value=0, max_value=2, default=2)
+    min_connection = serializers.IntegerField(
+        min_value=0, default=45, help_text="Minutes"
+    )
+    max_connection = serializers.IntegerField(
+        min_value=1, default=360, help_text="Minutes"
+    )
+    passengers = serializers.IntegerField(min_value=1, default=1)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+    def validate(self, attrs):
+        for place in ("source", "destination"):
+            if (place in attrs) == (f"{place}_city" in attrs):
+                raise ValidationError(
+                    {place: f"Provide exactly one of {place}, {place}_city"}
+                )
+
+        if attrs["min_connection"] > attrs["max_connection"]:
+            raise ValidationError(
+                {"min_connection": "Must not exceed max_connection"}
+            )
+
+        return attrs
+
+
+class ItineraryLegSerializer(serializers.Serializer):
+    flight = serializers.IntegerField()
+    source = serializers.IntegerField()
+    destination = serializers.IntegerField()
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    seats_available = serializers.IntegerField()
+
+
+class ItinerarySerializer(serializers.Serializer):
+    stops = serializers.IntegerField()
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    distance = serializers.IntegerField()
+    legs = ItineraryLegSerializer(many=True)
@@ -0,0 +1,62 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from airport_service.cache import bump_version_on_commit
+from airport_service.images import (
+    IMAGE_FIELDS,
+    missing_variants,
+    schedule_image_processing,
+)
+from airport_service.models import (
+    AirplaneType,
+    Crew,
+    Airport,
+    Route,
+    Airplane,
+    Flight,
+    Ticket,
+)
+
+CATALOG_MODELS = (AirplaneType, Crew, Airport, Route, Airplane)
+
+
+@receiver(post_save, sender=Ticket)
+def increase_seats_sold(sender, instance, created, **kwargs):
+    saved_flight_id = getattr(instance, "saved_flight_id", None)
+    if created:
+        Flight.change_seats_sold(instance.flight_id, 1)
+    elif saved_flight_id and saved_flight_id != instance.flight_id:
+        Flight.change_seats_sold(saved_flight_id, -1)
+        Flight.change_seats_sold(instance.flight_id, 1)
+    instance.saved_flight_id = instance.flight_id
+
+
+@receiver(post_delete, sender=Ticket)
+def decrease_seats_sold(sender, instance, **kwargs):
+    Flight.change_seats_sold(
+        getattr(instance, "saved_flight_id", None) or instance.flight_id, -1
+    )
+
+
+def invalidate_cached_responses(sender, **kwargs):
+    bump_version_on_commit(sender)
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(invalidate_cached_responses, sender=model)
+    post_delete.connect(invalidate_cached_responses, sender=model)
+
+
+def process_uploaded_images(sender, instance, **kwargs):
+    names = missing_variants(instance)
+    if names:
+        transaction.on_commit(
+            partial(schedule_image_processing, sender, names)
+        )
+
+
+for model in IMAGE_FIELDS:
+    post_save.connect(process_uploaded_images, sender=model)
@@ -0,0 +1,410 @@
+import csv
+import io
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from airport_service.cache import bump_version
+from airport_service.models import (
+    AirplaneType,
+    Crew,
+    Airport,
+    Route,
+    Airplane,
+    Flight,
+    Order,
+    Ticket,
+)
+
+SYLLABLES = (
+    "ka", "ri", "lo", "ven", "dor", "mi", "sa", "tel", "bur", "an",
+    "kov", "le", "ny", "pol", "gra", "sto", "vi", "ma", "ber", "tor",
+)
+AIRPLANE_TYPES = (
+    ("Airbus A320", 30, 6),
+    ("Airbus A321", 37, 6),
+    ("Boeing 737-800", 32, 6),
+    ("Embraer E195", 31, 4),
+    ("Boeing 787-9", 42, 9),
+    ("ATR 72", 18, 4),
+)
+FIRST_NAMES = ("Olena", "Taras", "Anna", "Mark", "Iryna", "Lee", "Sofia")
+LAST_NAMES = ("Kovalenko", "Shevchenko", "Smith", "Bondar", "Novak")
+
+
+class SyntheticDataGenerator:
+    """
+    Fills the database with a reproducible (seeded) airline: airports
+    around a few hubs, routes between them, flights spread over a window
+    around now, users and their orders with tickets on distinct seats.
+    Primary keys are reserved up front, so flights, orders and tickets are
+    streamed with COPY without reading ids back.
+    """
+
+    def __init__(self, seed=0, batch_size=10000, progress=None):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.progress = progress or (lambda message: None)
+        self.now = timezone.now().replace(second=0, microsecond=0)
+
+    def run(
+        self,
+        airports,
+        routes,
+        airplanes,
+        crew,
+        flights,
+        users,
+        orders,
+        tickets_per_order=4,
+        days_before=60,
+        days_after=60,
+        password="loadtest",
+    ):
+        counts = {}
+        with transaction.atomic():
+            airport_ids = self.create_airports(airports)
+            route_ids = self.create_routes(airport_ids, routes)
+            airplane_ids = self.create_airplanes(airplanes)
+            crew_ids = self.create_crew(crew)
+            flight_rows = self.create_flights(
+                route_ids,
+                airplane_ids,
+                crew_ids,
+                flights,
+                days_before,
+                days_after,
+            )
+            user_ids = self.create_users(users, password)
+            counts["orders"], counts["tickets"] = self.create_orders(
+                user_ids, flight_rows, orders, tickets_per_order
+            )
+            self.update_seats_sold(flight_rows)
+            self.reset_sequences()
+
+        for model in (AirplaneType, Crew, Airport, Airplane, Route):
+            bump_version(model)
+
+        counts.update(
+            airports=len(airport_ids),
+            routes=len(route_ids),
+            airplanes=len(airplane_ids),
+            crew=len(crew_ids),
+            flights=len(flight_rows),
+            users=len(user_ids),
+        )
+        return counts
+
+    def city_name(self):
+        return "".join(
+            self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(2, 3))
+        ).capitalize()
+
+    def create_airports(self, count):
+        first = self.next_id(Airport)
+        cities = [self.city_name() for _ in range(max(count // 2, 1))]
+        airports = Airport.objects.bulk_create(
+            (
+                Airport(
+                    name=f"{self.rng.choice(cities)} {number}",
+                    city=self.rng.choice(cities),
+                )
+                for number in range(first, first + count)
+            ),
+            batch_size=self.batch_size,
+        )
+        self.progress(f"airports: {len(airports)}")
+        return [airport.pk for airport in airports]
+
+    def create_routes(self, airport_ids, count):
+        """
+        Up to a fifth of the routes link hubs (one airport in 50), every
+        airport is then linked to a hub both ways, the rest is random
+        """
+        hubs = self.rng.sample(airport_ids, max(len(airport_ids) // 50, 2))
+        hub_pairs = [(a, b) for a in hubs for b in hubs if a != b]
+        pairs = dict.fromkeys(
+            self.rng.sample(hub_pairs, min(count // 5, len(hub_pairs)))
+        )
+        for airport_id in airport_ids:
+            hub_id = self.rng.choice(hubs)
+            if hub_id != airport_id:
+                pairs[airport_id, hub_id] = pairs[hub_id, airport_id] = None
+        while len(pairs) < count:
+            pairs[tuple(self.rng.sample(airport_ids, 2))] = None
+
+        routes = Route.objects.bulk_create(
+            (
+                Route(
+                    source_id=source,
+                    destination_id=destination,
+                    distance=self.rng.randint(200, 9000),
+                )
+                for source, destination in list(pairs)[:count]
+            ),
+            batch_size=self.batch_size,
+        )
+        self.progress(f"routes: {len(routes)}")
+        return [(route.pk, route.distance) for route in routes]
+
+    def create_airplanes(self, count):
+        types = {
+            name: AirplaneType.objects.get_or_create(name=name)[0].pk
+            for name, _, _ in AIRPLANE_TYPES
+        }
+        airplanes = []
+        for number in range(count):
+            name, rows, seats_in_row = self.rng.choice(AIRPLANE_TYPES)
+            airplanes.append(
+                Airplane(
+                    name=f"UR-S{number:05d}",
+                    rows=rows,
+                    seats_in_row=seats_in_row,
+                    airplane_id=types[name],
+                )
+            )
+
+        airplanes = Airplane.objects.bulk_create(
+            airplanes, batch_size=self.batch_size
+        )
+        self.progress(f"airplanes: {len(airplanes)}")
+        return [
+            (airplane.pk, airplane.rows, airplane.seats_in_row)
+            for airplane in airplanes
+        ]
+
+    def create_crew(self, count):
+        crew = Crew.objects.bulk_create(
+            (
+                Crew(
+                    first_name=self.rng.choice(FIRST_NAMES),
+                    last_name=self.rng.choice(LAST_NAMES),
+                )
+                for _ in range(count)
+            ),
+            batch_size=self.batch_size,
+        )
+        self.progress(f"crew: {len(crew)}")
+        return [member.pk for member in crew]
+
+    def create_flights(
+        self, route_ids, airplane_ids, crew_ids, count, days_before, days_after
+    ):
+        """
+        Returns [id, departure, seats in row, capacity, seats taken] per
+        flight; seats taken is filled in while orders are generated
+        """
+        first = self.next_id(Flight)
+        window = (days_before + days_after) * 24 * 60
+        start = self.now - timedelta(days=days_before)
+        flights = []
+
+        def rows():
+            departures = set()
+            for flight_id in range(first, first + count):
+                airplane_id, rows, seats_in_row = self.rng.choice(
+                    airplane_ids
+                )
+                # (route, departure_time) is unique
+                while True:
+                    route_id, distance = self.rng.choice(route_ids)
+                    departure = start + timedelta(
+                        minutes=self.rng.randrange(window) // 5 * 5
+                    )
+                    if (route_id, departure) not in departures:
+                        departures.add((route_id, departure))
+                        break
+                arrival = departure + timedelta(
+                    minutes=30 + distance // 12 // 5 * 5
+                )
+                flights.append(
+                    [
+                        flight_id,
+                        departure,
+                        seats_in_row,
+                        rows * seats_in_row,
+                        0,
+                    ]
+                )
+                yield (
+                    flight_id,
+                    route_id,
+                    airplane_id,
+                    self.rng.choice(crew_ids),
+                    departure.isoformat(),
+                    arrival.isoformat(),
+                    0,
+                )
+
+        started = time.monotonic()
+        self.copy(
+            Flight,
+            (
+                "id",
+                "route_id",
+                "airplane_id",
+                "crew_id",
+                "departure_time",
+                "arrival_time",
+                "seats_sold",
+            ),
+            rows(),
+        )
+        self.progress(
+            f"flights: {len(flights)} in {time.monotonic() - started:.1f}s"
+        )
+        return flights
+
+    def create_users(self, count, password):
+        """
+        Users share one password hash, so hashing is done once
+        """
+        User = get_user_model()
+        first = self.next_id(User)
+        hashed = make_password(password)
+        users = User.objects.bulk_create(
+            (
+                User(email=f"load{number}@example.com", password=hashed)
+                for number in range(first, first + count)
+            ),
+            batch_size=self.batch_size,
+        )
+        self.progress(f"users: {len(users)} (password {password!r})")
+        return [user.pk for user in users]
+
+    def create_orders(self, user_ids, flights, count, tickets_per_order):
+        """
+        Each order books 1 to tickets_per_order adjacent seats on one
+        flight, up to 30 days before departure. Popular flights are picked
+        more often; orders that find no free seats are dropped.
+        Orders and tickets are copied in batches, so memory use does not
+        grow with count. Returns (orders, tickets) created.
+        """
+        order_id = self.next_id(Order)
+        ticket_id = self.next_id(Ticket)
+        created = booked = 0
+        started = time.monotonic()
+
+        for batch in range(0, count, self.batch_size):
+            orders, tickets = [], []
+            for _ in range(min(self.batch_size, count - batch)):
+                size = self.rng.randint(1, tickets_per_order)
+                for _ in range(10):
+                    flight = flights[
+                        int(len(flights) * self.rng.random() ** 2)
+                    ]
+                    if flight[4] + size <= flight[3]:
+                        break
+                else:
+                    continue
+
+                flight_id, departure, seats_in_row, _, taken = flight
+                created_at = departure - timedelta(
+                    minutes=self.rng.randrange(1, 30 * 24 * 60)
+                )
+                orders.append(
+                    (
+                        order_id,
+                        self.rng.choice(user_ids),
+                        created_at.isoformat(),
+                    )
+                )
+                for position in range(taken, taken + size):
+                    tickets.append(
+                        (
+                            ticket_id,
+                            flight_id,
+                            order_id,
+                            position // seats_in_row + 1,
+                            position % seats_in_row + 1,
+                        )
+                    )
+                    ticket_id += 1
+                flight[4] += size
+                order_id += 1
+
+            self.copy(Order, ("id", "user_id", "created_at"), orders)
+            self.copy(
+                Ticket, ("id", "flight_id", "order_id", "row", "seat"), tickets
+            )
+            created += len(orders)
+            booked += len(tickets)
+            rate = created / max(time.monotonic() - started, 1e-9)
+            self.progress(
+                f"orders: {created}, tickets: {booked} ({rate:.0f} orders/s)"
+            )
+
+        return created, booked
+
+    def update_seats_sold(self, flights):
+        """
+        One UPDATE from the counts kept while booking
+        """
+        sold = [(flight[0], flight[4]) for flight in flights if flight[4]]
+        if not sold:
+            return
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {Flight._meta.db_table} AS flight "
+                f"SET seats_sold = sold.count "
+                f"FROM unnest(%s::bigint[], %s::integer[]) "
+                f"AS sold (id, count) WHERE flight.id = sold.id",
+                [[row[0] for row in sold], [row[1] for row in sold]],
+            )
+
+    def copy(self, model, columns, rows):
+        """
+        Stream rows into the table with COPY, batch_size rows at a time
+        """
+        table = model._meta.db_table
+        copied = 0
+
+        with connection.cursor() as cursor:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for number, row in enumerate(rows, 1):
+                writer.writerow(row)
+                if number % self.batch_size == 0:
+                    copied += self.flush(cursor, table, columns, buffer)
+            copied += self.flush(cursor, table, columns, buffer)
+
+        return copied
+
+    @staticmethod
+    def flush(cursor, table, columns, buffer):
+        size = buffer.getvalue().count("\n")
+        if size:
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) "
+                f"FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+            buffer.seek(0)
+            buffer.truncate()
+
+        return size
+
+    @staticmethod
+    def next_id(model):
+        return (model.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+
+    @staticmethod
+    def reset_sequences():
+        """
+        Move the id sequences past the ids given to COPY, as loaddata does
+        """
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Flight, Order, Ticket]
+        )
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
@@ -1,3 +1,2437 @@
-from django.test import TestCase
+import base64
+import json
+import re
+import tempfile
+import threading
+from concurrent.futures import Future
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import (
+    OperationalError,
+    close_old_connections,
+    connection,
+    connections,
+    transaction,
+)
+from django.db.models import Count, F
+from django.test import (
+    AsyncClient,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework import serializers, status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import (
+    APIClient,
+    APIRequestFactory,
+    force_authenticate,
+)
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airport_service.models import (
+    AirplaneType,
+    Crew,
+    Airport,
+    Route,
+    Airplane,
+    Flight,
+    FlightSchedule,
+    IdempotencyKey,
+    Order,
+    Ticket,
+)
+from airport_service.cache import get_versions
+from airport_service.async_views import AsyncFlightView
+from airport_service.db_router import read_from
+from airport_service import instrumentation, itinerary
+from airport_service import images
+from airport_service.images import variant_name
+from airport_service.middleware import RequestMetricsMiddleware
+from airport_service.parsers import ORJSONParser
+from airport_service.renderers import ORJSONRenderer
+from airport_service.schedules import roll_schedules
+from airport_service.serializers import (
+    CrewListSerializer,
+    FlightDetailSerializer,
+    FlightListSerializer,
+    OrderSerializer,
+)
+from airport_service.throttling import UserSlidingWindowThrottle
+from airport_service.urls import router
+from airport_service.used_functions.seat_map import (
+    decode_seat_map,
+    encode_seat_map,
+)
+from airport_service.views import (
+    AirplaneTypeViewSet,
+    CrewViewSet,
+    AirportViewSet,
+    RouteViewSet,
+    AirplaneViewSet,
+    FlightViewSet,
+    OrderViewSet,
+    ItineraryViewSet,
+)
+from airports_user.models import User
+
+AIRPORT_URL = reverse("airport_service:airport-list")
+FLIGHT_URL = reverse("airport_service:flight-list")
+ORDER_URL = reverse("airport_service:order-list")
+
+
+def flight_detail_url(flight_id):
+    return reverse("airport_service:flight-detail", args=[flight_id])
+
+
+def detail_url(basename, pk):
+    return reverse(f"airport_service:{basename}-detail", args=[pk])
+
+
+def sample_flight(**params):
+    airplane_type = AirplaneType.objects.create(name="Jet")
+    source = Airport.objects.create(name="Boryspil", city="Kyiv")
+    destination = Airport.objects.create(name="Heathrow", city="London")
+    defaults = {
+        "route": Route.objects.create(
+            source=source, destination=destination, distance=2100
+        ),
+        "airplane": Airplane.objects.create(
+            name="A320", rows=10, seats_in_row=6, airplane=airplane_type
+        ),
+        "crew": Crew.objects.create(first_name="Ann", last_name="Lee"),
+        "departure_time": timezone.now() + timedelta(days=1),
+        "arrival_time": timezone.now() + timedelta(days=1, hours=3),
+    }
+    defaults.update(params)
+
+    return Flight.objects.create(**defaults)
+
+
+def flights_after(first, hours):
+    """
+    Flights like first departing the given hours after it; flights sharing
+    a departure time fly copies of its route, (route, departure_time) being
+    unique
+    """
+    departure = first.departure_time
+    routes = {}
+    flights = []
+    for offset in hours:
+        routes[offset] = routes.get(offset, 0 if offset else 1) + 1
+        route = first.route
+        if routes[offset] > 1:
+            route = Route.objects.create(
+                source=first.route.source,
+                destination=first.route.destination,
+                distance=first.route.distance,
+            )
+        flights.append(
+            Flight.objects.create(
+                route=route,
+                airplane=first.airplane,
+                crew=first.crew,
+                departure_time=departure + timedelta(hours=offset),
+                arrival_time=departure + timedelta(hours=offset + 3),
+            )
+        )
+
+    return flights
+
+
+class ConcurrentSeatClaimTests(TransactionTestCase):
+    buyers = 12
+
+    def setUp(self):
+        self.flight = sample_flight()
+        self.users = [
+            User.objects.create(email=f"buyer{i}@airport.com")
+            for i in range(self.buyers)
+        ]
+
+    def book_concurrently(self, seats_for_buyer, user=None, headers=None):
+        barrier = threading.Barrier(self.buyers)
+        responses = [None] * self.buyers
+
+        def book(index):
+            client = APIClient()
+            client.force_authenticate(user or self.users[index])
+            payload = {
+                "tickets": [
+                    {"flight": self.flight.id, "row": row, "seat": seat}
+                    for row, seat in seats_for_buyer(index)
+                ]
+            }
+            try:
+                barrier.wait()
+                responses[index] = client.post(
+                    ORDER_URL, payload, format="json", headers=headers
+                )
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=book, args=(i,))
+            for i in range(self.buyers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return responses
+
+    def test_only_one_buyer_gets_the_same_seats(self):
+        responses = self.book_concurrently(lambda index: [(1, 1), (1, 2)])
+
+        statuses = sorted(response.status_code for response in responses)
+        self.assertEqual(
+            statuses,
+            [status.HTTP_201_CREATED]
+            + [status.HTTP_409_CONFLICT] * (self.buyers - 1)
+        )
+        for response in responses:
+            if response.status_code == status.HTTP_409_CONFLICT:
+                self.assertTrue(response.data["conflicting_seats"])
+
+        self.flight.refresh_from_db()
+        self.assertEqual(Ticket.objects.count(), 2)
+        self.assertEqual(self.flight.seats_sold, 2)
+
+    def test_concurrent_retries_with_one_key_create_one_order(self):
+        responses = self.book_concurrently(
+            lambda index: [(1, 1)],
+            user=self.users[0],
+            headers={"Idempotency-Key": "retry"},
+        )
+
+        self.assertEqual(
+            {response.status_code for response in responses},
+            {status.HTTP_201_CREATED},
+        )
+        self.assertEqual(
+            sum("Idempotent-Replayed" in response for response in responses),
+            self.buyers - 1,
+        )
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_seats_requested_in_reverse_order_do_not_deadlock(self):
+        seats = [(1, 1), (1, 2), (2, 1), (2, 2)]
+        responses = self.book_concurrently(
+            lambda index: seats if index % 2 else seats[::-1]
+        )
+
+        statuses = sorted(response.status_code for response in responses)
+        self.assertEqual(
+            statuses,
+            [status.HTTP_201_CREATED]
+            + [status.HTTP_409_CONFLICT] * (self.buyers - 1)
+        )
+        self.assertEqual(Ticket.objects.count(), 4)
+
+    def test_seats_are_inserted_in_key_order(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        with CaptureQueriesContext(connection) as context:
+            client.post(
+                ORDER_URL,
+                {
+                    "tickets": [
+                        {"flight": self.flight.id, "row": row, "seat": seat}
+                        for row, seat in ((2, 2), (1, 3), (2, 1), (1, 1))
+                    ]
+                },
+                format="json",
+            )
+
+        table = connection.ops.quote_name(Ticket._meta.db_table)
+        insert = next(
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith(f"INSERT INTO {table}")
+        )
+        values = re.findall(r"\((\d+), \d+, (\d+), (\d+)\)", insert)
+        self.assertEqual(
+            [(int(row), int(seat)) for _, row, seat in values],
+            [(1, 1), (1, 3), (2, 1), (2, 2)],
+        )
+
+    def test_conflict_reports_exactly_the_lost_seats(self):
+        responses = self.book_concurrently(
+            lambda index: [(1, 1), (index // 6 + 2, index % 6 + 1)]
+        )
+
+        conflicts = [
+            response.data["conflicting_seats"]
+            for response in responses
+            if response.status_code == status.HTTP_409_CONFLICT
+        ]
+        self.assertEqual(len(conflicts), self.buyers - 1)
+        for seats in conflicts:
+            self.assertEqual(
+                seats, [{"flight": self.flight.id, "row": 1, "seat": 1}]
+            )
+
+        self.flight.refresh_from_db()
+        self.assertEqual(Ticket.objects.count(), 2)
+        self.assertEqual(self.flight.seats_sold, 2)
+
+
+class QueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN for the SQL generated by hot endpoints over analyzed
+    tables large enough for the planner to prefer indexes, and fails when
+    a large table is read with a sequential scan (a full index scan that
+    filters rows without an index condition counts as one too) or when the
+    plan does not use the index added for the endpoint.
+    """
+    large_tables = [
+        model._meta.db_table for model in (Airport, Flight, Order, Ticket)
+    ]
+    airports = 5000
+    flights = 20000
+    orders = 5000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email="planner@airport.com")
+        airplane = Airplane.objects.create(
+            name="A320",
+            rows=30,
+            seats_in_row=6,
+            airplane=AirplaneType.objects.create(name="Jet"),
+        )
+        crew = Crew.objects.create(first_name="Ann", last_name="Lee")
+        airports = Airport.objects.bulk_create(
+            Airport(name=f"Airport {i}", city=f"City {i % 1000}")
+            for i in range(cls.airports)
+        )
+        routes = Route.objects.bulk_create(
+            Route(
+                source=airports[i],
+                destination=airports[(i + 1) % len(airports)],
+                distance=1000,
+            )
+            for i in range(len(airports))
+        )
+        start = timezone.now()
+        flights = Flight.objects.bulk_create(
+            Flight(
+                route=routes[i % len(routes)],
+                airplane=airplane,
+                crew=crew,
+                departure_time=start + timedelta(minutes=30 * i),
+                arrival_time=start + timedelta(minutes=30 * i + 180),
+            )
+            for i in range(cls.flights)
+        )
+        users = User.objects.bulk_create(
+            User(email=f"passenger{i}@airport.com") for i in range(500)
+        )
+        orders = Order.objects.bulk_create(
+            Order(user=users[i % len(users)]) for i in range(cls.orders)
+        ) + Order.objects.bulk_create(Order(user=cls.user) for _ in range(5))
+        Ticket.objects.bulk_create(
+            Ticket(
+                flight=flights[i % len(flights)],
+                order=orders[i % len(orders)],
+                row=i // 6 % 30 + 1,
+                seat=i % 6 + 1,
+            )
+            for i in range(cls.orders * 2)
+        )
+        cls.flight = flights[0]
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def seq_scans(self, plan):
+        scans = []
+        if plan["Node Type"] == "Seq Scan" or (
+            plan["Node Type"] in ("Index Scan", "Index Only Scan")
+            and "Filter" in plan
+            and "Index Cond" not in plan
+        ):
+            scans.append(plan["Relation Name"])
+        for subplan in plan.get("Plans", []):
+            scans.extend(self.seq_scans(subplan))
+        return scans
+
+    def index_names(self, plan):
+        names = {plan["Index Name"]} if "Index Name" in plan else set()
+        for subplan in plan.get("Plans", []):
+            names |= self.index_names(subplan)
+        return names
+
+    def assertUsesIndexes(self, url, params=None, indexes=()):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        used = set()
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                if not query["sql"].startswith("SELECT"):
+                    continue
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {query['sql']}")
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                scans = [
+                    table
+                    for table in self.seq_scans(plan[0]["Plan"])
+                    if table in self.large_tables
+                ]
+                used |= self.index_names(plan[0]["Plan"])
+                self.assertFalse(
+                    scans,
+                    f"Sequential scan on {scans} for {url}: {query['sql']}",
+                )
+        self.assertLessEqual(
+            set(indexes), used, f"{url} {params} planned with {used}"
+        )
+
+    def test_flight_list(self):
+        self.assertUsesIndexes(FLIGHT_URL, indexes=["flight_departure_idx"])
+
+    def test_flight_list_filtered_by_places(self):
+        self.assertUsesIndexes(
+            FLIGHT_URL,
+            {"arrival_place": "Airport 1,Airport 2"},
+            indexes=["airport_name_idx"],
+        )
+        self.assertUsesIndexes(
+            FLIGHT_URL,
+            {"destination_place": "Airport 3"},
+            indexes=["airport_name_idx"],
+        )
+
+    def test_flight_list_filtered_by_time(self):
+        after = (timezone.now() + timedelta(days=10)).isoformat()
+        before = (timezone.now() + timedelta(days=11)).isoformat()
+        self.assertUsesIndexes(
+            FLIGHT_URL,
+            {"departure_time_after": after, "departure_time_before": before},
+            indexes=["flight_departure_idx"],
+        )
+        self.assertUsesIndexes(
+            FLIGHT_URL,
+            {"arrival_time_after": after, "arrival_time_before": before},
+            indexes=["flight_arrival_idx"],
+        )
+
+    def test_flight_list_filtered_by_route(self):
+        self.assertUsesIndexes(
+            FLIGHT_URL,
+            {"route": self.flight.route_id},
+            indexes=["flight_route_departure_unique"],
+        )
+
+    def test_flight_detail(self):
+        self.assertUsesIndexes(flight_detail_url(self.flight.id))
+
+    def test_airport_list_filtered_by_city(self):
+        self.assertUsesIndexes(
+            AIRPORT_URL,
+            {"city": "City 1,City 2"},
+            indexes=["airport_city_idx"],
+        )
+
+    def test_order_list(self):
+        self.assertUsesIndexes(ORDER_URL, indexes=["order_user_created_idx"])
+
+
+@override_settings(ITINERARY_INDEX_TTL=0)
+class QueryBudgetTests(TestCase):
+    """
+    Every viewset action declares a query_budget. An action must stay within
+    it, and the number of queries must not grow with the size of the result.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(email="budget@airport.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+
+    def count_queries(self, method, url, data=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data, format="json")
+        self.assertLess(response.status_code, 300, response.data)
+        return len(context)
+
+    def assertWithinBudget(self, viewset, action, request, grow):
+        small = request()
+        grow()
+        large = request()
+
+        self.assertEqual(
+            small,
+            large,
+            f"{viewset.__name__}.{action} queries grow with result size",
+        )
+        self.assertLessEqual(
+            large,
+            viewset.query_budget[action],
+            f"{viewset.__name__}.{action} is over its query budget",
+        )
+
+    def book(self, flight, order=None, count=1):
+        order = order or Order.objects.create(user=self.user)
+        start = flight.tickets.count()
+        for number in range(start, start + count):
+            Ticket.objects.create(
+                flight=flight,
+                order=order,
+                row=number // 6 + 1,
+                seat=number % 6 + 1,
+            )
+        return order
+
+    def test_every_action_declares_a_budget(self):
+        for _, viewset, _ in router.registry:
+            actions = [
+                action
+                for action in ("list", "retrieve", "create")
+                if hasattr(viewset, action)
+            ] + [extra.__name__ for extra in viewset.get_extra_actions()]
+            for action in actions:
+                if action == "create" and viewset is not OrderViewSet:
+                    continue
+                self.assertIn(action, getattr(viewset, "query_budget", {}))
+
+    def test_catalog_list_and_retrieve(self):
+        catalog = (
+            (AirplaneTypeViewSet, "airplanetype", AirplaneType),
+            (CrewViewSet, "crew", Crew),
+            (AirportViewSet, "airport", Airport),
+            (RouteViewSet, "route", Route),
+            (AirplaneViewSet, "airplane", Airplane),
+        )
+        for viewset, basename, model in catalog:
+            with self.subTest(viewset=viewset.__name__):
+                instance = model.objects.first()
+                self.assertWithinBudget(
+                    viewset,
+                    "list",
+                    lambda: self.count_queries(
+                        "get", reverse(f"airport_service:{basename}-list")
+                    ),
+                    sample_flight,
+                )
+                self.assertWithinBudget(
+                    viewset,
+                    "retrieve",
+                    lambda: self.count_queries(
+                        "get", detail_url(basename, instance.pk)
+                    ),
+                    sample_flight,
+                )
+
+    def test_airport_autocomplete(self):
+        self.assertWithinBudget(
+            AirportViewSet,
+            "autocomplete",
+            lambda: self.count_queries(
+                "get",
+                reverse("airport_service:airport-autocomplete"),
+                {"q": "bor"},
+            ),
+            sample_flight,
+        )
+
+    def test_flight_list_and_retrieve(self):
+        self.assertWithinBudget(
+            FlightViewSet,
+            "list",
+            lambda: self.count_queries("get", FLIGHT_URL),
+            lambda: [self.book(sample_flight(), count=3) for _ in range(3)],
+        )
+        self.assertWithinBudget(
+            FlightViewSet,
+            "retrieve",
+            lambda: self.count_queries(
+                "get", flight_detail_url(self.flight.id)
+            ),
+            lambda: self.book(self.flight, count=5),
+        )
+
+    def test_order_list_and_retrieve(self):
+        order = self.book(self.flight)
+        other_flight = sample_flight()
+
+        def grow():
+            self.book(self.flight, order=order, count=3)
+            self.book(other_flight, order=order, count=3)
+            self.book(other_flight, count=2)
+
+        self.assertWithinBudget(
+            OrderViewSet,
+            "list",
+            lambda: self.count_queries("get", ORDER_URL),
+            grow,
+        )
+        self.assertWithinBudget(
+            OrderViewSet,
+            "retrieve",
+            lambda: self.count_queries("get", detail_url("order", order.id)),
+            grow,
+        )
+
+    def test_order_create(self):
+        other_flight = sample_flight()
+        payloads = iter([
+            [(self.flight, 1, 1)],
+            [
+                (self.flight, 2, 1),
+                (self.flight, 2, 2),
+                (other_flight, 1, 1),
+                (other_flight, 1, 2),
+            ],
+        ])
+
+        self.assertWithinBudget(
+            OrderViewSet,
+            "create",
+            lambda: self.count_queries(
+                "post",
+                ORDER_URL,
+                {
+                    "tickets": [
+                        {"flight": flight.id, "row": row, "seat": seat}
+                        for flight, row, seat in next(payloads)
+                    ]
+                },
+            ),
+            lambda: None,
+        )
+
+    def test_itinerary_search(self):
+        self.assertWithinBudget(
+            ItineraryViewSet,
+            "list",
+            lambda: self.count_queries(
+                "get",
+                reverse("airport_service:itinerary-list"),
+                {
+                    "source_city": "Kyiv",
+                    "destination_city": "London",
+                    "date": self.flight.departure_time.date(),
+                },
+            ),
+            lambda: [sample_flight() for _ in range(3)],
+        )
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        self.flight = sample_flight()
+        self.user = User.objects.create(email="reader@airport.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_queries_by_alias(self, url):
+        with CaptureQueriesContext(
+            connections["default"]
+        ) as primary, CaptureQueriesContext(connections["replica"]) as replica:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return len(primary), len(replica)
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.get_queries_by_alias(FLIGHT_URL)[0], 0)
+        self.assertEqual(self.get_queries_by_alias(ORDER_URL)[0], 0)
+
+    def test_cache_misses_read_from_primary(self):
+        self.assertEqual(self.get_queries_by_alias(AIRPORT_URL)[1], 0)
+
+    def test_autocomplete_index_is_built_from_primary(self):
+        url = reverse("airport_service:airport-autocomplete") + "?q=bor"
+        self.assertEqual(self.get_queries_by_alias(url)[1], 0)
+        # Built once; later lookups query neither database
+        self.assertEqual(self.get_queries_by_alias(url), (0, 0))
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        response = self.client.post(
+            ORDER_URL,
+            {"tickets": [{"flight": self.flight.id, "row": 1, "seat": 1}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(self.get_queries_by_alias(ORDER_URL)[1], 0)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create(email="o@airport.com"))
+        with CaptureQueriesContext(connections["default"]) as primary:
+            other.get(FLIGHT_URL)
+        self.assertEqual(len(primary), 0)
+
+        with override_settings(READ_YOUR_WRITES_WINDOW=0):
+            self.client.post(
+                ORDER_URL,
+                {"tickets": [{"flight": self.flight.id, "row": 1, "seat": 2}]},
+                format="json",
+            )
+        self.assertEqual(self.get_queries_by_alias(ORDER_URL)[0], 0)
+
+    def test_failed_write_does_not_pin(self):
+        response = self.client.post(ORDER_URL, {"tickets": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(self.get_queries_by_alias(ORDER_URL)[0], 0)
+
+    def test_reads_in_transaction_stay_on_primary(self):
+        with read_from("replica"):
+            self.assertEqual(Flight.objects.all().db, "replica")
+            with transaction.atomic():
+                self.assertEqual(Flight.objects.all().db, "default")
+
+        self.assertEqual(Flight.objects.all().db, "default")
+
+
+class DatabaseConnectionMetricsTests(TransactionTestCase):
+    url = reverse("airport_service:db-connections-list")
+
+    def test_only_staff_can_read_metrics(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(email="u@airport.com"))
+
+        response = client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_checkouts_are_counted_per_alias(self):
+        client = APIClient()
+        client.force_authenticate(
+            User.objects.create(email="admin@airport.com", is_staff=True)
+        )
+        before = client.get(self.url).data["default"]
+
+        # The request boundary, as request_started/request_finished run it
+        close_old_connections()
+        Flight.objects.exists()
+        response = client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stats = response.data["default"]
+        self.assertEqual(stats["checkouts"], before["checkouts"] + 1)
+        self.assertEqual(stats["reused"], before["reused"] + 1)
+        self.assertEqual(stats["open_connections"], 1)
+
+
+class SlidingWindowThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1000 * 60.0
+
+        class Throttle(UserSlidingWindowThrottle):
+            rate = "4/min"
+            timer = lambda _: self.now
+
+        self.throttle_class = Throttle
+        self.request = APIRequestFactory().get("/")
+        self.request.user = User(pk=1)
+
+    def allowed(self, requests):
+        return [
+            self.throttle_class().allow_request(self.request, None)
+            for _ in range(requests)
+        ]
+
+    def test_limit_is_shared_between_instances(self):
+        self.assertEqual(self.allowed(5), [True] * 4 + [False])
+
+    def test_previous_window_is_weighted(self):
+        self.allowed(4)
+
+        self.now += 60 + 15
+        self.assertEqual(self.allowed(2), [True, False])
+
+        self.now += 30
+        self.assertEqual(self.allowed(2), [True, True])
+
+    def test_rejected_requests_are_not_counted(self):
+        self.allowed(10)
+
+        self.now += 60 * 2
+        self.assertEqual(self.allowed(5), [True] * 4 + [False])
+
+    def test_wait_until_a_slot_frees(self):
+        self.allowed(4)
+        self.now += 60 + 15
+        throttle = self.throttle_class()
+        throttle.allow_request(self.request, None)
+        throttle.allow_request(self.request, None)
+
+        self.assertAlmostEqual(throttle.wait(), 15)
+
+
+@override_settings(IMAGE_PROCESSING_WORKERS=0)
+class ImageProcessingTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        cache.clear()
+
+        buffer = BytesIO()
+        Image.new("RGB", (1200, 800), "navy").save(buffer, format="PNG")
+        self.upload = SimpleUploadedFile("lee.png", buffer.getvalue())
+
+    def test_variants_are_generated_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            crew = Crew.objects.create(
+                first_name="Ann", last_name="Lee", image=self.upload
+            )
+
+        storage = crew.image.storage
+        with storage.open(variant_name(crew.image.name, "thumb")) as file:
+            self.assertEqual(Image.open(file).size, (320, 213))
+        with storage.open(variant_name(crew.image.name, "full")) as file:
+            image = Image.open(file)
+            self.assertEqual((image.format, image.size), ("WEBP", (1200, 800)))
+
+    def test_list_serializers_return_thumbnails(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sample_flight(
+                crew=Crew.objects.create(
+                    first_name="Ann", last_name="Lee", image=self.upload
+                )
+            )
+        client = APIClient()
+        client.force_authenticate(User.objects.create(email="u@airport.com"))
+
+        crew = client.get(FLIGHT_URL).data["results"][0]["crew"]
+
+        self.assertTrue(crew["image"].endswith(".thumb.webp"))
+
+    def test_original_is_served_until_processed(self):
+        crew = Crew.objects.create(
+            first_name="Ann", last_name="Lee", image=self.upload
+        )
+
+        data = CrewListSerializer(crew).data
+
+        self.assertEqual(data["image"], crew.image.url)
+
+    def test_processed_variants_are_recorded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            crew = Crew.objects.create(
+                first_name="Ann", last_name="Lee", image=self.upload
+            )
+        crew.refresh_from_db()
+        self.assertEqual(crew.image_variants, {"image": crew.image.name})
+
+        crew.image = SimpleUploadedFile("new.png", self.upload.open().read())
+        crew.save()
+        crew.refresh_from_db()
+        # The new upload is served as is until its variants exist
+        self.assertEqual(
+            CrewListSerializer(crew).data["image"], crew.image.url
+        )
+
+    def test_pool_callback_recycles_connections_and_logs_failures(self):
+        crew = Crew.objects.create(
+            first_name="Ann", last_name="Lee", image=self.upload
+        )
+        future = Future()
+        future.set_result([])
+
+        with mock.patch.object(
+            images, "close_old_connections"
+        ) as close_old_connections, mock.patch.object(
+            images, "record_variants", side_effect=OperationalError
+        ), self.assertLogs(images.logger) as logs:
+            images.variants_done(Crew, crew.image.name, future)
+
+        self.assertEqual(close_old_connections.call_count, 2)
+        self.assertIn(
+            f"Recording the variants of {crew.image.name} failed",
+            logs.output[0],
+        )
+
+        with mock.patch.object(images, "close_old_connections"):
+            images.variants_done(Crew, crew.image.name, future)
+        crew.refresh_from_db()
+        self.assertEqual(crew.image_variants, {"image": crew.image.name})
+
+    def test_serving_images_does_not_probe_storage(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sample_flight(
+                crew=Crew.objects.create(
+                    first_name="Ann", last_name="Lee", image=self.upload
+                )
+            )
+        client = APIClient()
+        client.force_authenticate(User.objects.create(email="u@airport.com"))
+        flight_id = Flight.objects.get().pk
+
+        with mock.patch.object(
+            FileSystemStorage, "exists", side_effect=AssertionError
+        ):
+            listed = client.get(FLIGHT_URL).data["results"][0]["crew"]
+            detail = client.get(
+                reverse("airport_service:flight-detail", args=[flight_id])
+            ).data["crew"]
+            crew = client.get(
+                reverse("airport_service:crew-list"), {"format": "json"}
+            ).json()
+
+        self.assertTrue(listed["image"].endswith(".thumb.webp"))
+        self.assertTrue(detail["image"].endswith(".thumb.webp"))
+        self.assertEqual(
+            [member["image"][-11:] for member in crew if member["image"]],
+            [".thumb.webp"],
+        )
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+    def setUp(self):
+        self.flight = sample_flight()
+        self.other_flight = sample_flight(
+            departure_time=timezone.now() + timedelta(days=10),
+            arrival_time=timezone.now() + timedelta(days=10, hours=3),
+        )
+        self.user = User.objects.create(email="admin@airport.com", is_staff=True)
+        for flight, seats in ((self.flight, 3), (self.other_flight, 1)):
+            order = Order.objects.create(user=self.user)
+            for seat in range(1, seats + 1):
+                Ticket.objects.create(
+                    flight=flight, order=order, row=1, seat=seat
+                )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, dataset, **params):
+        response = self.client.get(detail_url("export", dataset), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return b"".join(response.streaming_content).decode()
+
+    def test_only_staff_can_export(self):
+        self.client.force_authenticate(User.objects.create(email="u@a.com"))
+
+        response = self.client.get(detail_url("export", "flights"))
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_flights_as_ndjson_with_flight_filter(self):
+        rows = [
+            json.loads(line)
+            for line in self.export(
+                "flights",
+                departure_time_before=(
+                    timezone.now() + timedelta(days=5)
+                ).isoformat(),
+            ).splitlines()
+        ]
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["id"], self.flight.id)
+        self.assertEqual(rows[0]["seats_sold"], 3)
+        self.assertEqual(
+            rows[0]["departure_time"], self.flight.departure_time.isoformat()
+        )
+
+    def test_tickets_as_csv(self):
+        lines = self.export("tickets", output="csv").splitlines()
+
+        self.assertEqual(
+            lines[0], "id,order,flight,row,seat,created_at,user"
+        )
+        self.assertEqual(len(lines), 5)
+
+    def test_orders_are_filtered_by_their_flights(self):
+        rows = self.export(
+            "orders", destination_place="Heathrow", arrival_place="Boryspil"
+        ).splitlines()
+        self.assertEqual(len(rows), 2)
+
+        rows = self.export(
+            "orders",
+            departure_time_after=(
+                timezone.now() + timedelta(days=5)
+            ).isoformat(),
+        ).splitlines()
+        self.assertEqual(len(rows), 1)
+
+    def test_invalid_requests(self):
+        for url, params, expected in (
+            (
+                detail_url("export", "flights"),
+                {"output": "xml"},
+                status.HTTP_400_BAD_REQUEST,
+            ),
+            (
+                detail_url("export", "flights"),
+                {"departure_time_after": "soon"},
+                status.HTTP_400_BAD_REQUEST,
+            ),
+            (detail_url("export", "crew"), {}, status.HTTP_404_NOT_FOUND),
+        ):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, expected)
+
+
+class ImportTimetableTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.crew = Crew.objects.create(first_name="Ann", last_name="Lee")
+        self.files = {
+            "airports": self.write(
+                "airports.csv",
+                "name,city\nBoryspil,Kyiv\nHeathrow,London\nCDG,Paris\n",
+            ),
+            "airplanes": self.write(
+                "airplanes.json",
+                json.dumps([
+                    {
+                        "name": "A320",
+                        "rows": 30,
+                        "seats_in_row": 6,
+                        "airplane_type": "Narrow",
+                    }
+                ]),
+            ),
+            "routes": self.write(
+                "routes.csv",
+                "source,destination,distance\n"
+                "Boryspil,Heathrow,2100\nHeathrow,CDG,350\n",
+            ),
+            "flights": self.write(
+                "flights.ndjson",
+                "\n".join(
+                    json.dumps({
+                        "source": source,
+                        "destination": destination,
+                        "airplane": "A320",
+                        "crew": crew,
+                        "departure_time": f"2030-05-01T{hour:02d}:00:00",
+                        "arrival_time": f"2030-05-01T{hour + 2:02d}:00:00",
+                    })
+                    for source, destination, crew, hour in (
+                        ("Boryspil", "Heathrow", "Ann Lee", 8),
+                        ("Boryspil", "Heathrow", str(self.crew.id), 12),
+                        ("Heathrow", "CDG", "Ann Lee", 15),
+                    )
+                ),
+            ),
+        }
+
+    def write(self, name, content):
+        path = f"{self.directory.name}/{name}"
+        with open(path, "w") as file:
+            file.write(content)
+
+        return path
+
+    def import_timetable(self, *args, **files):
+        options = []
+        for name, path in {**self.files, **files}.items():
+            options += [f"--{name}", path]
+        call_command(
+            "import_timetable", *options, *args, "--batch-size", "2",
+            stdout=StringIO(),
+        )
+
+    def test_import_resolves_references_by_name(self):
+        self.import_timetable()
+
+        self.assertEqual(Airport.objects.count(), 3)
+        self.assertEqual(Airplane.objects.get().airplane.name, "Narrow")
+        flights = Flight.objects.order_by("departure_time")
+        self.assertEqual(
+            [
+                (flight.route.destination.name, flight.seats_sold)
+                for flight in flights
+            ],
+            [("Heathrow", 0), ("Heathrow", 0), ("CDG", 0)],
+        )
+        self.assertEqual(
+            flights[0].departure_time,
+            datetime(2030, 5, 1, 8, tzinfo=dt_timezone.utc),
+        )
+
+    def test_upsert_is_idempotent(self):
+        self.import_timetable()
+        self.import_timetable("--upsert")
+
+        self.assertEqual(Airport.objects.count(), 3)
+        self.assertEqual(Route.objects.count(), 2)
+        self.assertEqual(Flight.objects.count(), 3)
+
+        self.import_timetable(
+            "--upsert",
+            routes=self.write(
+                "routes.csv", "source,destination,distance\nHeathrow,CDG,344\n"
+            ),
+        )
+        self.assertEqual(
+            Route.objects.get(destination__name="CDG").distance, 344
+        )
+
+    def test_upsert_keeps_the_last_duplicate_row(self):
+        self.import_timetable()
+        crew = Crew.objects.create(first_name="Bob", last_name="Ray")
+        flights = self.write(
+            "flights.csv",
+            "source,destination,airplane,crew,departure_time,arrival_time\n"
+            "Boryspil,Heathrow,A320,Ann Lee,2030-05-01T08:00,2030-05-01T10:00\n"
+            "Boryspil,Heathrow,A320,Bob Ray,2030-05-01T08:00,2030-05-01T11:00\n"
+            "Heathrow,CDG,A320,Bob Ray,2030-05-02T08:00,2030-05-02T09:00\n"
+            "Heathrow,CDG,A320,Ann Lee,2030-05-02T08:00,2030-05-02T09:30\n",
+        )
+
+        out = StringIO()
+        call_command(
+            "import_timetable", "--flights", flights, "--upsert", stdout=out
+        )
+
+        self.assertIn("flights: 1 created, 1 updated", out.getvalue())
+        self.assertEqual(Flight.objects.count(), 4)
+        updated = Flight.objects.get(
+            route__destination__name="Heathrow",
+            departure_time=datetime(2030, 5, 1, 8, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual(updated.crew, crew)
+        self.assertEqual(updated.arrival_time.hour, 11)
+        created = Flight.objects.get(departure_time__day=2)
+        self.assertEqual(created.crew, self.crew)
+        self.assertEqual(created.arrival_time.minute, 30)
+
+    def test_existing_flights_need_upsert(self):
+        self.import_timetable()
+
+        with self.assertRaisesMessage(
+            CommandError, "flights:1: Key (route_id, departure_time)"
+        ):
+            self.import_timetable()
+
+    def test_new_airplane_types_are_created_in_one_insert(self):
+        airplanes = self.write(
+            "airplanes.csv",
+            "name,rows,seats_in_row,airplane_type\n"
+            "A320,30,6,Narrow\nA321,35,6,Narrow\nB777,40,9,Wide\n",
+        )
+
+        with CaptureQueriesContext(connection) as context:
+            call_command(
+                "import_timetable", "--airplanes", airplanes, stdout=StringIO()
+            )
+
+        inserts = [
+            query["sql"]
+            for query in context
+            if query["sql"].startswith(
+                f'INSERT INTO "{AirplaneType._meta.db_table}"'
+            )
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            dict(Airplane.objects.values_list("name", "airplane__name")),
+            {"A320": "Narrow", "A321": "Narrow", "B777": "Wide"},
+        )
+
+    def test_invalid_rows_abort_the_import(self):
+        flights = self.write(
+            "flights.csv",
+            "source,destination,airplane,crew,departure_time,arrival_time\n"
+            "Boryspil,Heathrow,A320,Ann Lee,2030-05-01T08:00,2030-05-01T10:00\n"
+            "Boryspil,CDG,A320,Ann Lee,2030-05-01T08:00,2030-05-01T10:00\n"
+            "Heathrow,CDG,B737,Ann Lee,2030-05-01T08:00,2030-05-01T10:00\n",
+        )
+
+        with self.assertRaisesMessage(CommandError, "flights:3: unknown route"):
+            self.import_timetable(flights=flights)
+
+        self.assertFalse(Airport.objects.exists())
+        self.assertFalse(Flight.objects.exists())
+
+
+class FlightScheduleTests(TestCase):
+    today = date(2030, 4, 29)
+
+    def setUp(self):
+        flight = sample_flight()
+        self.schedule = FlightSchedule.objects.create(
+            route=flight.route,
+            airplane=flight.airplane,
+            crew=flight.crew,
+            departure_time=time(8, 15),
+            duration=timedelta(hours=3),
+            days_of_week="135",
+            start_date=self.today,
+        )
+
+    def roll(self, days, today=None):
+        return roll_schedules(days, today=today or self.today, batch_size=2)
+
+    def scheduled_departures(self):
+        return list(
+            self.schedule.flights.order_by("departure_time").values_list(
+                "departure_time", flat=True
+            )
+        )
+
+    def test_rules_are_expanded_for_the_horizon(self):
+        self.assertEqual(self.roll(7), (1, 4))
+
+        self.assertEqual(
+            self.scheduled_departures(),
+            [
+                datetime(2030, month, day, 8, 15, tzinfo=dt_timezone.utc)
+                for month, day in ((4, 29), (5, 1), (5, 3), (5, 6))
+            ],
+        )
+        flight = self.schedule.flights.first()
+        self.assertEqual(
+            flight.arrival_time - flight.departure_time, timedelta(hours=3)
+        )
+
+    def test_only_missing_dates_are_generated(self):
+        self.roll(7)
+
+        self.assertEqual(self.roll(7), (0, 0))
+        self.assertEqual(self.roll(14), (1, 3))
+        self.assertEqual(len(self.scheduled_departures()), 7)
+
+    def test_rerun_after_lost_progress_does_not_duplicate(self):
+        self.roll(7)
+        FlightSchedule.objects.update(generated_until=None)
+
+        self.assertEqual(self.roll(7), (1, 0))
+        self.assertEqual(len(self.scheduled_departures()), 4)
+
+    def test_flights_already_in_the_timetable_are_not_counted(self):
+        departure = datetime(2030, 5, 1, 8, 15, tzinfo=dt_timezone.utc)
+        Flight.objects.create(
+            route=self.schedule.route,
+            airplane=self.schedule.airplane,
+            crew=self.schedule.crew,
+            departure_time=departure,
+            arrival_time=departure + timedelta(hours=3),
+        )
+
+        self.assertEqual(self.roll(7), (1, 3))
+        self.assertNotIn(departure, self.scheduled_departures())
+
+    def test_end_date_stops_the_schedule(self):
+        self.schedule.end_date = date(2030, 5, 2)
+        self.schedule.save()
+
+        self.roll(30)
+
+        self.assertEqual(len(self.scheduled_departures()), 2)
+        self.assertEqual(self.roll(30, today=date(2030, 5, 10)), (0, 0))
+
+
+class SparseFieldsetTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(email="sparse@airport.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+        self.order = Order.objects.create(user=self.user)
+        Ticket.objects.create(
+            flight=self.flight, order=self.order, row=1, seat=1
+        )
+
+    def get(self, url, **params):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data, context.captured_queries
+
+    def test_fields_limits_the_representation(self):
+        data, _ = self.get(FLIGHT_URL, fields="id,departure_time")
+        self.assertEqual(
+            set(data["results"][0]), {"id", "departure_time"}
+        )
+
+        data, queries = self.get(
+            flight_detail_url(self.flight.id), fields="id,route"
+        )
+        self.assertEqual(set(data), {"id", "route"})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("airport_service_crew", queries[0]["sql"])
+
+    def test_nested_relations_collapse_to_keys_unless_expanded(self):
+        url = flight_detail_url(self.flight.id)
+
+        data, queries = self.get(url, expand="")
+        self.assertEqual(data["route"], self.flight.route_id)
+        self.assertEqual(data["airplane"], self.flight.airplane_id)
+        self.assertEqual(data["crew"], self.flight.crew_id)
+        self.assertEqual(data["seats_available"], 59)
+        self.assertEqual(queries[0]["sql"].count("JOIN"), 1)
+        self.assertIn("airport_service_airplane", queries[0]["sql"])
+
+        data, _ = self.get(url, expand="route")
+        self.assertEqual(data["route"]["id"], self.flight.route_id)
+        self.assertEqual(data["route"]["source"], self.flight.route.source_id)
+
+        data, _ = self.get(url, expand="route.source")
+        self.assertEqual(data["route"]["source"]["name"], "Boryspil")
+
+    def test_defaults_are_unchanged(self):
+        full, _ = self.get(flight_detail_url(self.flight.id))
+        expanded, _ = self.get(
+            flight_detail_url(self.flight.id),
+            expand="route.source,route.destination,airplane,crew",
+        )
+        self.assertEqual(full, expanded)
+
+    def test_routes_join_only_expanded_airports(self):
+        url = reverse("airport_service:route-list")
+
+        data, queries = self.get(url, expand="")
+        self.assertEqual(
+            data[0]["source"], self.flight.route.source_id
+        )
+        self.assertNotIn("JOIN", queries[-1]["sql"])
+
+        data, queries = self.get(url, expand="destination")
+        self.assertEqual(
+            data[0]["destination"]["name"], "Heathrow"
+        )
+        self.assertEqual(queries[-1]["sql"].count("JOIN"), 1)
+
+    def test_orders_skip_ticket_joins_when_not_requested(self):
+        data, queries = self.get(ORDER_URL, fields="id,created_at")
+        self.assertEqual(set(data["results"][0]), {"id", "created_at"})
+        self.assertEqual(len(queries), 1)
+
+        data, queries = self.get(ORDER_URL, expand="")
+        self.assertEqual(
+            data["results"][0]["tickets"], [self.order.tickets.get().id]
+        )
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn("JOIN", queries[-1]["sql"])
+
+        data, _ = self.get(
+            detail_url("order", self.order.id), expand="tickets.flight"
+        )
+        flight = data["tickets"][0]["flight"]
+        self.assertEqual(flight["route"], self.flight.route_id)
+        self.assertEqual(flight["airplane"], self.flight.airplane_id)
+
+
+    def test_order_expand_relations_follow_the_action(self):
+        def view(action):
+            request = APIRequestFactory().get(
+                ORDER_URL, {"expand": "tickets.flight"}
+            )
+            force_authenticate(request, self.user)
+            return OrderViewSet(
+                action=action,
+                request=Request(request),
+                format_kwarg=None,
+                kwargs={},
+            )
+
+        retrieve = view("retrieve")
+        before = retrieve.get_select_related()
+        retrieve.get_queryset()
+
+        self.assertEqual(before, ["flight__airplane"])
+        self.assertEqual(retrieve.get_select_related(), before)
+        self.assertEqual(
+            view("list").get_select_related(),
+            ["flight__route__destination", "flight__route__source"],
+        )
+
+
+class ORJSONTests(TestCase):
+
+    def test_output_matches_json_renderer(self):
+        data = {
+            "departure_time": datetime(2026, 5, 1, 8, 30, tzinfo=dt_timezone.utc),
+            "date": date(2026, 5, 1),
+            "price": Decimal("12.50"),
+            "label": gettext_lazy("Flight"),
+            "note": "Kyiv \u2028 Київ",
+            "seats": {1: [1, 2], 2: []},
+            "flights": Flight.objects.none(),
+        }
+
+        self.assertEqual(
+            ORJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+    def test_indent_is_honoured(self):
+        content = ORJSONRenderer().render(
+            {"id": 1}, "application/json; indent=4"
+        )
+        self.assertEqual(content, b'{\n  "id": 1\n}')
+
+    def test_parser(self):
+        body = b'{"tickets": [{"row": 1, "seat": 2, "flight": 3}]}'
+        self.assertEqual(
+            ORJSONParser().parse(BytesIO(body)),
+            JSONParser().parse(BytesIO(body)),
+        )
+
+        for invalid in (b"{", b'{"row": NaN}'):
+            with self.assertRaises(ParseError):
+                ORJSONParser().parse(BytesIO(invalid))
+
+    def test_api_uses_orjson(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create(email="json@air.com"))
+        sample_flight()
+
+        response = client.get(FLIGHT_URL)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertIsInstance(
+            response.accepted_renderer, ORJSONRenderer
+        )
+
+        response = client.post(
+            ORDER_URL, b"{", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(IMAGE_PROCESSING_WORKERS=0)
+class RowMapperParityTests(TestCase):
+    """
+    List actions served by a RowMapper must render byte for byte what the
+    list serializer renders.
+    """
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(email="p@air.com"))
+
+        buffer = BytesIO()
+        Image.new("RGB", (640, 480), "navy").save(buffer, format="PNG")
+        with self.captureOnCommitCallbacks(execute=True):
+            crew = Crew.objects.create(
+                first_name="Ann",
+                image=SimpleUploadedFile("ann.png", buffer.getvalue()),
+            )
+        flight = sample_flight(crew=crew)
+        flight.airplane.outside_image = SimpleUploadedFile(
+            "a320.png", buffer.getvalue()
+        )
+        flight.airplane.save()
+
+        nowhere = Airport.objects.create(name="Nowhere")
+        for hours in (5, 29, 53):
+            Flight.objects.create(
+                route=Route.objects.create(
+                    source=nowhere,
+                    destination=flight.route.destination,
+                    distance=900,
+                ),
+                airplane=flight.airplane,
+                crew=flight.crew,
+                departure_time=flight.departure_time + timedelta(hours=hours),
+                arrival_time=flight.arrival_time + timedelta(hours=hours),
+            )
+        Flight.objects.filter(pk=flight.pk).update(seats_sold=7)
+
+    def assertSameAsSerializer(self, viewset, url, params=None):
+        cache.clear()
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        cache.clear()
+        with mock.patch.object(viewset, "list_mapper", None):
+            expected = self.client.get(url, params)
+
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(
+            JSONRenderer().render(response.data),
+            JSONRenderer().render(expected.data),
+        )
+        return response
+
+    def test_flights(self):
+        response = self.assertSameAsSerializer(
+            FlightViewSet, FLIGHT_URL, {"page_size": 2}
+        )
+        flights = response.data["results"]
+        self.assertTrue(flights[0]["crew"]["image"].endswith(".thumb.webp"))
+        self.assertEqual(flights[0]["crew"]["full_name"], "Ann None")
+        self.assertTrue(flights[1]["arrival_place"].startswith("Nowhere"))
+
+        self.assertSameAsSerializer(FlightViewSet, response.data["next"])
+        self.assertSameAsSerializer(
+            FlightViewSet, FLIGHT_URL, {"arrival_place": "Nowhere"}
+        )
+
+    def test_routes_and_airplanes(self):
+        self.assertSameAsSerializer(
+            RouteViewSet, reverse("airport_service:route-list")
+        )
+        self.assertSameAsSerializer(
+            AirplaneViewSet, reverse("airport_service:airplane-list")
+        )
+
+    def test_sparse_requests_use_the_serializer(self):
+        with mock.patch.object(
+            FlightViewSet.list_mapper, "map", side_effect=AssertionError
+        ):
+            response = self.client.get(FLIGHT_URL, {"fields": "id"})
+
+        self.assertEqual(set(response.data["results"][0]), {"id"})
+
+
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        instrumentation.reset()
+        cache.clear()
+        self.user = User.objects.create(email="metrics@airport.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+
+    def metrics(self):
+        self.user.is_staff = True
+        response = self.client.get(reverse("airport_service:metrics-list"))
+        self.user.is_staff = False
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        return response.content.decode()
+
+    def test_server_timing_header(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(flight_detail_url(self.flight.id))
+
+        timing = response["Server-Timing"]
+        self.assertIn(f'desc="{len(context)} queries"', timing)
+        for phase in ("db;dur=", "serializer;dur=", "total;dur="):
+            self.assertIn(phase, timing)
+
+    def test_histograms_per_view_action(self):
+        self.client.get(FLIGHT_URL)
+        self.client.get(FLIGHT_URL)
+        self.client.get(flight_detail_url(self.flight.id))
+
+        metrics = self.metrics()
+
+        self.assertIn(
+            'airport_request_duration_seconds_count{view="FlightViewSet.list"} 2',
+            metrics,
+        )
+        self.assertIn(
+            'airport_request_db_queries_bucket{view="FlightViewSet.list",le="1"} 2',
+            metrics,
+        )
+        self.assertIn(
+            "airport_request_serializer_duration_seconds_count"
+            '{view="FlightViewSet.retrieve"} 1',
+            metrics,
+        )
+        self.assertIn(
+            "# TYPE airport_request_db_duration_seconds histogram", metrics
+        )
+
+    def timed_representations(self, serializer_class):
+        """
+        Whether each representation of serializer_class was built inside
+        serializer_timer
+        """
+        timed = []
+        to_representation = serializer_class.to_representation
+
+        def record(serializer, instance):
+            timed.append(instrumentation._current.get().depth == 1)
+            return to_representation(serializer, instance)
+
+        patcher = mock.patch.object(
+            serializer_class,
+            "to_representation",
+            autospec=True,
+            side_effect=record,
+        )
+        return patcher, timed
+
+    def test_serializer_data_is_timed_in_the_views(self):
+        patcher, timed = self.timed_representations(FlightDetailSerializer)
+        with patcher:
+            self.client.get(flight_detail_url(self.flight.id))
+        list_patcher, list_timed = self.timed_representations(
+            FlightListSerializer
+        )
+        with list_patcher:
+            self.client.get(FLIGHT_URL, {"fields": "id"})
+
+        self.assertEqual(timed, [True])
+        self.assertEqual(list_timed, [True])
+
+    def test_serializers_are_not_patched(self):
+        self.client.get(FLIGHT_URL)
+
+        for serializer_class in (
+            serializers.Serializer,
+            serializers.ListSerializer,
+        ):
+            self.assertEqual(
+                vars(serializer_class)["data"].fget.__module__,
+                "rest_framework.serializers",
+            )
+
+    def test_metrics_are_staff_only(self):
+        response = self.client.get(reverse("airport_service:metrics-list"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_async_views_are_measured(self):
+        user = await User.objects.aget(pk=self.user.pk)
+        response = await AsyncClient().get(
+            reverse(
+                "airport_service:async-flight-detail", args=[self.flight.id]
+            ),
+            headers={"Authorization": f"Bearer {AccessToken.for_user(user)}"},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response["Server-Timing"], r'desc="[1-9]\d* queries"')
+
+    @override_settings(REQUEST_METRICS_ENABLED=False)
+    def test_disabled_middleware_is_not_loaded(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestMetricsMiddleware(lambda request: None)
+
+
+class SyntheticDataTests(TestCase):
+    def generate(self, **options):
+        counts = dict(
+            airports=20,
+            routes=40,
+            airplanes=3,
+            crew=5,
+            flights=50,
+            users=5,
+            orders=100,
+            batch_size=30,
+        )
+        counts.update(options)
+        call_command("generate_synthetic_data", stdout=StringIO(), **counts)
+
+    def test_counts_and_consistent_seats(self):
+        self.generate()
+
+        self.assertEqual(Airport.objects.count(), 20)
+        self.assertEqual(Route.objects.count(), 40)
+        self.assertEqual(Flight.objects.count(), 50)
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Order.objects.count(), 100)
+        self.assertFalse(
+            Route.objects.filter(source=F("destination")).exists()
+        )
+        for flight in Flight.objects.annotate(tickets_count=Count("tickets")):
+            self.assertEqual(flight.seats_sold, flight.tickets_count)
+        self.assertEqual(
+            Ticket.objects.values("flight", "row", "seat").distinct().count(),
+            Ticket.objects.count(),
+        )
+        self.assertTrue(
+            User.objects.first().check_password("loadtest")
+        )
+
+    def test_same_seed_same_data(self):
+        seats = Ticket.objects.order_by("pk").values_list("row", "seat")
+        self.generate()
+        first = list(seats)
+        self.generate()
+
+        self.assertEqual(list(seats.all())[len(first):], first)
+
+    def test_sequences_are_reset(self):
+        self.generate()
+        order = Order.objects.create(user=User.objects.first())
+
+        self.assertGreater(
+            order.pk, Order.objects.exclude(pk=order.pk).latest("pk").pk
+        )
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="retry@airport.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+
+    def order(self, key, row=1, seat=1, client=None):
+        return (client or self.client).post(
+            ORDER_URL,
+            {
+                "tickets": [
+                    {"flight": self.flight.id, "row": row, "seat": seat}
+                ]
+            },
+            format="json",
+            headers={"Idempotency-Key": key},
+        )
+
+    def test_retry_replays_stored_response(self):
+        first = self.order("a1")
+        with mock.patch.object(OrderSerializer, "is_valid") as is_valid:
+            retry = self.order("a1")
+
+        is_valid.assert_not_called()
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+        self.flight.refresh_from_db()
+        self.assertEqual(self.flight.seats_sold, 1)
+
+    def test_key_reused_with_other_body(self):
+        self.order("a1")
+        response = self.order("a1", seat=2)
+
+        self.assertEqual(
+            response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_keys_are_per_user(self):
+        other = APIClient()
+        other.force_authenticate(
+            User.objects.create(email="other@airport.com")
+        )
+        self.order("a1")
+        response = self.order("a1", seat=2, client=other)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_failed_request_is_not_stored(self):
+        self.order("a1")
+        taken = self.order("b2")
+        retry = self.order("b2", seat=2)
+
+        self.assertEqual(taken.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            IdempotencyKey.objects.filter(key="b2").count(), 1
+        )
+
+    def test_no_header_creates_every_time(self):
+        for seat in (1, 2):
+            self.client.post(
+                ORDER_URL,
+                {
+                    "tickets": [
+                        {"flight": self.flight.id, "row": 1, "seat": seat}
+                    ]
+                },
+                format="json",
+            )
+
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_too_long_key(self):
+        response = self.order("k" * 256)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+    @override_settings(IDEMPOTENCY_KEY_TTL=60)
+    def test_expired_keys(self):
+        self.order("old")
+        IdempotencyKey.objects.update(
+            created_at=timezone.now() - timedelta(minutes=2)
+        )
+        self.order("new", seat=2)
+
+        retry = self.order("old", seat=3)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("Idempotent-Replayed", retry)
+
+        IdempotencyKey.objects.filter(key="old").update(
+            created_at=timezone.now() - timedelta(minutes=2)
+        )
+        out = StringIO()
+        call_command("purge_idempotency_keys", batch_size=1, stdout=out)
+
+        self.assertIn("Deleted 1", out.getvalue())
+        self.assertEqual(
+            list(IdempotencyKey.objects.values_list("key", flat=True)),
+            ["new"],
+        )
+
+
+class CachedResponseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create(email="cache@airport.com")
+        )
+        for name, city in (("Boryspil", "Kyiv"), ("Heathrow", "London")):
+            Airport.objects.create(name=name, city=city)
+
+    def test_equivalent_queries_share_a_cached_response(self):
+        first = self.client.get(
+            AIRPORT_URL, {"city": "Kyiv,London", "format": "json"}
+        )
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                f"{AIRPORT_URL}?format=json&city=London,Kyiv"
+            )
+        with self.assertNumQueries(0):
+            self.client.get(
+                f"{AIRPORT_URL}?city=London&city=Kyiv&format=json"
+            )
+
+        self.assertEqual(response.json(), first.json())
+
+    def test_other_queries_are_cached_apart(self):
+        self.client.get(AIRPORT_URL, {"city": "Kyiv"})
+        response = self.client.get(AIRPORT_URL, {"city": "London"})
+
+        self.assertEqual(
+            [airport["name"] for airport in response.json()],
+            ["Heathrow"],
+        )
+
+    def test_write_invalidates_cached_responses(self):
+        self.client.get(AIRPORT_URL)
+        airport = Airport.objects.create(name="CDG", city="Paris")
+        self.assertIn(
+            "CDG",
+            [item["name"] for item in self.client.get(AIRPORT_URL).json()],
+        )
+
+        airport.delete()
+        self.assertNotIn(
+            "CDG",
+            [item["name"] for item in self.client.get(AIRPORT_URL).json()],
+        )
+
+    def test_version_is_bumped_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Airport.objects.create(name="CDG", city="Paris")
+            # A miss filled now might still read the pre-commit rows
+            during = get_versions([Airport])
+
+        self.assertNotEqual(get_versions([Airport]), during)
+
+
+class AsyncViewTests(TestCase):
+    """
+    The async endpoints answer like their sync viewsets
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(email="async@airport.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.async_client = AsyncClient()
+        self.headers = {
+            "Authorization": f"Bearer {AccessToken.for_user(self.user)}"
+        }
+        first = sample_flight()
+        self.flights = [first] + flights_after(first, (0, 0, 1, 2, 2, 30))
+        sample_flight()
+
+    async def get_both(self, name, *args, query=None):
+        sync_response = await sync_to_async(self.client.get)(
+            reverse(f"airport_service:{name}", args=args), query
+        )
+        async_response = await self.async_client.get(
+            reverse(f"airport_service:async-{name}", args=args),
+            query,
+            headers=self.headers,
+        )
+        return sync_response, async_response
+
+    async def assertSameResponse(self, name, *args, query=None):
+        sync_response, async_response = await self.get_both(
+            name, *args, query=query
+        )
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.json(), sync_response.json())
+        return async_response
+
+    async def walk(self, url, query):
+        ids = []
+        while url:
+            response = await self.async_client.get(
+                url, query, headers=self.headers
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            page = response.json()
+            ids += [flight["id"] for flight in page["results"]]
+            url, query = page["next"], None
+        return ids
+
+    async def test_airport_and_route_endpoints(self):
+        route = self.flights[0].route
+        await self.assertSameResponse("airport-list")
+        await self.assertSameResponse("airport-list", query={"city": "Kyiv"})
+        await self.assertSameResponse("airport-detail", route.source_id)
+        await self.assertSameResponse("route-list")
+        await self.assertSameResponse("route-detail", route.id)
+
+    async def test_flight_endpoints(self):
+        flight = self.flights[0]
+        day = flight.departure_time.date()
+        response = await self.assertSameResponse(
+            "flight-list",
+            query={
+                "route": flight.route_id,
+                "arrival_place": "Boryspil",
+                "departure_time_after": day.isoformat(),
+                "departure_time_before": (day + timedelta(days=1)).isoformat(),
+                "page_size": 100,
+            },
+        )
+        self.assertTrue(response.json()["results"])
+        await self.assertSameResponse("flight-detail", flight.id)
+
+    async def test_flight_pages_match_sync_pagination(self):
+        query = {"route": self.flights[0].route_id, "page_size": 2}
+        sync_ids = []
+        url = FLIGHT_URL
+        while url:
+            page = (
+                await sync_to_async(self.client.get)(url, query)
+            ).json()
+            sync_ids += [flight["id"] for flight in page["results"]]
+            url, query = page["next"], None
+
+        async_ids = await self.walk(
+            reverse("airport_service:async-flight-list"),
+            {"route": self.flights[0].route_id, "page_size": 2},
+        )
+        self.assertEqual(async_ids, sync_ids)
+        route_id = self.flights[0].route_id
+        self.assertCountEqual(
+            async_ids,
+            [
+                flight.id
+                for flight in self.flights
+                if flight.route_id == route_id
+            ],
+        )
+
+    async def test_errors(self):
+        for query in ({"route": "abc"}, {"departure_time_after": "never"}):
+            sync_response, async_response = await self.get_both(
+                "flight-list", query=query
+            )
+            self.assertEqual(
+                sync_response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+            self.assertEqual(
+                async_response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+
+        response = await self.async_client.get(
+            reverse("airport_service:async-flight-detail", args=[0]),
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = await self.async_client.get(
+            reverse("airport_service:async-flight-list")
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", response)
+
+    async def test_requests_are_throttled(self):
+        class Throttle(UserSlidingWindowThrottle):
+            rate = "2/min"
+
+        url = reverse("airport_service:async-flight-list")
+        with mock.patch.object(
+            AsyncFlightView, "throttle_classes", [Throttle]
+        ):
+            statuses = [
+                (await self.async_client.get(url, headers=self.headers))
+                for _ in range(3)
+            ]
+
+        self.assertEqual(
+            [response.status_code for response in statuses],
+            [
+                status.HTTP_200_OK,
+                status.HTTP_200_OK,
+                status.HTTP_429_TOO_MANY_REQUESTS,
+            ],
+        )
+        self.assertIn("Retry-After", statuses[-1])
+
+
+class ItinerarySearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        itinerary._index = None
+        self.addCleanup(setattr, itinerary, "_index", None)
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create(email="traveller@airport.com")
+        )
+        self.date = timezone.localdate() + timedelta(days=2)
+
+        self.airports = {
+            code: Airport.objects.create(name=name, city=city)
+            for code, name, city in (
+                ("KBP", "Boryspil", "Kyiv"),
+                ("IEV", "Zhuliany", "Kyiv"),
+                ("WAW", "Chopin", "Warsaw"),
+                ("BER", "Brandenburg", "Berlin"),
+                ("CDG", "Charles de Gaulle", "Paris"),
+            )
+        }
+        self.airplane = Airplane.objects.create(
+            name="A320",
+            rows=10,
+            seats_in_row=6,
+            airplane=AirplaneType.objects.create(name="Jet"),
+        )
+        self.crew = Crew.objects.create(first_name="Ann", last_name="Lee")
+        self.routes = {}
+        self.flights = {
+            name: self.flight(source, destination, departure, arrival)
+            for name, source, destination, departure, arrival in (
+                ("direct", "KBP", "CDG", "08:00", "12:00"),
+                ("sold_out", "IEV", "CDG", "07:00", "09:00"),
+                ("to_waw", "KBP", "WAW", "08:00", "10:00"),
+                ("waw_short", "WAW", "CDG", "10:30", "12:30"),
+                ("waw_ok", "WAW", "CDG", "11:00", "13:00"),
+                ("waw_late", "WAW", "CDG", "17:00", "19:00"),
+                ("to_ber", "KBP", "BER", "06:00", "07:00"),
+                ("ber_waw", "BER", "WAW", "08:00", "09:00"),
+            )
+        }
+        Flight.objects.filter(pk=self.flights["sold_out"]).update(
+            seats_sold=60
+        )
+        Flight.objects.filter(pk=self.flights["direct"]).update(
+            seats_sold=59
+        )
+
+    def at(self, clock):
+        hour, minute = map(int, clock.split(":"))
+        return datetime.combine(
+            self.date,
+            time(hour, minute),
+            tzinfo=timezone.get_current_timezone(),
+        )
+
+    def flight(self, source, destination, departure, arrival):
+        if (source, destination) not in self.routes:
+            self.routes[source, destination] = Route.objects.create(
+                source=self.airports[source],
+                destination=self.airports[destination],
+                distance=1000,
+            )
+        return Flight.objects.create(
+            route=self.routes[source, destination],
+            airplane=self.airplane,
+            crew=self.crew,
+            departure_time=self.at(departure),
+            arrival_time=self.at(arrival),
+        ).pk
+
+    def search(self, **params):
+        query = {
+            "source_city": "Kyiv",
+            "destination_city": "Paris",
+            "date": self.date.isoformat(),
+        }
+        query.update(params)
+        query = {
+            name: value for name, value in query.items() if value is not None
+        }
+        response = self.client.get(
+            reverse("airport_service:itinerary-list"), query
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        names = {pk: name for name, pk in self.flights.items()}
+        return [
+            [names[leg["flight"]] for leg in found["legs"]]
+            for found in response.json()
+        ]
+
+    def test_ranked_by_arrival_then_stops(self):
+        self.assertEqual(
+            self.search(),
+            [
+                ["direct"],
+                ["to_ber", "ber_waw", "waw_short"],
+                ["to_waw", "waw_ok"],
+                ["to_ber", "ber_waw", "waw_ok"],
+            ],
+        )
+
+    def test_connection_window(self):
+        self.assertIn(["to_waw", "waw_short"], self.search(min_connection=30))
+        self.assertNotIn(
+            ["to_waw", "waw_short"], self.search(min_connection=31)
+        )
+        self.assertIn(["to_waw", "waw_late"], self.search(max_connection=420))
+        self.assertNotIn(
+            ["to_waw", "waw_late"], self.search(max_connection=419)
+        )
+
+    def test_max_stops(self):
+        self.assertEqual(self.search(max_stops=0), [["direct"]])
+        self.assertEqual(
+            self.search(max_stops=1), [["direct"], ["to_waw", "waw_ok"]]
+        )
+
+    def test_legs_without_enough_seats_are_skipped(self):
+        found = self.search(passengers=2)
+
+        self.assertNotIn(["direct"], found)
+        self.assertEqual(len(found), 3)
+        self.assertNotIn(["sold_out"], self.search())
+
+    def test_airports_and_cities(self):
+        self.assertEqual(
+            self.search(source_city="KYIV", destination_city="paris"),
+            self.search(),
+        )
+        self.assertEqual(
+            self.search(
+                source_city="Warsaw",
+                destination=self.airports["CDG"].pk,
+                destination_city=None,
+            ),
+            [["waw_short"], ["waw_ok"], ["waw_late"]],
+        )
+        self.assertEqual(self.search(source_city="Lviv"), [])
+
+    def test_limit(self):
+        self.assertEqual(
+            self.search(limit=2),
+            [["direct"], ["to_ber", "ber_waw", "waw_short"]],
+        )
+
+    def test_index_is_rebuilt_after_ttl(self):
+        index = itinerary.get_itinerary_index()
+        self.flight("KBP", "CDG", "09:00", "11:00")
+
+        self.assertIs(itinerary.get_itinerary_index(), index)
+        with mock.patch.object(
+            itinerary.time,
+            "monotonic",
+            return_value=index.built_at + settings.ITINERARY_INDEX_TTL,
+        ):
+            rebuilt = itinerary.get_itinerary_index()
+
+        self.assertIsNot(rebuilt, index)
+        self.assertEqual(len(rebuilt), len(index) + 1)
+
+
+class AirportAutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create(email="typeahead@airport.com")
+        )
+        for name, city in (
+            ("London Heathrow", "London"),
+            ("London City", "London"),
+            ("Luton", "London"),
+            ("Gatwick London", "Crawley"),
+            ("Lon", "Lonely Island"),
+            ("Zürich", "Zürich"),
+            ("São Paulo-Guarulhos", "São Paulo"),
+            ("Boryspil", "Kyiv"),
+        ):
+            Airport.objects.create(name=name, city=city)
+
+    def names(self, q, **params):
+        response = self.client.get(
+            reverse("airport_service:airport-autocomplete"),
+            {"q": q, **params},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [airport["name"] for airport in response.json()]
+
+    def test_exact_then_prefix_then_city_then_inner_word(self):
+        self.assertEqual(
+            self.names("lon"),
+            [
+                "Lon",
+                "London City",
+                "London Heathrow",
+                "Luton",
+                "Gatwick London",
+            ],
+        )
+
+    def test_prefix_of_several_words(self):
+        self.assertEqual(self.names("london h"), ["London Heathrow"])
+        self.assertEqual(self.names("paulo g"), ["São Paulo-Guarulhos"])
+
+    def test_case_and_diacritics_are_folded(self):
+        self.assertEqual(self.names("ZURI"), ["Zürich"])
+        self.assertEqual(self.names("zür"), ["Zürich"])
+        self.assertEqual(self.names("sao"), ["São Paulo-Guarulhos"])
+
+    def test_no_match(self):
+        self.assertEqual(self.names("xyz"), [])
+        self.assertEqual(self.names("--"), [])
+
+    def test_limit(self):
+        self.assertEqual(
+            self.names("lon", limit=2), ["Lon", "London City"]
+        )
+        response = self.client.get(
+            reverse("airport_service:airport-autocomplete"),
+            {"q": "lon", "limit": 51},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_new_airports_are_found(self):
+        self.names("kyi")
+        Airport.objects.create(name="Zhuliany", city="Kyiv")
+
+        self.assertEqual(self.names("kyi"), ["Boryspil", "Zhuliany"])
+
+
+class SeatsSoldCounterTests(TestCase):
+    def setUp(self):
+        self.flight = sample_flight()
+        self.other = Flight.objects.create(
+            route=self.flight.route,
+            airplane=self.flight.airplane,
+            crew=self.flight.crew,
+            departure_time=self.flight.departure_time + timedelta(days=1),
+            arrival_time=self.flight.arrival_time + timedelta(days=1),
+        )
+        self.order = Order.objects.create(
+            user=User.objects.create(email="counter@airport.com")
+        )
+
+    def seats_sold(self):
+        return [
+            Flight.objects.get(pk=flight.pk).seats_sold
+            for flight in (self.flight, self.other)
+        ]
+
+    def book(self, flight, *seats):
+        return [
+            Ticket.objects.create(
+                flight=flight, order=self.order, row=1, seat=seat
+            )
+            for seat in seats
+        ]
+
+    def test_ticket_create_and_delete(self):
+        first, _ = self.book(self.flight, 1, 2)
+        self.assertEqual(self.seats_sold(), [2, 0])
+
+        first.delete()
+        self.assertEqual(self.seats_sold(), [1, 0])
+
+    def test_cascade_order_delete(self):
+        self.book(self.flight, 1, 2)
+        self.book(self.other, 1)
+
+        self.order.delete()
+        self.assertEqual(self.seats_sold(), [0, 0])
+
+    def test_ticket_moved_to_another_flight(self):
+        ticket, = self.book(self.flight, 1)
+        ticket = Ticket.objects.get(pk=ticket.pk)
+
+        ticket.flight = self.other
+        ticket.save()
+        self.assertEqual(self.seats_sold(), [0, 1])
+
+        ticket.seat = 2
+        ticket.save()
+        self.assertEqual(self.seats_sold(), [0, 1])
+
+        ticket.flight = self.flight
+        ticket.save()
+        ticket.delete()
+        self.assertEqual(self.seats_sold(), [0, 0])
+
+    def test_reconcile_seats(self):
+        self.book(self.flight, 1, 2)
+        Flight.objects.filter(pk=self.flight.pk).update(seats_sold=7)
+        Flight.objects.filter(pk=self.other.pk).update(seats_sold=3)
+
+        out = StringIO()
+        call_command("reconcile_seats", dry_run=True, stdout=out)
+        self.assertIn("Found 2 drifted flight(s)", out.getvalue())
+        self.assertEqual(self.seats_sold(), [7, 3])
+
+        out = StringIO()
+        call_command("reconcile_seats", stdout=out)
+        self.assertIn(f"Flight {self.flight.pk}: 7 -> 2", out.getvalue())
+        self.assertIn("Fixed 2 drifted flight(s)", out.getvalue())
+        self.assertEqual(self.seats_sold(), [2, 0])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="pages@airport.com")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Most flights share a departure_time, as at a busy hub
+        flights_after(sample_flight(), (0, 0, 0, 0, 0, 0, 1, 1, 2, -1))
+
+    def walk(self, url, query, link="next"):
+        ids = []
+        queries = []
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, query)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            queries += [query["sql"] for query in context.captured_queries]
+            page = response.json()
+            ids.append([item["id"] for item in page["results"]])
+            url, query = page[link], None
+        return ids, queries
+
+    def test_flight_pages_walk_ties_forward_and_back(self):
+        expected = list(
+            Flight.objects.order_by("departure_time", "id").values_list(
+                "id", flat=True
+            )
+        )
+        pages, queries = self.walk(FLIGHT_URL, {"page_size": 3})
+
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 2])
+        for sql in queries:
+            self.assertNotIn("OFFSET", sql)
+
+        last = self.client.get(FLIGHT_URL, {"page_size": 3}).json()
+        for _ in range(3):
+            last = self.client.get(last["next"]).json()
+        backwards, _ = self.walk(last["previous"], None, link="previous")
+        self.assertEqual(sum(backwards[::-1], []), expected[:-2])
+
+    def test_order_pages_with_equal_created_at(self):
+        orders = [Order.objects.create(user=self.user) for _ in range(7)]
+        Order.objects.filter(pk__in=[order.pk for order in orders[:5]]).update(
+            created_at=orders[0].created_at
+        )
+        expected = list(
+            Order.objects.order_by("-created_at", "-id").values_list(
+                "id", flat=True
+            )
+        )
+
+        pages, _ = self.walk(ORDER_URL, {"page_size": 2})
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_invalid_cursor(self):
+        for cursor in ("garbage", "cD0xMjM=", "cD0lNUIxJTVE"):
+            response = self.client.get(FLIGHT_URL, {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_forged_cursor_values(self):
+        departure = Flight.objects.first().departure_time.isoformat()
+        for url in (
+            FLIGHT_URL,
+            ORDER_URL,
+            reverse("airport_service:async-flight-list"),
+        ):
+            for position in (
+                ["x", 1],
+                [departure, "abc"],
+                [1, 2],
+                [None, 1],
+                [[departure], {}],
+            ):
+                cursor = base64.b64encode(
+                    urlencode({"p": json.dumps(position)}).encode()
+                ).decode()
+                response = self.client.get(url, {"cursor": cursor})
+                self.assertEqual(
+                    response.status_code, status.HTTP_404_NOT_FOUND
+                )
+
+
+class SeatMapTests(TestCase):
+    def test_round_trip(self):
+        for rows, seats_in_row, taken in (
+            (1, 1, []),
+            (1, 1, [(1, 1)]),
+            (3, 3, [(1, 1), (2, 2), (3, 3)]),
+            (30, 6, [(row, seat) for row in (1, 15, 30) for seat in (1, 6)]),
+            (4, 7, [(row, 7) for row in range(1, 5)]),
+        ):
+            data = encode_seat_map(rows, seats_in_row, reversed(taken))
+            self.assertEqual(decode_seat_map(rows, seats_in_row, data), taken)
+
+    def test_bit_layout(self):
+        self.assertEqual(encode_seat_map(2, 6, [(1, 1), (2, 6)]), "gBA=")
+
+    def test_flight_detail_seat_map_matches_taken_seats(self):
+        flight = sample_flight()
+        order = Order.objects.create(
+            user=User.objects.create(email="map@airport.com")
+        )
+        for row, seat in ((1, 1), (1, 6), (4, 3), (10, 6)):
+            Ticket.objects.create(
+                flight=flight, order=order, row=row, seat=seat
+            )
+        client = APIClient()
+        client.force_authenticate(order.user)
+
+        detail = client.get(
+            reverse("airport_service:flight-detail", args=[flight.id])
+        ).json()
+        seat_map = detail["seat_map"]
+
+        self.assertEqual(seat_map["encoding"], "bitmap-base64")
+        self.assertEqual(
+            decode_seat_map(
+                seat_map["rows"], seat_map["seats_in_row"], seat_map["data"]
+            ),
+            [(seat["row"], seat["seat"]) for seat in detail["taken_seats"]],
+        )
+        self.assertEqual(len(detail["taken_seats"]), 4)
 
-# Create your tests here.
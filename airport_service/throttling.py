@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+
+class SlidingWindowThrottleMixin:
+    """
+    Sliding-window counter on a shared cache instead of DRF's per-key list
+    of timestamps. Each key has one integer counter per fixed window; the
+    rate is estimated as the current count plus the previous count weighted
+    by the part of the previous window still inside the sliding window.
+    A check costs one get and one atomic incr, whatever the rate.
+    """
+
+    @property
+    def cache(self):
+        return caches[settings.THROTTLE_CACHE_ALIAS]
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, position = divmod(self.now, self.duration)
+        self.weight = 1 - position / self.duration
+        current_key = f"{self.key}:{int(window)}"
+
+        self.previous = self.cache.get(f"{self.key}:{int(window) - 1}", 0)
+        self.current = self.increment(current_key)
+
+        if self.previous * self.weight + self.current > self.num_requests:
+            self.cache.decr(current_key)
+            self.current -= 1
+            return self.throttle_failure()
+
+        return True
+
+    def increment(self, key):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            if self.cache.add(key, 1, self.duration * 2):
+                return 1
+            return self.cache.incr(key)
+
+    def wait(self):
+        """
+        Seconds until the weighted previous window has shrunk enough to let
+        one more request in, or until the next window if the current one is
+        full on its own.
+        """
+        position = (1 - self.weight) * self.duration
+        free = self.num_requests - 1 - self.current
+        if free < 0 or not self.previous:
+            return self.duration - position
+
+        return max(
+            (1 - free / self.previous) * self.duration - position, 0
+        )
+
+
+class AnonSlidingWindowThrottle(SlidingWindowThrottleMixin, AnonRateThrottle):
+    pass
+
+
+class UserSlidingWindowThrottle(SlidingWindowThrottleMixin, UserRateThrottle):
+    pass
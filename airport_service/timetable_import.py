@@ -0,0 +1,333 @@
+import csv
+import io
+import json
+import os
+import re
+import time
+from datetime import datetime
+from itertools import islice
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from airport_service.cache import bump_version
+from airport_service.models import (
+    AirplaneType,
+    Crew,
+    Airport,
+    Route,
+    Airplane,
+    Flight,
+)
+
+
+class TimetableImportError(Exception):
+    """
+    Invalid rows of a batch, as (line, message) pairs
+    """
+
+    def __init__(self, name, errors):
+        self.errors = errors
+        super().__init__(
+            "\n".join(f"{name}:{line}: {message}" for line, message in errors)
+        )
+
+
+def read_records(path):
+    """
+    Rows of a .csv, .json (list of objects) or .ndjson/.jsonl file as
+    (line, dict) pairs. CSV and NDJSON files are read lazily.
+    """
+    extension = os.path.splitext(path)[1].lower()
+
+    with open(path, newline="", encoding="utf-8") as file:
+        if extension == ".csv":
+            for number, record in enumerate(csv.DictReader(file), 2):
+                yield number, record
+        elif extension in (".ndjson", ".jsonl"):
+            for number, line in enumerate(file, 1):
+                if line.strip():
+                    yield number, json.loads(line)
+        elif extension == ".json":
+            yield from enumerate(json.load(file), 1)
+        else:
+            raise ValueError(f"Unsupported file type: {path}")
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def parse_datetime(value, default_timezone):
+    moment = datetime.fromisoformat(value.strip())
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=default_timezone)
+
+    return moment
+
+
+class TimetableImporter:
+    """
+    Loads airports, airplanes, routes and flights resolving foreign keys by
+    name through in-memory maps. Catalog rows are created with bulk_create;
+    flights are streamed into Postgres with COPY. With upsert=True existing
+    rows (matched by name, by source and destination for routes, by route
+    and departure time for flights) are updated instead of duplicated, so
+    importing the same files twice is a no-op. Flights are merged with one
+    INSERT ... ON CONFLICT on the unique (route, departure_time).
+    """
+
+    flight_columns = (
+        "route_id",
+        "airplane_id",
+        "crew_id",
+        "departure_time",
+        "arrival_time",
+        "seats_sold",
+    )
+
+    def __init__(self, batch_size=5000, upsert=False, progress=None):
+        self.batch_size = batch_size
+        self.upsert = upsert
+        self.progress = progress or (lambda message: None)
+        self.timezone = timezone.get_current_timezone()
+        self.airports = dict(
+            Airport.objects.order_by("-id").values_list("name", "id")
+        )
+        self.airplane_types = dict(
+            AirplaneType.objects.order_by("-id").values_list("name", "id")
+        )
+        self.new_airplane_types = {}
+        self.airplanes = dict(
+            Airplane.objects.order_by("-id").values_list("name", "id")
+        )
+        self.routes = {
+            (source, destination): route_id
+            for route_id, source, destination in Route.objects.order_by(
+                "-id"
+            ).values_list("id", "source__name", "destination__name")
+        }
+        self.crew = {}
+        for crew_id, first_name, last_name in Crew.objects.order_by(
+            "-id"
+        ).values_list("id", "first_name", "last_name"):
+            self.crew[str(crew_id)] = crew_id
+            self.crew[f"{first_name} {last_name or ''}".strip()] = crew_id
+
+    def run(self, airports=None, airplanes=None, routes=None, flights=None):
+        counts = {}
+        with transaction.atomic():
+            if airports:
+                counts["airports"] = self.import_catalog(
+                    "airports",
+                    airports,
+                    self.airport_row,
+                    Airport,
+                    ("city",),
+                    self.airports,
+                )
+            if airplanes:
+                counts["airplanes"] = self.import_catalog(
+                    "airplanes",
+                    airplanes,
+                    self.airplane_row,
+                    Airplane,
+                    ("rows", "seats_in_row", "airplane_id"),
+                    self.airplanes,
+                )
+            if routes:
+                counts["routes"] = self.import_catalog(
+                    "routes",
+                    routes,
+                    self.route_row,
+                    Route,
+                    ("distance",),
+                    self.routes,
+                )
+            if flights:
+                counts["flights"] = self.import_flights(flights)
+
+        for model in (AirplaneType, Airport, Airplane, Route):
+            bump_version(model)
+
+        return counts
+
+    def import_catalog(self, name, path, parse, model, fields, lookup):
+        created = updated = 0
+
+        for batch in batches(read_records(path), self.batch_size):
+            new, existing, errors = {}, [], []
+            for line, record in batch:
+                try:
+                    key, values = parse(record)
+                except (KeyError, ValueError, TypeError) as error:
+                    errors.append((line, self.describe(error)))
+                    continue
+
+                if key in lookup:
+                    existing.append(model(pk=lookup[key], **values))
+                else:
+                    new[key] = model(**values)
+
+            if errors:
+                raise TimetableImportError(name, errors)
+
+            self.create_airplane_types()
+            for key, instance in zip(
+                new, model.objects.bulk_create(new.values())
+            ):
+                lookup[key] = instance.pk
+            created += len(new)
+            if self.upsert and existing:
+                model.objects.bulk_update(existing, fields)
+                updated += len(existing)
+            self.progress(f"{name}: {created} created, {updated} updated")
+
+        return created, updated
+
+    def airport_row(self, record):
+        name = record["name"].strip()
+        if not name:
+            raise ValueError("name is empty")
+
+        return name, {"name": name, "city": record.get("city") or None}
+
+    def airplane_row(self, record):
+        name = record["name"].strip()
+        type_name = record["airplane_type"].strip()
+        values = {
+            "name": name,
+            "rows": int(record["rows"]),
+            "seats_in_row": int(record["seats_in_row"]),
+        }
+        if type_name in self.airplane_types:
+            values["airplane_id"] = self.airplane_types[type_name]
+        else:
+            # Saved with the batch by create_airplane_types
+            values["airplane"] = self.new_airplane_types.setdefault(
+                type_name, AirplaneType(name=type_name)
+            )
+
+        return name, values
+
+    def create_airplane_types(self):
+        new = self.new_airplane_types
+        for type_name, airplane_type in zip(
+            new, AirplaneType.objects.bulk_create(new.values())
+        ):
+            self.airplane_types[type_name] = airplane_type.pk
+        self.new_airplane_types = {}
+
+    def route_row(self, record):
+        key = (record["source"].strip(), record["destination"].strip())
+
+        return key, {
+            "source_id": self.resolve(self.airports, key[0], "airport"),
+            "destination_id": self.resolve(self.airports, key[1], "airport"),
+            "distance": int(record["distance"]),
+        }
+
+    def flight_row(self, record):
+        key = (record["source"].strip(), record["destination"].strip())
+        departure = parse_datetime(record["departure_time"], self.timezone)
+        arrival = parse_datetime(record["arrival_time"], self.timezone)
+        if arrival <= departure:
+            raise ValueError("arrival_time must be after departure_time")
+
+        return (
+            self.resolve(self.routes, key, "route"),
+            self.resolve(self.airplanes, record["airplane"].strip(), "airplane"),
+            self.resolve(self.crew, str(record["crew"]).strip(), "crew"),
+            departure.isoformat(),
+            arrival.isoformat(),
+            0,
+        )
+
+    def import_flights(self, path):
+        table = Flight._meta.db_table
+        columns = ", ".join(self.flight_columns)
+        imported = 0
+        started = time.monotonic()
+
+        with connection.cursor() as cursor:
+            if self.upsert:
+                cursor.execute(
+                    f"CREATE TEMPORARY TABLE import_flight "
+                    f"AS SELECT {columns} FROM {table} WITH NO DATA"
+                )
+                cursor.execute(
+                    "ALTER TABLE import_flight ADD COLUMN position bigserial"
+                )
+            target = "import_flight" if self.upsert else table
+
+            for batch in batches(read_records(path), self.batch_size):
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                errors = []
+                for line, record in batch:
+                    try:
+                        writer.writerow(self.flight_row(record))
+                    except (KeyError, ValueError, TypeError) as error:
+                        errors.append((line, self.describe(error)))
+
+                if errors:
+                    raise TimetableImportError("flights", errors)
+
+                buffer.seek(0)
+                try:
+                    with connection.wrap_database_errors:
+                        cursor.copy_expert(
+                            f"COPY {target} ({columns}) "
+                            f"FROM STDIN WITH (FORMAT csv)",
+                            buffer,
+                        )
+                except IntegrityError as error:
+                    diag = error.__cause__.diag
+                    row = re.search(r"line (\d+)", diag.context or "")
+                    line = batch[int(row.group(1)) - 1 if row else 0][0]
+                    raise TimetableImportError(
+                        "flights",
+                        [(line, f"{diag.message_detail} Use --upsert.")],
+                    ) from error
+                imported += len(batch)
+                rate = imported / max(time.monotonic() - started, 1e-9)
+                self.progress(f"flights: {imported} rows ({rate:.0f}/s)")
+
+            if not self.upsert:
+                return imported, 0
+
+            # The last row of the file wins when it repeats a flight
+            cursor.execute(
+                f"WITH upserted AS ("
+                f"INSERT INTO {table} ({columns}) "
+                f"SELECT DISTINCT ON (route_id, departure_time) {columns} "
+                f"FROM import_flight "
+                f"ORDER BY route_id, departure_time, position DESC "
+                f"ON CONFLICT (route_id, departure_time) DO UPDATE "
+                f"SET airplane_id = EXCLUDED.airplane_id, "
+                f"crew_id = EXCLUDED.crew_id, "
+                f"arrival_time = EXCLUDED.arrival_time "
+                f"RETURNING xmax = 0 AS created) "
+                f"SELECT count(*) FILTER (WHERE created), "
+                f"count(*) FILTER (WHERE NOT created) FROM upserted"
+            )
+            created, updated = cursor.fetchone()
+            cursor.execute("DROP TABLE import_flight")
+
+            return created, updated
+
+    @staticmethod
+    def resolve(lookup, key, kind):
+        try:
+            return lookup[key]
+        except KeyError:
+            raise ValueError(f"unknown {kind} {key!r}") from None
+
+    @staticmethod
+    def describe(error):
+        if isinstance(error, KeyError):
+            return f"missing column {error.args[0]!r}"
+
+        return str(error)
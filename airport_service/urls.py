@@ -1,5 +1,12 @@
+from django.urls import path
 from rest_framework import routers
 
+from airport_service.async_views import (
+    AsyncAirportView,
+    AsyncRouteView,
+    AsyncFlightView,
+)
+
 from airport_service.views import (
     AirplaneTypeViewSet,
     CrewViewSet,
@@ -8,6 +15,10 @@ from airport_service.views import (
     AirplaneViewSet,
     FlightViewSet,
     OrderViewSet,
+    ItineraryViewSet,
+    DatabaseConnectionsViewSet,
+    MetricsViewSet,
+    ExportViewSet,
 )
 
 router = routers.DefaultRouter()
@@ -19,7 +30,44 @@ router.register("routes", RouteViewSet)
 router.register("airplanes", AirplaneViewSet)
 router.register("flights", FlightViewSet)
 router.register("orders", OrderViewSet)
+router.register("itineraries", ItineraryViewSet, basename="itinerary")
+router.register("exports", ExportViewSet, basename="export")
+router.register(
+    "db-connections", DatabaseConnectionsViewSet, basename="db-connections"
+)
+router.register("metrics", MetricsViewSet, basename="metrics")
 
-urlpatterns = [] + router.urls
+urlpatterns = [
+    path(
+        "async/airports/",
+        AsyncAirportView.as_view(),
+        name="async-airport-list",
+    ),
+    path(
+        "async/airports/<int:pk>/",
+        AsyncAirportView.as_view(),
+        name="async-airport-detail",
+    ),
+    path(
+        "async/routes/",
+        AsyncRouteView.as_view(),
+        name="async-route-list",
+    ),
+    path(
+        "async/routes/<int:pk>/",
+        AsyncRouteView.as_view(),
+        name="async-route-detail",
+    ),
+    path(
+        "async/flights/",
+        AsyncFlightView.as_view(),
+        name="async-flight-list",
+    ),
+    path(
+        "async/flights/<int:pk>/",
+        AsyncFlightView.as_view(),
+        name="async-flight-detail",
+    ),
+] + router.urls
 
 app_name = "airport_service"
@@ -0,0 +1,33 @@
+import base64
+
+
+SEAT_MAP_ENCODING = "bitmap-base64"
+
+
+def encode_seat_map(rows: int, seats_in_row: int, taken_seats) -> str:
+    """
+    Pack taken (row, seat) pairs into a row-major bitset, one bit per seat,
+    most significant bit first, and return it base64 encoded.
+    Seat (row, seat) is bit number (row - 1) * seats_in_row + (seat - 1).
+    """
+    bitmap = bytearray((rows * seats_in_row + 7) // 8)
+
+    for row, seat in taken_seats:
+        index = (row - 1) * seats_in_row + (seat - 1)
+        bitmap[index // 8] |= 0x80 >> (index % 8)
+
+    return base64.b64encode(bytes(bitmap)).decode("ascii")
+
+
+def decode_seat_map(rows: int, seats_in_row: int, data: str) -> list:
+    """
+    Inverse of encode_seat_map: taken (row, seat) pairs in row-major order,
+    as a client reading the flight detail seat_map would compute them
+    """
+    bitmap = base64.b64decode(data)
+
+    return [
+        (index // seats_in_row + 1, index % seats_in_row + 1)
+        for index in range(rows * seats_in_row)
+        if bitmap[index // 8] & (0x80 >> (index % 8))
+    ]
@@ -1,11 +1,30 @@
-from django.db.models import F, Count
+from datetime import datetime, time, timedelta
 
+from django.db.models import Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import viewsets
-from rest_framework.pagination import PageNumberPagination
-from rest_framework_simplejwt.authentication import JWTAuthentication
-
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from airports_user.authentication import CachedJWTAuthentication
+from airport_service.autocomplete import get_airport_index
+from airport_service.db_backend import metrics as db_metrics
+from airport_service.exports import (
+    CONTENT_TYPES,
+    EXPORT_COLUMNS,
+    RENDERERS,
+    export,
+    get_export_queryset,
+)
 from airport_service.filters import AirportFilter, FlightFilter
+from airport_service.instrumentation import (
+    render_prometheus,
+    serializer_timer,
+)
 from airport_service.models import (
     AirplaneType,
     Crew,
@@ -14,8 +33,24 @@ from airport_service.models import (
     Airplane,
     Flight,
     Order,
+    Ticket,
+)
+from airport_service.itinerary import get_itinerary_index
+from airport_service.mixins import (
+    CachedResponseMixin,
+    IdempotentCreateMixin,
+    ReplicaReadMixin,
+    RowMapperListMixin,
+    SerializerTimingMixin,
+    SparseFieldsetMixin,
 )
+from airport_service.pagination import KeysetCursorPagination
 from airport_service.permissions import IsAdminOrIfAuthenticatedReadOnly
+from airport_service.row_mappers import (
+    airplane_list_mapper,
+    flight_list_mapper,
+    route_list_mapper,
+)
 
 from airport_service.serializers import (
     AirplaneTypeSerializer,
@@ -33,23 +68,38 @@ from airport_service.serializers import (
     FlightDetailSerializer,
     OrderListSerializer,
     OrderDetailSerializer,
+    ItinerarySearchSerializer,
+    ItinerarySerializer,
+    AirportAutocompleteSerializer,
 )
 
 
-class AirplaneTypeViewSet(viewsets.ModelViewSet):
+class AirplaneTypeViewSet(
+    ReplicaReadMixin,
+    CachedResponseMixin,
+    SerializerTimingMixin,
+    viewsets.ModelViewSet,
+):
 
     queryset = AirplaneType.objects.all()
     serializer_class = AirplaneTypeSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly, )
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
+    query_budget = {"list": 1, "retrieve": 1}
 
 
-class CrewViewSet(viewsets.ModelViewSet):
+class CrewViewSet(
+    ReplicaReadMixin,
+    CachedResponseMixin,
+    SerializerTimingMixin,
+    viewsets.ModelViewSet,
+):
 
     queryset = Crew.objects.all()
     serializer_class = CrewSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
+    query_budget = {"list": 1, "retrieve": 1}
 
     def get_serializer_class(self):
 
@@ -59,21 +109,59 @@ class CrewViewSet(viewsets.ModelViewSet):
         return CrewSerializer
 
 
-class AirportViewSet(viewsets.ModelViewSet):
+class AirportViewSet(
+    ReplicaReadMixin,
+    CachedResponseMixin,
+    SerializerTimingMixin,
+    viewsets.ModelViewSet,
+):
 
     queryset = Airport.objects.all()
     serializer_class = AirportSerializer
     filter_backends = (DjangoFilterBackend, )
     filterset_class = AirportFilter
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
+    query_budget = {"list": 1, "retrieve": 1, "autocomplete": 1}
+
+    @action(detail=False, filter_backends=(), pagination_class=None)
+    def autocomplete(self, request):
+        """Top airports whose name or city starts with ?q="""
+        params = AirportAutocompleteSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        airports = get_airport_index().search(
+            params.validated_data["q"],
+            limit=params.validated_data["limit"],
+        )
+
+        with serializer_timer():
+            data = AirportSerializer(airports, many=True).data
+        return Response(data)
 
 
-class RouteViewSet(viewsets.ModelViewSet):
+class RouteViewSet(
+    ReplicaReadMixin,
+    CachedResponseMixin,
+    RowMapperListMixin,
+    SparseFieldsetMixin,
+    SerializerTimingMixin,
+    viewsets.ModelViewSet,
+):
 
-    queryset = Route.objects.all().select_related("source", "destination")
+    queryset = Route.objects.all()
     serializer_class = RouteSerializer
-    authentication_classes = (JWTAuthentication,)
+    cache_models = (Route, Airport)
+    authentication_classes = (CachedJWTAuthentication,)
+    query_budget = {"list": 1, "retrieve": 1}
+    expand_relations = {"source": ("source",), "destination": ("destination",)}
+    list_mapper = route_list_mapper
+
+    def get_queryset(self):
+        if self.action == "list":
+            return self.select_related(self.queryset)
+
+        return self.queryset
 
     def get_serializer_class(self):
 
@@ -83,12 +171,21 @@ class RouteViewSet(viewsets.ModelViewSet):
         return RouteSerializer
 
 
-class AirplaneViewSet(viewsets.ModelViewSet):
+class AirplaneViewSet(
+    ReplicaReadMixin,
+    CachedResponseMixin,
+    RowMapperListMixin,
+    SerializerTimingMixin,
+    viewsets.ModelViewSet,
+):
 
     queryset = Airplane.objects.all().select_related("airplane")
     serializer_class = AirplaneSerializer
+    cache_models = (Airplane, AirplaneType)
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
+    query_budget = {"list": 1, "retrieve": 1}
+    list_mapper = airplane_list_mapper
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -100,38 +197,46 @@ class AirplaneViewSet(viewsets.ModelViewSet):
         return AirplaneSerializer
 
 
-class FlightViewSet(viewsets.ModelViewSet):
+class FlightPagination(KeysetCursorPagination):
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("departure_time", "id")
+
+
+class FlightViewSet(
+    ReplicaReadMixin,
+    RowMapperListMixin,
+    SparseFieldsetMixin,
+    SerializerTimingMixin,
+    viewsets.ModelViewSet,
+):
 
-    queryset = (
-        Flight.objects.all()
-        .select_related(
-            "route__source",
-            "route__destination",
-            "airplane__airplane",
-            "crew",
-        )
-        .annotate(
-            seats_available=(
-                F("airplane__rows") * F("airplane__seats_in_row")
-                - Count("tickets")
-            )
-        )
-    )
+    queryset = Flight.objects.all()
     serializer_class = FlightSerializer
+    pagination_class = FlightPagination
     filter_backends = (DjangoFilterBackend, )
     filterset_class = FlightFilter
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
+    query_budget = {"list": 1, "retrieve": 2}
+    list_mapper = flight_list_mapper
+    field_relations = {
+        "arrival_place": ("route__source",),
+        "destination_place": ("route__destination",),
+        "seats_available": ("airplane",),
+        "seat_map": ("airplane",),
+    }
+    expand_relations = {
+        "route": ("route",),
+        "route.source": ("route__source",),
+        "route.destination": ("route__destination",),
+        "airplane": ("airplane__airplane",),
+        "crew": ("crew",),
+    }
 
     def get_queryset(self):
-
-        route_id_str = self.request.query_params.get("route")
-        queryset = self.queryset
-
-        if route_id_str:
-            queryset = queryset.filter(route_id=int(route_id_str))
-
-        return queryset
+        return self.select_related(self.queryset)
 
     def get_serializer_class(self):
 
@@ -144,26 +249,73 @@ class FlightViewSet(viewsets.ModelViewSet):
         return FlightSerializer
 
 
-class OrderPagination(PageNumberPagination):
+class OrderPagination(KeysetCursorPagination):
     page_size = 5
     page_size_query_param = "page_size"
     max_page_size = 100
+    ordering = ("-created_at", "-id")
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(
+    ReplicaReadMixin,
+    IdempotentCreateMixin,
+    SparseFieldsetMixin,
+    SerializerTimingMixin,
+    viewsets.ModelViewSet,
+):
 
-    queryset = (
-        Order.objects.all()
-        .prefetch_related(
-            "tickets__flight__route__source",
-        )
-    )
+    queryset = Order.objects.all()
     serializer_class = OrderSerializer
     pagination_class = OrderPagination
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (CachedJWTAuthentication,)
+    query_budget = {"list": 2, "retrieve": 3, "create": 7}
+    expand_relations = {
+        "tickets.flight": (
+            "flight__route__source",
+            "flight__route__destination",
+        ),
+    }
+    detail_expand_relations = {
+        "tickets.flight": ("flight__airplane",),
+        "tickets.flight.route": ("flight__route",),
+        "tickets.flight.route.source": ("flight__route__source",),
+        "tickets.flight.route.destination": (
+            "flight__route__destination",
+        ),
+        "tickets.flight.airplane": ("flight__airplane__airplane",),
+        "tickets.flight.crew": ("flight__crew",),
+    }
 
     def get_queryset(self):
-        return self.queryset.filter(user=self.request.user)
+        queryset = self.queryset.filter(user=self.request.user)
+
+        if self.action not in ("list", "retrieve") or not self.includes(
+            "tickets"
+        ):
+            return queryset
+
+        tickets = self.select_related(Ticket.objects.all())
+
+        if not self.expands("tickets"):
+            tickets = Ticket.objects.only("id", "order_id")
+        elif self.action == "retrieve" and self.expands("tickets.flight"):
+            tickets = tickets.prefetch_related(
+                Prefetch(
+                    "flight__tickets",
+                    queryset=Ticket.objects.only(
+                        "id", "flight_id", "row", "seat"
+                    ),
+                )
+            )
+
+        return queryset.prefetch_related(Prefetch("tickets", queryset=tickets))
+
+    def get_expand_relations(self):
+
+        if self.action == "retrieve":
+            return self.detail_expand_relations
+
+        return self.expand_relations
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -177,3 +329,118 @@ class OrderViewSet(viewsets.ModelViewSet):
             return OrderDetailSerializer
 
         return OrderSerializer
+
+
+class ItineraryViewSet(ReplicaReadMixin, viewsets.ViewSet):
+    """
+    Direct and connecting flights between two airports or cities,
+    searched in the in-memory timetable index
+    """
+    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    authentication_classes = (CachedJWTAuthentication,)
+    query_budget = {"list": 3}
+
+    def list(self, request):
+        search = ItinerarySearchSerializer(data=request.query_params)
+        search.is_valid(raise_exception=True)
+        params = search.validated_data
+        index = get_itinerary_index()
+
+        places = {}
+        for place in ("source", "destination"):
+            if place in params:
+                places[place] = {params[place]}
+            else:
+                places[place] = index.airports_in_city(params[f"{place}_city"])
+
+        departure_from = datetime.combine(
+            params["date"], time.min, tzinfo=timezone.get_current_timezone()
+        )
+        itineraries = index.search(
+            sources=places["source"],
+            destinations=places["destination"],
+            departure_from=departure_from,
+            departure_to=departure_from + timedelta(days=1),
+            max_stops=params["max_stops"],
+            min_connection=timedelta(minutes=params["min_connection"]),
+            max_connection=timedelta(minutes=params["max_connection"]),
+            passengers=params["passengers"],
+            limit=params["limit"],
+        )
+
+        with serializer_timer():
+            data = ItinerarySerializer(itineraries, many=True).data
+        return Response(data)
+
+
+class DatabaseConnectionsViewSet(viewsets.ViewSet):
+    """
+    Database connection counters of the worker process serving the request
+    """
+    permission_classes = (IsAdminUser,)
+    authentication_classes = (CachedJWTAuthentication,)
+    query_budget = {"list": 0}
+
+    def list(self, request):
+        return Response(db_metrics.snapshot())
+
+
+class MetricsViewSet(viewsets.ViewSet):
+    """
+    Request histograms of the worker process serving the request, per view
+    action, in the Prometheus text format
+    """
+    permission_classes = (IsAdminUser,)
+    authentication_classes = (CachedJWTAuthentication,)
+    query_budget = {"list": 0}
+
+    def list(self, request):
+        return HttpResponse(
+            render_prometheus(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
+
+
+class ExportViewSet(ReplicaReadMixin, viewsets.ViewSet):
+    """
+    Streams flights, orders or tickets as NDJSON (default) or CSV:
+    exports/<dataset>/?output=csv&departure_time_after=...
+    Accepts the flight list filters.
+    """
+    permission_classes = (IsAdminUser,)
+    authentication_classes = (CachedJWTAuthentication,)
+    lookup_field = "dataset"
+    query_budget = {"list": 0, "retrieve": 1}
+
+    def list(self, request):
+        return Response(
+            {
+                dataset: request.build_absolute_uri(f"{dataset}/")
+                for dataset in EXPORT_COLUMNS
+            }
+        )
+
+    def retrieve(self, request, dataset=None):
+        if dataset not in EXPORT_COLUMNS:
+            raise NotFound()
+
+        output = request.query_params.get("output", "ndjson")
+        if output not in RENDERERS:
+            raise ValidationError(
+                {"output": [f"Choose one of: {', '.join(RENDERERS)}."]}
+            )
+
+        queryset, errors = get_export_queryset(dataset, request.query_params)
+        if errors:
+            raise ValidationError(errors)
+
+        # Bind the database now: rows are read after the view has returned
+        response = StreamingHttpResponse(
+            export(dataset, queryset.using(queryset.db), output),
+            content_type=CONTENT_TYPES[output],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="{dataset}.{output}"'
+        )
+
+        return response
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AirportsUserConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "airports_user"
+
+    def ready(self):
+        import airports_user.signals  # noqa: F401
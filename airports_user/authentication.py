@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+
+# Enough for authentication and permissions; the password hash and the
+# rest of the row stay out of the (possibly shared) cache
+CACHED_USER_FIELDS = ("id", "email", "is_active", "is_staff", "is_superuser")
+
+
+def user_cache_key(user_id):
+    return f"jwt-user:{user_id}"
+
+
+def cached_user_values(user):
+    return {field: getattr(user, field) for field in CACHED_USER_FIELDS}
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps resolved users in the cache for
+    AUTH_USER_CACHE_TIMEOUT seconds, so a valid token costs no query.
+    Only CACHED_USER_FIELDS are cached; other fields of the rebuilt user
+    are deferred, loaded on access and left alone by save().
+    Entries are dropped when the user is saved or deleted.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        key = user_cache_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            user = super().get_user(validated_token)
+            cache.set(
+                key, cached_user_values(user), settings.AUTH_USER_CACHE_TIMEOUT
+            )
+            return user
+
+        # from_db() takes the values in the model's field order
+        user = self.user_model.from_db(
+            DEFAULT_DB_ALIAS,
+            list(values),
+            [
+                values[field.attname]
+                for field in self.user_model._meta.concrete_fields
+                if field.attname in values
+            ],
+        )
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive"
+            )
+
+        return user
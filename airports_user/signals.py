@@ -0,0 +1,21 @@
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from airports_user.authentication import user_cache_key
+from airports_user.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drop the cached user now and again after commit: a request
+    authenticating before the commit would re-cache the old row
+    """
+    key = user_cache_key(instance.pk)
+    cache.delete(key)
+    transaction.on_commit(partial(cache.delete, key))
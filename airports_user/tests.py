@@ -1,3 +1,95 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from airports_user.authentication import cached_user_values, user_cache_key
+from airports_user.models import User
+
+ME_URL = reverse("user:manage")
+AIRPLANE_TYPE_URL = reverse("airport_service:airplanetype-list")
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="user@airport.com", password="secret123", first_name="Ann"
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+
+    def test_user_is_loaded_once(self):
+        self.client.get(AIRPLANE_TYPE_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(AIRPLANE_TYPE_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 0)
+
+    def test_update_through_me_is_visible_next_request(self):
+        self.client.get(ME_URL)
+
+        response = self.client.patch(ME_URL, {"email": "new@airport.com"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.client.get(ME_URL).data["email"], "new@airport.com")
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_is_rejected(self):
+        self.client.get(ME_URL)
+
+        self.user.delete()
+
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_cached_before_commit_is_dropped_after_commit(self):
+        committed = User.objects.get(pk=self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+            # A concurrent request caching the still committed, active row
+            cache.set(
+                user_cache_key(self.user.pk), cached_user_values(committed)
+            )
+
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_hash_is_not_cached(self):
+        self.client.get(ME_URL)
+
+        cached = cache.get(user_cache_key(self.user.pk))
+
+        self.assertNotIn(self.user.password, cached.values())
+        self.assertEqual(cached, cached_user_values(self.user))
+
+    def test_update_of_cached_user_keeps_other_fields(self):
+        self.client.get(ME_URL)
+
+        response = self.client.patch(ME_URL, {"email": "new@airport.com"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.get(ME_URL)
+        response = self.client.patch(ME_URL, {"password": "changed123"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, "new@airport.com")
+        self.assertEqual(self.user.first_name, "Ann")
+        self.assertTrue(self.user.check_password("changed123"))
@@ -1,9 +1,10 @@
+from django.contrib.auth import get_user_model
 from rest_framework import generics
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.settings import api_settings
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from airports_user.authentication import CachedJWTAuthentication
 from airports_user.serializers import UserSerializer, AuthTokenSerializer
 
 
@@ -17,8 +18,9 @@ class CreateTokenView(ObtainAuthToken):
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
+    queryset = get_user_model().objects.all()
     serializer_class = UserSerializer
-    authentication_classes = (JWTAuthentication, )
+    authentication_classes = (CachedJWTAuthentication, )
     permission_classes = (IsAuthenticated, )
 
     def get_object(self):
@@ -0,0 +1,55 @@
+"""
+Throughput of /api/airport/flights/ served by the sync DRF viewset under
+WSGI versus /api/airport/async/flights/ served by the async view under ASGI.
+
+Start one single-worker server of each kind, then run the benchmark:
+
+    gunicorn AirportApi.wsgi -w 1 -b 127.0.0.1:8001
+    uvicorn AirportApi.asgi:application --workers 1 --port 8002
+    python benchmarks/flights_sync_vs_async.py \\
+        --email user@example.com --password secret --concurrency 64
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from http_load import obtain_token, report, request, run_load  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--wsgi-url", default="http://127.0.0.1:8001")
+    parser.add_argument("--asgi-url", default="http://127.0.0.1:8002")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--query", default="page_size=20")
+    options = parser.parse_args()
+
+    token = obtain_token(options.wsgi_url, options.email, options.password)
+    targets = (
+        ("sync  WSGI", f"{options.wsgi_url}/api/airport/flights/"),
+        ("async ASGI", f"{options.asgi_url}/api/airport/async/flights/"),
+    )
+
+    for name, url in targets:
+        url = f"{url}?{options.query}"
+        request("GET", url, token)
+        report(
+            f"{name} x{options.concurrency}",
+            *run_load(
+                lambda: request("GET", url, token)[0],
+                options.concurrency,
+                options.requests,
+            ),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Small threaded HTTP load driver shared by the benchmark scripts.
+Uses only the standard library so it runs from any checkout.
+"""
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def request(method, url, token=None, data=None, timeout=30):
+    """Send one request and return (status code, decoded JSON body or None)"""
+    headers = {"Accept": "application/json"}
+    body = None
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    if data is not None:
+        headers["Content-Type"] = "application/json"
+        body = json.dumps(data).encode()
+
+    http_request = urllib.request.Request(
+        url, data=body, headers=headers, method=method
+    )
+    try:
+        with urllib.request.urlopen(http_request, timeout=timeout) as response:
+            content = response.read()
+            status = response.status
+    except urllib.error.HTTPError as error:
+        content = error.read()
+        status = error.code
+
+    try:
+        return status, json.loads(content) if content else None
+    except ValueError:
+        return status, None
+
+
+def obtain_token(base_url, email, password):
+    status, body = request(
+        "POST",
+        f"{base_url}/api/user/token/",
+        data={"email": email, "password": password},
+    )
+    if status != 200:
+        raise SystemExit(f"Unable to obtain a token for {email}: {body}")
+    return body["access"]
+
+
+def run_load(scenario, concurrency, total):
+    """
+    Call scenario() total times from concurrency threads.
+    scenario returns a status code; returns (latencies in ms, statuses,
+    wall time in seconds).
+    """
+    latencies = []
+    statuses = []
+    lock = threading.Lock()
+    remaining = [total]
+
+    def worker():
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                status = scenario()
+            except OSError:
+                status = 0
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed)
+                statuses.append(status)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return latencies, statuses, time.perf_counter() - started
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def report(name, latencies, statuses, wall_time):
+    errors = sum(1 for status in statuses if not 200 <= status < 300)
+    print(
+        f"{name:<28} "
+        f"{len(latencies) / wall_time:8.1f} req/s  "
+        f"mean {statistics.mean(latencies):7.1f} ms  "
+        f"p50 {percentile(latencies, 0.50):7.1f} ms  "
+        f"p95 {percentile(latencies, 0.95):7.1f} ms  "
+        f"p99 {percentile(latencies, 0.99):7.1f} ms  "
+        f"errors {errors}"
+    )
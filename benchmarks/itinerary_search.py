@@ -0,0 +1,165 @@
+"""
+Benchmark of the in-memory itinerary index on a synthetic timetable.
+
+    python benchmarks/itinerary_search.py --airports 10000 --flights 1000000
+
+No database is needed: the index is built from generated rows, the same
+tuples ItineraryIndex.load() reads from the ORM.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "AirportApi.settings")
+for variable in (
+    "POSTGRES_HOST", "POSTGRES_DB", "POSTGRES_USER", "POSTGRES_PASSWORD"
+):
+    os.environ.setdefault(variable, "")
+
+import django  # noqa: E402
+
+django.setup()
+
+from airport_service.itinerary import ItineraryIndex  # noqa: E402
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def generate(airports_count, flights_count, days, hubs_count, seed):
+    """
+    Hub-and-spoke network: hubs are fully connected, every airport is
+    linked both ways to three hubs and has a couple of point-to-point routes.
+    Half of the flights run between hubs, 40% on spokes.
+    """
+    rng = random.Random(seed)
+    airports = [(i, f"City {i // 5}") for i in range(1, airports_count + 1)]
+    hubs = rng.sample(range(1, airports_count + 1), hubs_count)
+
+    trunk_routes = [(a, b) for a in hubs for b in hubs if a != b]
+    spoke_routes = []
+    direct_routes = []
+    for airport_id in range(1, airports_count + 1):
+        for hub_id in rng.sample(hubs, 3):
+            if hub_id != airport_id:
+                spoke_routes += [(airport_id, hub_id), (hub_id, airport_id)]
+        for _ in range(2):
+            destination_id = rng.randint(1, airports_count)
+            if destination_id != airport_id:
+                direct_routes.append((airport_id, destination_id))
+
+    start = int(START.timestamp())
+    period = days * 24 * 3600
+    flights = []
+    for flight_id in range(1, flights_count + 1):
+        share = rng.random()
+        routes = (
+            trunk_routes if share < 0.5
+            else spoke_routes if share < 0.9
+            else direct_routes
+        )
+        source_id, destination_id = routes[rng.randrange(len(routes))]
+        departure = start + rng.randrange(period) // 300 * 300
+        duration = rng.randint(45, 600) * 60
+        flights.append((
+            flight_id,
+            source_id,
+            destination_id,
+            departure,
+            departure + duration,
+            rng.randint(0, 180),
+            duration // 60 * 12,
+        ))
+
+    return airports, trunk_routes + spoke_routes + direct_routes, flights
+
+
+def index_size(index):
+    return sum(
+        len(column) * column.itemsize
+        for column in (
+            index.ids,
+            index.sources,
+            index.destinations,
+            index.departures,
+            index.arrivals,
+            index.seats,
+            index.distances,
+        )
+    )
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--airports", type=int, default=10_000)
+    parser.add_argument("--flights", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--hubs", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    options = parser.parse_args()
+
+    airports, routes, flights = generate(
+        options.airports,
+        options.flights,
+        options.days,
+        options.hubs,
+        options.seed,
+    )
+
+    started = time.perf_counter()
+    index = ItineraryIndex(airports, routes, flights)
+    build_time = time.perf_counter() - started
+    del flights
+
+    print(
+        f"Index: {options.airports} airports, {len(routes)} routes, "
+        f"{len(index)} flights"
+    )
+    print(
+        f"Build: {build_time:.2f}s, "
+        f"flight arrays {index_size(index) / 2 ** 20:.0f} MiB"
+    )
+
+    rng = random.Random(options.seed)
+    for max_stops in (0, 1, 2):
+        timings = []
+        results = 0
+        for _ in range(options.queries):
+            day = START + timedelta(days=rng.randrange(options.days))
+            started = time.perf_counter()
+            results += len(index.search(
+                sources=index.airports_in_city(
+                    f"City {rng.randrange(options.airports // 5)}"
+                ),
+                destinations=index.airports_in_city(
+                    f"City {rng.randrange(options.airports // 5)}"
+                ),
+                departure_from=day,
+                departure_to=day + timedelta(days=1),
+                max_stops=max_stops,
+            ))
+            timings.append((time.perf_counter() - started) * 1000)
+
+        print(
+            f"max_stops={max_stops}: "
+            f"mean {statistics.mean(timings):.2f} ms, "
+            f"p50 {percentile(timings, 0.50):.2f} ms, "
+            f"p95 {percentile(timings, 0.95):.2f} ms, "
+            f"p99 {percentile(timings, 0.99):.2f} ms, "
+            f"{results / options.queries:.1f} itineraries/query"
+        )
+
+
+if __name__ == "__main__":
+    main()
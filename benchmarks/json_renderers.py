@@ -0,0 +1,194 @@
+"""
+Encode time and allocations of DRF's JSONRenderer against ORJSONRenderer
+on /api/airport/flights/ and /api/airport/orders/ payloads, and of the
+matching parsers on an order creation body.
+
+    python benchmarks/json_renderers.py --flights 100 --orders 100
+
+Payloads are produced by the list serializers of the two endpoints from
+unsaved model instances, so no database is needed.
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "AirportApi.settings")
+for variable in (
+    "POSTGRES_HOST", "POSTGRES_DB", "POSTGRES_USER", "POSTGRES_PASSWORD"
+):
+    os.environ.setdefault(variable, "")
+
+import django  # noqa: E402
+
+django.setup()
+
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from airport_service.models import (  # noqa: E402
+    AirplaneType,
+    Crew,
+    Airport,
+    Route,
+    Airplane,
+    Flight,
+    Order,
+    Ticket,
+)
+from airport_service.parsers import ORJSONParser  # noqa: E402
+from airport_service.renderers import ORJSONRenderer  # noqa: E402
+from airport_service.serializers import (  # noqa: E402
+    FlightListSerializer,
+    OrderListSerializer,
+)
+
+START = datetime(2026, 1, 1, 6, 30, tzinfo=timezone.utc)
+
+
+def make_flights(count):
+    airplane_type = AirplaneType(id=1, name="Airbus A320neo")
+    airports = [
+        Airport(id=i, name=f"Airport {i}", city=f"City {i}")
+        for i in range(1, 21)
+    ]
+    flights = []
+    for flight_id in range(1, count + 1):
+        source = airports[flight_id % 20]
+        destination = airports[(flight_id * 7 + 3) % 20]
+        departure = START + timedelta(minutes=37 * flight_id)
+        flights.append(
+            Flight(
+                id=flight_id,
+                route=Route(
+                    id=flight_id % 50 + 1,
+                    source=source,
+                    destination=destination,
+                    distance=1500,
+                ),
+                airplane=Airplane(
+                    id=flight_id % 30 + 1,
+                    name=f"UR-{flight_id % 30:03d}",
+                    rows=30,
+                    seats_in_row=6,
+                    airplane=airplane_type,
+                    outside_image=f"uploads/airplanes/ur-{flight_id}.png",
+                    inside_image=f"uploads/airplanes/ur-{flight_id}-in.png",
+                ),
+                crew=Crew(
+                    id=flight_id % 40 + 1,
+                    first_name="Olena",
+                    last_name="Kovalenko",
+                    image=f"uploads/crew/kovalenko-{flight_id}.png",
+                ),
+                departure_time=departure,
+                arrival_time=departure + timedelta(hours=2, minutes=45),
+                seats_sold=flight_id % 180,
+            )
+        )
+
+    return flights
+
+
+def make_orders(count, flights, tickets_per_order=3):
+    orders = []
+    for order_id in range(1, count + 1):
+        order = Order(
+            id=order_id, created_at=START - timedelta(minutes=order_id)
+        )
+        order._prefetched_objects_cache = {
+            "tickets": [
+                Ticket(
+                    id=order_id * tickets_per_order + number,
+                    order=order,
+                    flight=flights[(order_id + number) % len(flights)],
+                    row=number + 1,
+                    seat=order_id % 6 + 1,
+                )
+                for number in range(tickets_per_order)
+            ]
+        }
+        orders.append(order)
+
+    return orders
+
+
+def measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return statistics.median(timings), peak
+
+
+def report(name, baseline, candidate):
+    (base_time, base_peak), (new_time, new_peak) = baseline, candidate
+    print(
+        f"{name:<28} {base_time * 1000:8.2f} ms {base_peak / 1024:8.0f} KiB"
+        f" -> {new_time * 1000:8.2f} ms {new_peak / 1024:8.0f} KiB"
+        f"  ({base_time / new_time:.1f}x faster)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--flights", type=int, default=100)
+    parser.add_argument("--orders", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    flights = make_flights(args.flights)
+    payloads = {
+        f"flights ({args.flights})": FlightListSerializer(
+            flights, many=True
+        ).data,
+        f"orders ({args.orders})": OrderListSerializer(
+            make_orders(args.orders, flights), many=True
+        ).data,
+    }
+
+    print(
+        f"{'payload':<28} {'JSONRenderer':>24}    {'ORJSONRenderer':>24}"
+    )
+    for name, data in payloads.items():
+        baseline_body = JSONRenderer().render(data)
+        candidate_body = ORJSONRenderer().render(data)
+        assert baseline_body == candidate_body, f"{name}: output differs"
+
+        report(
+            f"render {name}",
+            measure(lambda: JSONRenderer().render(data), args.repeat),
+            measure(lambda: ORJSONRenderer().render(data), args.repeat),
+        )
+
+    body = JSONRenderer().render(
+        {
+            "tickets": [
+                {"row": row, "seat": seat, "flight": row * 10 + seat}
+                for row in range(1, 31)
+                for seat in range(1, 7)
+            ]
+        }
+    )
+    report(
+        f"parse order ({len(body)} B)",
+        measure(lambda: JSONParser().parse(io.BytesIO(body)), args.repeat),
+        measure(lambda: ORJSONParser().parse(io.BytesIO(body)), args.repeat),
+    )
+
+
+if __name__ == "__main__":
+    main()
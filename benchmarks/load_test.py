@@ -0,0 +1,281 @@
+"""
+End-to-end load test of the API against a running server, best on data
+from `python manage.py generate_synthetic_data`:
+
+    python manage.py runserver --noreload   # or gunicorn / uvicorn
+    python benchmarks/load_test.py --users 20 --concurrency 32 \\
+        --requests 5000 --json results.json [--compare baseline.json]
+
+A weighted mix of flight search (FlightFilter params), flight detail,
+order creation and order listing runs concurrently, each request made
+by one of --users generated users (load<id>@example.com). Latency
+percentiles and throughput are reported per scenario; --json saves them
+and --compare prints the change against an earlier run.
+
+The anon/user throttles apply to the server under test; start it with
+e.g. USER_THROTTLE_RATE=1000000/day, or most requests end up as 429.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from http_load import (  # noqa: E402
+    obtain_token,
+    percentile,
+    report,
+    request,
+    run_load,
+)
+
+SCENARIOS = {
+    "flight search": 5,
+    "flight detail": 3,
+    "order list": 2,
+    "order create": 1,
+}
+
+
+class LoadTest:
+
+    def __init__(self, base_url, tokens, flights, seed):
+        self.base_url = base_url
+        self.tokens = tokens
+        self.flights = flights
+        self.airports = sorted({flight["source"] for flight in flights})
+        self.local = threading.local()
+        self.seed = seed
+        self.results = {name: ([], []) for name in SCENARIOS}
+        self.lock = threading.Lock()
+
+    @property
+    def rng(self):
+        if not hasattr(self.local, "rng"):
+            self.local.rng = random.Random(
+                f"{self.seed}-{threading.get_ident()}"
+            )
+        return self.local.rng
+
+    def url(self, path, **params):
+        query = f"?{urlencode(params)}" if params else ""
+        return f"{self.base_url}/api/airport/{path}{query}"
+
+    def flight_search(self, token):
+        flight = self.rng.choice(self.flights)
+        day = datetime.fromisoformat(flight["departure_time"]).date()
+        params = {
+            "departure_time_after": day.isoformat(),
+            "departure_time_before": (day + timedelta(days=1)).isoformat(),
+        }
+        if self.rng.random() < 0.7:
+            params["arrival_place"] = flight["source"]
+        if self.rng.random() < 0.5:
+            params["destination_place"] = flight["destination"]
+
+        return request("GET", self.url("flights/", **params), token)[0]
+
+    def flight_detail(self, token):
+        flight = self.rng.choice(self.flights)
+        return request("GET", self.url(f"flights/{flight['id']}/"), token)[0]
+
+    def order_list(self, token):
+        return request("GET", self.url("orders/"), token)[0]
+
+    def order_create(self, token):
+        """
+        Books random seats; a taken seat is answered with 409 Conflict,
+        which is reported apart from errors
+        """
+        flight = self.rng.choice(self.flights)
+        tickets = [
+            {
+                "flight": flight["id"],
+                "row": self.rng.randint(1, flight["rows"]),
+                "seat": self.rng.randint(1, flight["seats_in_row"]),
+            }
+            for _ in range(self.rng.randint(1, 3))
+        ]
+        unique = {
+            (ticket["row"], ticket["seat"]): ticket for ticket in tickets
+        }
+
+        return request(
+            "POST",
+            self.url("orders/"),
+            token,
+            {"tickets": list(unique.values())},
+        )[0]
+
+    def scenario(self):
+        name = self.rng.choices(
+            list(SCENARIOS), weights=list(SCENARIOS.values())
+        )[0]
+        handler = getattr(self, name.replace(" ", "_"))
+
+        started = time.perf_counter()
+        try:
+            status = handler(self.rng.choice(self.tokens))
+        except OSError:
+            status = 0
+        elapsed = (time.perf_counter() - started) * 1000
+
+        latencies, statuses = self.results[name]
+        with self.lock:
+            latencies.append(elapsed)
+            statuses.append(status)
+        return status
+
+
+def sample_flights(base_url, token, count, seed):
+    """
+    Details of up to count flights departing from now on, read through the
+    API so the test runs against any server
+    """
+    rng = random.Random(seed)
+    status, page = request(
+        "GET",
+        f"{base_url}/api/airport/flights/?"
+        + urlencode(
+            {
+                "page_size": 100,
+                "departure_time_after": datetime.now().date().isoformat(),
+            }
+        ),
+        token,
+    )
+    ids = []
+    while status == 200 and page["results"] and len(ids) < count * 5:
+        ids += [flight["id"] for flight in page["results"]]
+        if not page["next"]:
+            break
+        status, page = request("GET", page["next"], token)
+    if not ids:
+        raise SystemExit("No upcoming flights; run generate_synthetic_data")
+
+    flights = []
+    for flight_id in rng.sample(ids, min(count, len(ids))):
+        _, flight = request(
+            "GET", f"{base_url}/api/airport/flights/{flight_id}/", token
+        )
+        flights.append(
+            {
+                "id": flight_id,
+                "source": flight["route"]["source"]["name"],
+                "destination": flight["route"]["destination"]["name"],
+                "departure_time": flight["departure_time"].replace("Z", ""),
+                "rows": flight["airplane"]["rows"],
+                "seats_in_row": flight["airplane"]["seats_in_row"],
+            }
+        )
+
+    return flights
+
+
+def summarize(latencies, statuses, wall_time):
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / wall_time,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "conflicts": statuses.count(409),
+        "errors": sum(
+            1 for status in statuses
+            if not 200 <= status < 300 and status != 409
+        ),
+    }
+
+
+def compare(results, baseline):
+    print("\nchange against baseline (latency lower is better)")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        changes = [
+            f"{metric} {(result[metric] / before[metric] - 1) * 100:+6.1f}%"
+            for metric in ("throughput", "p50", "p95", "p99")
+            if before[metric]
+        ]
+        print(f"{name:<28} " + "  ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--first-user", type=int, default=1)
+    parser.add_argument("--password", default="loadtest")
+    parser.add_argument("--email-template", default="load{}@example.com")
+    parser.add_argument("--flights", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Results file of an earlier run")
+    options = parser.parse_args()
+
+    tokens = []
+    number = options.first_user
+    while len(tokens) < options.users:
+        email = options.email_template.format(number)
+        status, body = request(
+            "POST",
+            f"{options.url}/api/user/token/",
+            data={"email": email, "password": options.password},
+        )
+        if status == 200:
+            tokens.append(body["access"])
+        elif number - options.first_user > options.users * 100:
+            break
+        number += 1
+    if not tokens:
+        tokens.append(obtain_token(
+            options.url,
+            options.email_template.format(options.first_user),
+            options.password,
+        ))
+
+    flights = sample_flights(
+        options.url, tokens[0], options.flights, options.seed
+    )
+    print(
+        f"{len(tokens)} users, {len(flights)} sampled flights, "
+        f"{options.requests} requests from {options.concurrency} clients"
+    )
+
+    test = LoadTest(options.url, tokens, flights, options.seed)
+    latencies, statuses, wall_time = run_load(
+        test.scenario, options.concurrency, options.requests
+    )
+
+    results = {}
+    for name, (scenario_latencies, scenario_statuses) in test.results.items():
+        if scenario_latencies:
+            report(name, scenario_latencies, scenario_statuses, wall_time)
+            results[name] = summarize(
+                scenario_latencies, scenario_statuses, wall_time
+            )
+    report("total", latencies, statuses, wall_time)
+    results["total"] = summarize(latencies, statuses, wall_time)
+    conflicts = results.get("order create", {}).get("conflicts", 0)
+    print(f"order create conflicts (409): {conflicts}")
+
+    if options.json:
+        Path(options.json).write_text(json.dumps(results, indent=2))
+    if options.compare:
+        compare(results, json.loads(Path(options.compare).read_text()))
+
+
+if __name__ == "__main__":
+    main()